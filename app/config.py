@@ -0,0 +1,43 @@
+import os
+
+# Configuração por variáveis de ambiente
+
+def _flag(nome: str, padrao: str = "0") -> bool:
+    return os.getenv(nome, padrao).strip().lower() in ("1", "true", "sim", "yes")
+
+DATABASE_URL = os.getenv("FREQUENCIA_DATABASE_URL", "sqlite:///./data/frequencia.db")
+
+# Pilha assíncrona (AsyncSession sobre aiosqlite) para as rotas da API
+USAR_ASYNC = _flag("FREQUENCIA_ASYNC")
+
+# Agrupamento de escritas de frequência em uma única transação (group commit)
+AGRUPAR_ESCRITAS = _flag("FREQUENCIA_AGRUPAR_ESCRITAS")
+AGRUPAR_INTERVALO_MS = int(os.getenv("FREQUENCIA_AGRUPAR_INTERVALO_MS", "20"))
+AGRUPAR_MAX_REGISTROS = int(os.getenv("FREQUENCIA_AGRUPAR_MAX_REGISTROS", "500"))
+# Tempo máximo (segundos) que uma requisição espera a gravação do seu pedido
+AGRUPAR_ESPERA_S = float(os.getenv("FREQUENCIA_AGRUPAR_ESPERA_S", "30"))
+
+# Motor analítico em memória (numpy) para relatórios por aluno, turma e séries
+ANALITICO = _flag("FREQUENCIA_ANALITICO")
+
+# Pasta dos arquivos de anos letivos encerrados (padrão: "arquivo" ao lado do banco)
+PASTA_ARQUIVO = os.getenv("FREQUENCIA_PASTA_ARQUIVO")
+
+# Canal de eventos ao vivo (/eventos): intervalo do keep-alive (segundos) e
+# eventos guardados por assinante antes de mandá-lo recarregar tudo
+EVENTOS_PING_S = float(os.getenv("FREQUENCIA_EVENTOS_PING_S", "15"))
+EVENTOS_FILA = int(os.getenv("FREQUENCIA_EVENTOS_FILA", "256"))
+
+# Frequência mínima para aprovação (%), usada na projeção de faltas restantes
+FREQUENCIA_MINIMA = float(os.getenv("FREQUENCIA_MINIMA", "75"))
+
+# Cache em memória dos relatórios (número máximo de entradas; 0 desliga)
+CACHE_RELATORIOS_MAX = int(os.getenv("FREQUENCIA_CACHE_RELATORIOS", "10000"))
+
+# Métricas por rota em /metrics (formato Prometheus) e alerta de N+1 acima de
+# LIMITE_CONSULTAS comandos SQL em uma requisição
+METRICAS = _flag("FREQUENCIA_METRICAS")
+METRICAS_LIMITE_CONSULTAS = int(os.getenv("FREQUENCIA_METRICAS_LIMITE_CONSULTAS", "20"))
+
+# Log de consultas lentas com comando e parâmetros (milissegundos; 0 desliga)
+CONSULTA_LENTA_MS = float(os.getenv("FREQUENCIA_CONSULTA_LENTA_MS", "0"))
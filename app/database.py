@@ -1,11 +1,28 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, ForeignKey, Boolean, Table
+from sqlalchemy import create_engine, event, func, Column, Integer, String, DateTime, ForeignKey, Boolean, Table, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
+from app import config
 
-SQLITE_DATABASE_URL = "sqlite:///./data/frequencia.db"
+SQLITE_DATABASE_URL = config.DATABASE_URL
 
 engine = create_engine(SQLITE_DATABASE_URL, connect_args={"check_same_thread": False})
+
+def configurar_conexao_sqlite(dbapi_connection, connection_record):
+    # WAL: leituras não esperam pela escrita em andamento; escritores esperam o lock em vez de falhar
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=30000")
+    cursor.close()
+
+event.listen(engine, "connect", configurar_conexao_sqlite)
+
+# Hooks de contagem e tempo das consultas só quando alguém vai usá-los
+if config.METRICAS or config.CONSULTA_LENTA_MS:
+    from app.services.metricas import metricas
+    metricas.instrumentar(engine)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -14,7 +31,8 @@ aluno_disciplina = Table(
     'aluno_disciplina',
     Base.metadata,
     Column('aluno_id', Integer, ForeignKey('alunos.id'), primary_key=True),
-    Column('disciplina_id', Integer, ForeignKey('disciplinas.id'), primary_key=True)
+    Column('disciplina_id', Integer, ForeignKey('disciplinas.id'), primary_key=True),
+    Index('ix_aluno_disciplina_disciplina', 'disciplina_id', 'aluno_id')
 )
 
 class Turma(Base):
@@ -49,6 +67,10 @@ class Aluno(Base):
     turma = relationship("Turma", back_populates="alunos")
     disciplinas = relationship("Disciplina", secondary=aluno_disciplina, back_populates="alunos")
     frequencias = relationship("Frequencia", back_populates="aluno")
+    
+    __table_args__ = (
+        Index('ix_alunos_turma', 'turma_id'),
+    )
 
 class Sessao(Base):
     __tablename__ = "sessoes"
@@ -61,6 +83,12 @@ class Sessao(Base):
     turma = relationship("Turma", back_populates="sessoes")
     disciplina = relationship("Disciplina", back_populates="sessoes")
     frequencias = relationship("Frequencia", back_populates="sessao")
+    
+    __table_args__ = (
+        Index('ix_sessoes_turma_disciplina_data', 'turma_id', 'disciplina_id', 'data'),
+        # Dia da sessão: filtros por período e séries temporais agrupam por ele
+        Index('ix_sessoes_dia', func.date(data)),
+    )
 
 class Frequencia(Base):
     __tablename__ = "frequencias"
@@ -74,12 +102,94 @@ class Frequencia(Base):
     
     aluno = relationship("Aluno", back_populates="frequencias")
     sessao = relationship("Sessao", back_populates="frequencias")
+    
+    __table_args__ = (
+        Index('uq_frequencias_aluno_sessao', 'aluno_id', 'sessao_id', unique=True),
+        # Índices de cobertura: os relatórios leem presente/justificado sem acessar a tabela
+        Index('ix_frequencias_aluno_cobertura', 'aluno_id', 'sessao_id', 'presente', 'justificado'),
+        Index('ix_frequencias_sessao_cobertura', 'sessao_id', 'aluno_id', 'presente', 'justificado'),
+        # Marca d'água do motor analítico: registros remarcados desde a última leitura
+        Index('ix_frequencias_data_registro', 'data_registro'),
+    )
+
+# Contadores mantidos incrementalmente pela marcação de frequência
+class ContadorAluno(Base):
+    __tablename__ = "contadores_aluno"
+    aluno_id = Column(Integer, ForeignKey("alunos.id"), primary_key=True)
+    presencas = Column(Integer, nullable=False, default=0)
+    faltas = Column(Integer, nullable=False, default=0)
+    faltas_justificadas = Column(Integer, nullable=False, default=0)
+
+class ContadorAlunoDisciplina(Base):
+    __tablename__ = "contadores_aluno_disciplina"
+    aluno_id = Column(Integer, ForeignKey("alunos.id"), primary_key=True)
+    disciplina_id = Column(Integer, ForeignKey("disciplinas.id"), primary_key=True)
+    presencas = Column(Integer, nullable=False, default=0)
+    faltas = Column(Integer, nullable=False, default=0)
+    faltas_justificadas = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index('ix_contadores_aluno_disciplina_disciplina', 'disciplina_id', 'aluno_id'),
+    )
+
+# Totais por sessão: as séries temporais agregam sessões, não registros
+class ContadorSessao(Base):
+    __tablename__ = "contadores_sessao"
+    sessao_id = Column(Integer, ForeignKey("sessoes.id"), primary_key=True)
+    presencas = Column(Integer, nullable=False, default=0)
+    faltas = Column(Integer, nullable=False, default=0)
+    faltas_justificadas = Column(Integer, nullable=False, default=0)
+
+# Anos letivos arquivados: sessoes, frequencias e contadores_sessao do ano foram
+# movidos para um arquivo SQLite próprio (app/services/arquivamento.py)
+class ArquivoAnual(Base):
+    __tablename__ = "arquivos_anuais"
+    ano = Column(Integer, primary_key=True)
+    sessoes = Column(Integer, nullable=False, default=0)
+    frequencias = Column(Integer, nullable=False, default=0)
+    arquivado_em = Column(DateTime, default=datetime.utcnow)
+
+# Totais de cada aluno/disciplina nos anos arquivados (disciplina_id 0: sessões sem
+# disciplina); respondem períodos que cobrem o ano inteiro sem anexar o arquivo
+class ResumoAnual(Base):
+    __tablename__ = "resumos_anuais"
+    ano = Column(Integer, primary_key=True)
+    aluno_id = Column(Integer, ForeignKey("alunos.id"), primary_key=True)
+    disciplina_id = Column(Integer, primary_key=True)
+    presencas = Column(Integer, nullable=False, default=0)
+    faltas = Column(Integer, nullable=False, default=0)
+    faltas_justificadas = Column(Integer, nullable=False, default=0)
+
+# Registro de mudanças lido por /sync: uma linha por registro criado ou alterado.
+# O id (autoincremento, nunca reaproveitado) é o cursor dos clientes offline.
+class MudancaSync(Base):
+    __tablename__ = "mudancas_sync"
+    id = Column(Integer, primary_key=True)
+    entidade = Column(String, nullable=False)  # turma, disciplina, aluno, sessao, frequencia
+    registro_id = Column(Integer, nullable=False)
+    
+    __table_args__ = {"sqlite_autoincrement": True}
+
+# Ids gerados pelos clientes para as marcações enviadas a /sync/frequencias: um
+# reenvio com o mesmo id não é processado de novo
+class EnvioSync(Base):
+    __tablename__ = "envios_sync"
+    id_cliente = Column(String, primary_key=True)
+    aluno_id = Column(Integer, nullable=False)
+    sessao_id = Column(Integer, nullable=False)
+    recebido_em = Column(DateTime, default=datetime.utcnow)
+
+# Versão das escritas em massa (importação, recontagem, arquivamento), em uma
+# linha só (id 1). Outros processos comparam com a última vista para saber que
+# o cache de relatórios e os ETags deles ficaram velhos.
+class VersaoDados(Base):
+    __tablename__ = "versao_dados"
+    id = Column(Integer, primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
 
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
-
-Base.metadata.create_all(bind=engine)
\ No newline at end of file
+        db.close()
\ No newline at end of file
@@ -0,0 +1,20 @@
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy import event
+from app import config
+from app.database import SQLITE_DATABASE_URL, configurar_conexao_sqlite
+
+# Mesmo banco do engine síncrono, acessado pelo driver aiosqlite
+ASYNC_DATABASE_URL = SQLITE_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+async_engine = create_async_engine(ASYNC_DATABASE_URL)
+event.listen(async_engine.sync_engine, "connect", configurar_conexao_sqlite)
+if config.METRICAS or config.CONSULTA_LENTA_MS:
+    from app.services.metricas import metricas
+    metricas.instrumentar(async_engine.sync_engine)
+# expire_on_commit=False: os objetos retornados são serializados fora da sessão,
+# onde um lazy load não pode mais fazer I/O
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,134 @@
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base, Turma, Disciplina, Aluno, Sessao, Frequencia
+from app.schemas import TurmaCreate, DisciplinaCreate, AlunoCreate, SessaoCreate, MatricularAluno, FrequenciaIndividual, FrequenciaLoteItem, AgendaSessoes, HorarioSemanal, FrequenciaSync
+from app.services.frequencia_service import FrequenciaService
+from app.services.matriculas import IndiceMatriculas
+
+# Chamadas que exercitam todas as consultas do FrequenciaService.
+# As consultas são capturadas em um banco temporário em memória (as escritas não
+# tocam o banco real) e o EXPLAIN QUERY PLAN roda depois no banco alvo.
+CHAMADAS = [
+    ("criar_turma", lambda db, ids: FrequenciaService.criar_turma(db, TurmaCreate(nome="Explain", ano=2024, periodo="Manhã"))),
+    ("listar_turmas", lambda db, ids: FrequenciaService.listar_turmas(db)),
+    ("get_turma", lambda db, ids: FrequenciaService.get_turma(db, ids["turma"])),
+    ("criar_disciplina", lambda db, ids: FrequenciaService.criar_disciplina(db, DisciplinaCreate(nome="Explain", codigo="EXP", carga_horaria=1, professor="-"))),
+    ("listar_disciplinas", lambda db, ids: FrequenciaService.listar_disciplinas(db)),
+    ("get_disciplina", lambda db, ids: FrequenciaService.get_disciplina(db, ids["disciplina"])),
+    ("criar_aluno", lambda db, ids: FrequenciaService.criar_aluno(db, AlunoCreate(nome="Explain", matricula="EXP", turma_id=ids["turma"], disciplina_ids=[ids["disciplina"]]))),
+    ("importar_alunos", lambda db, ids: FrequenciaService.importar_alunos(db, [(1, {"nome": "Explain", "matricula": "EXP-IMP", "turma": "T", "disciplinas": "D"})])),
+    ("matricular_aluno_disciplina", lambda db, ids: FrequenciaService.matricular_aluno_disciplina(db, MatricularAluno(aluno_id=ids["aluno"], disciplina_id=ids["disciplina"]))),
+    ("listar_alunos_turma", lambda db, ids: FrequenciaService.listar_alunos_turma(db, ids["turma"])),
+    ("listar_alunos", lambda db, ids: FrequenciaService.listar_alunos(db, limit=100, cursor="WyIiLCAwXQ", ordem="nome", fields="id,nome")),
+    ("listar_alunos_turma (página)", lambda db, ids: FrequenciaService.listar_alunos_turma(db, ids["turma"], limit=100, cursor="WzBd")),
+    ("listar_alunos_disciplina", lambda db, ids: FrequenciaService.listar_alunos_disciplina(db, ids["disciplina"])),
+    ("listar_alunos_disciplina (página)", lambda db, ids: FrequenciaService.listar_alunos_disciplina(db, ids["disciplina"], limit=100, cursor="WzBd", fields="id,nome")),
+    ("criar_sessao", lambda db, ids: FrequenciaService.criar_sessao(db, SessaoCreate(turma_id=ids["turma"], disciplina_id=ids["disciplina"]))),
+    ("agendar_sessoes", lambda db, ids: FrequenciaService.agendar_sessoes(db, AgendaSessoes(inicio=ids["inicio"], fim=ids["fim"], horarios=[HorarioSemanal(turma_id=ids["turma"], disciplina_id=ids["disciplina"], dia_semana=0, horario="08:00")]))),
+    ("marcar_frequencia_individual", lambda db, ids: FrequenciaService.marcar_frequencia_individual(db, FrequenciaIndividual(aluno_id=ids["aluno"], disciplina_id=ids["disciplina"]))),
+    ("marcar_frequencia_lote", lambda db, ids: FrequenciaService.marcar_frequencia_lote(db, ids["sessao"], [FrequenciaLoteItem(aluno_id=ids["aluno"], presente=False)])),
+    ("sincronizar_frequencias", lambda db, ids: FrequenciaService.sincronizar_frequencias(db, [FrequenciaSync(id_cliente="explain", aluno_id=ids["aluno"], sessao_id=ids["sessao"])])),
+    ("sincronizar", lambda db, ids: FrequenciaService.sincronizar(db, 0)),
+    ("sincronizar (turma)", lambda db, ids: FrequenciaService.sincronizar(db, 0, turma_id=ids["turma"])),
+    ("relatorio_aluno", lambda db, ids: FrequenciaService.relatorio_aluno(db, ids["aluno"])),
+    ("relatorio_aluno_disciplina", lambda db, ids: FrequenciaService.relatorio_aluno_disciplina(db, ids["aluno"], ids["disciplina"])),
+    ("relatorio_turma", lambda db, ids: FrequenciaService.relatorio_turma(db, ids["turma"])),
+    ("relatorio_aluno (período)", lambda db, ids: FrequenciaService.relatorio_aluno(db, ids["aluno"], inicio=ids["inicio"], fim=ids["fim"])),
+    ("relatorio_aluno_disciplina (período)", lambda db, ids: FrequenciaService.relatorio_aluno_disciplina(db, ids["aluno"], ids["disciplina"], inicio=ids["inicio"], fim=ids["fim"])),
+    ("relatorio_turma (período)", lambda db, ids: FrequenciaService.relatorio_turma(db, ids["turma"], inicio=ids["inicio"], fim=ids["fim"])),
+    ("dashboard", lambda db, ids: FrequenciaService.dashboard(db)),
+    ("dashboard (período)", lambda db, ids: FrequenciaService.dashboard(db, inicio=ids["inicio"], fim=ids["fim"])),
+    ("matriz_frequencia", lambda db, ids: FrequenciaService.matriz_frequencia(db)),
+    ("matriz_frequencia (turma)", lambda db, ids: FrequenciaService.matriz_frequencia(db, turma_id=ids["turma"])),
+    ("matriz_frequencia (disciplina)", lambda db, ids: FrequenciaService.matriz_frequencia(db, disciplina_id=ids["disciplina"])),
+    ("matriz_frequencia (turma, período)", lambda db, ids: FrequenciaService.matriz_frequencia(db, turma_id=ids["turma"], inicio=ids["inicio"], fim=ids["fim"])),
+    ("serie_frequencia", lambda db, ids: FrequenciaService.serie_frequencia(db, "semana", inicio=ids["inicio"], fim=ids["fim"])),
+    ("serie_frequencia (mês, por turma)", lambda db, ids: FrequenciaService.serie_frequencia(db, "mes", por="turma")),
+    ("serie_frequencia (disciplina)", lambda db, ids: FrequenciaService.serie_frequencia(db, "dia", disciplina_id=ids["disciplina"], inicio=ids["inicio"], fim=ids["fim"])),
+    ("alunos_em_risco", lambda db, ids: FrequenciaService.alunos_em_risco(db)),
+    ("alunos_em_risco (por disciplina)", lambda db, ids: FrequenciaService.alunos_em_risco(db, por_disciplina=True, min_sessoes=5, k=20)),
+    ("alunos_em_risco (turma, disciplina, período)", lambda db, ids: FrequenciaService.alunos_em_risco(db, 50, turma_id=ids["turma"], disciplina_id=ids["disciplina"], inicio=ids["inicio"], fim=ids["fim"])),
+    ("linhas_exportacao", lambda db, ids: list(FrequenciaService.linhas_exportacao(db))),
+    ("linhas_exportacao (turma)", lambda db, ids: list(FrequenciaService.linhas_exportacao(db, turma_id=ids["turma"]))),
+    ("linhas_exportacao (disciplina)", lambda db, ids: list(FrequenciaService.linhas_exportacao(db, disciplina_id=ids["disciplina"]))),
+    ("linhas_exportacao (turma, período)", lambda db, ids: list(FrequenciaService.linhas_exportacao(db, turma_id=ids["turma"], inicio=ids["inicio"], fim=ids["fim"]))),
+    ("lotes_colunares (frequencias)", lambda db, ids: list(FrequenciaService.lotes_colunares(db, "frequencias"))),
+    ("lotes_colunares (frequencias, período)", lambda db, ids: list(FrequenciaService.lotes_colunares(db, "frequencias", inicio=ids["inicio"], fim=ids["fim"]))),
+    ("lotes_colunares (sessoes)", lambda db, ids: list(FrequenciaService.lotes_colunares(db, "sessoes"))),
+    ("lotes_colunares (alunos_disciplinas)", lambda db, ids: list(FrequenciaService.lotes_colunares(db, "alunos_disciplinas"))),
+    ("IndiceMatriculas.carregar", lambda db, ids: IndiceMatriculas().carregar(db)),
+    ("reconstruir_contadores", lambda db, ids: FrequenciaService.reconstruir_contadores(db)),
+]
+
+def _banco_rascunho():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    turma = Turma(nome="T", ano=2024, periodo="Manhã")
+    disciplina = Disciplina(nome="D", codigo="D", carga_horaria=1, professor="-")
+    db.add_all([turma, disciplina])
+    db.flush()
+    aluno = Aluno(nome="A", matricula="A", turma_id=turma.id, disciplinas=[disciplina])
+    sessao = Sessao(turma_id=turma.id, disciplina_id=disciplina.id, data=datetime.now())
+    db.add_all([aluno, sessao])
+    db.flush()
+    db.add(Frequencia(aluno_id=aluno.id, sessao_id=sessao.id))
+    db.commit()
+    ids = {"turma": turma.id, "disciplina": disciplina.id, "aluno": aluno.id, "sessao": sessao.id,
+           "inicio": sessao.data.date() - timedelta(days=30), "fim": sessao.data.date()}
+    db.close()
+    return engine, ids
+
+def capturar_consultas():
+    engine, ids = _banco_rascunho()
+    capturadas = []
+    atual = {"nome": None}
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _capturar(conn, cursor, statement, parameters, context, executemany):
+        # executemany traz uma lista de conjuntos de parâmetros; o INSERT de várias
+        # linhas com RETURNING (insertmanyvalues) já vem com os valores achatados
+        if executemany and parameters and isinstance(parameters[0], (list, tuple, dict)):
+            parameters = parameters[0]
+        capturadas.append((atual["nome"], statement, parameters))
+
+    Session = sessionmaker(bind=engine, autoflush=False)
+    for nome, chamada in CHAMADAS:
+        atual["nome"] = nome
+        db = Session()
+        try:
+            chamada(db, ids)
+        finally:
+            db.close()
+    engine.dispose()
+    return capturadas
+
+def _formatar_plano(linhas):
+    # Mesma indentação em árvore usada pelo shell do sqlite3
+    niveis = {0: -1}
+    saida = []
+    for id_no, pai, _, detalhe in linhas:
+        nivel = niveis.get(pai, -1) + 1
+        niveis[id_no] = nivel
+        saida.append("    " + "  " * nivel + "- " + detalhe)
+    return saida
+
+def explicar_consultas(engine: Engine):
+    vistas = set()
+    with engine.connect() as conn:
+        for nome, statement, parameters in capturar_consultas():
+            comando = statement.lstrip().split(None, 1)[0].upper()
+            if comando not in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+                continue
+            if (nome, statement) in vistas:
+                continue
+            vistas.add((nome, statement))
+            print(f"== {nome}")
+            print("   " + " ".join(statement.split()))
+            linhas = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+            for linha in _formatar_plano(linhas):
+                print(linha)
+            print()
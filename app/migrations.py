@@ -0,0 +1,165 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from app.database import Base, engine as engine_padrao
+
+# Migrações versionadas. A versão do esquema fica em PRAGMA user_version.
+# Bancos novos são criados direto dos modelos (que já declaram todos os índices)
+# e marcados com a última versão; bancos existentes recebem só o que falta.
+# Uma migração é SQL fixo: não chama o serviço, que muda depois dela e pode
+# depender de tabelas que só migrações posteriores criam.
+
+def _m001_unicidade_frequencias(conn: Connection):
+    # Manter só o registro mais recente de cada (aluno, sessão) antes de criar o índice único
+    conn.execute(text(
+        "DELETE FROM frequencias WHERE id NOT IN "
+        "(SELECT MAX(id) FROM frequencias GROUP BY aluno_id, sessao_id)"
+    ))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_frequencias_aluno_sessao "
+        "ON frequencias (aluno_id, sessao_id)"
+    ))
+
+def _m002_indices_compostos(conn: Connection):
+    for comando in (
+        "CREATE INDEX IF NOT EXISTS ix_frequencias_aluno_cobertura "
+        "ON frequencias (aluno_id, sessao_id, presente, justificado)",
+        "CREATE INDEX IF NOT EXISTS ix_frequencias_sessao_cobertura "
+        "ON frequencias (sessao_id, aluno_id, presente, justificado)",
+        "CREATE INDEX IF NOT EXISTS ix_sessoes_turma_disciplina_data "
+        "ON sessoes (turma_id, disciplina_id, data)",
+        "CREATE INDEX IF NOT EXISTS ix_aluno_disciplina_disciplina "
+        "ON aluno_disciplina (disciplina_id, aluno_id)",
+        "CREATE INDEX IF NOT EXISTS ix_alunos_turma ON alunos (turma_id)",
+    ):
+        conn.execute(text(comando))
+    conn.execute(text("ANALYZE"))
+
+# Presença, falta e falta justificada de cada registro de frequencias, somadas
+# (mesma regra de _somas_categoria no serviço, congelada aqui)
+_SOMAS_CATEGORIA = (
+    "SUM(CASE WHEN f.presente THEN 1 ELSE 0 END), "
+    "SUM(CASE WHEN f.presente THEN 0 ELSE 1 END), "
+    "SUM(CASE WHEN f.presente THEN 0 WHEN f.justificado THEN 1 ELSE 0 END)"
+)
+
+def _m003_contadores(conn: Connection):
+    for comando in (
+        "CREATE TABLE IF NOT EXISTS contadores_aluno ("
+        "aluno_id INTEGER NOT NULL, presencas INTEGER NOT NULL, faltas INTEGER NOT NULL, "
+        "faltas_justificadas INTEGER NOT NULL, PRIMARY KEY (aluno_id), "
+        "FOREIGN KEY(aluno_id) REFERENCES alunos (id))",
+        "CREATE TABLE IF NOT EXISTS contadores_aluno_disciplina ("
+        "aluno_id INTEGER NOT NULL, disciplina_id INTEGER NOT NULL, presencas INTEGER NOT NULL, "
+        "faltas INTEGER NOT NULL, faltas_justificadas INTEGER NOT NULL, "
+        "PRIMARY KEY (aluno_id, disciplina_id), FOREIGN KEY(aluno_id) REFERENCES alunos (id), "
+        "FOREIGN KEY(disciplina_id) REFERENCES disciplinas (id))",
+        "CREATE INDEX IF NOT EXISTS ix_contadores_aluno_disciplina_disciplina "
+        "ON contadores_aluno_disciplina (disciplina_id, aluno_id)",
+        "DELETE FROM contadores_aluno",
+        "DELETE FROM contadores_aluno_disciplina",
+        "INSERT INTO contadores_aluno (aluno_id, presencas, faltas, faltas_justificadas) "
+        f"SELECT f.aluno_id, {_SOMAS_CATEGORIA} FROM frequencias f "
+        "WHERE f.aluno_id IS NOT NULL GROUP BY f.aluno_id",
+        "INSERT INTO contadores_aluno_disciplina (aluno_id, disciplina_id, presencas, faltas, faltas_justificadas) "
+        f"SELECT f.aluno_id, s.disciplina_id, {_SOMAS_CATEGORIA} FROM frequencias f "
+        "JOIN sessoes s ON s.id = f.sessao_id "
+        "WHERE f.aluno_id IS NOT NULL AND s.disciplina_id IS NOT NULL GROUP BY f.aluno_id, s.disciplina_id",
+    ):
+        conn.execute(text(comando))
+
+def _m004_series_temporais(conn: Connection):
+    for comando in (
+        "CREATE INDEX IF NOT EXISTS ix_sessoes_dia ON sessoes (date(data))",
+        "CREATE TABLE IF NOT EXISTS contadores_sessao ("
+        "sessao_id INTEGER NOT NULL, presencas INTEGER NOT NULL, faltas INTEGER NOT NULL, "
+        "faltas_justificadas INTEGER NOT NULL, PRIMARY KEY (sessao_id), "
+        "FOREIGN KEY(sessao_id) REFERENCES sessoes (id))",
+        "DELETE FROM contadores_sessao",
+        "INSERT INTO contadores_sessao (sessao_id, presencas, faltas, faltas_justificadas) "
+        f"SELECT f.sessao_id, {_SOMAS_CATEGORIA} FROM frequencias f "
+        "WHERE f.sessao_id IS NOT NULL GROUP BY f.sessao_id",
+        "ANALYZE sessoes",
+    ):
+        conn.execute(text(comando))
+
+def _m005_indice_data_registro(conn: Connection):
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_frequencias_data_registro ON frequencias (data_registro)"
+    ))
+
+def _m006_arquivamento(conn: Connection):
+    for comando in (
+        "CREATE TABLE IF NOT EXISTS arquivos_anuais ("
+        "ano INTEGER NOT NULL, sessoes INTEGER NOT NULL, frequencias INTEGER NOT NULL, "
+        "arquivado_em DATETIME, PRIMARY KEY (ano))",
+        "CREATE TABLE IF NOT EXISTS resumos_anuais ("
+        "ano INTEGER NOT NULL, aluno_id INTEGER NOT NULL, disciplina_id INTEGER NOT NULL, "
+        "presencas INTEGER NOT NULL, faltas INTEGER NOT NULL, faltas_justificadas INTEGER NOT NULL, "
+        "PRIMARY KEY (ano, aluno_id, disciplina_id), FOREIGN KEY(aluno_id) REFERENCES alunos (id))",
+    ):
+        conn.execute(text(comando))
+
+def _m007_sincronizacao(conn: Connection):
+    for comando in (
+        "CREATE TABLE IF NOT EXISTS mudancas_sync ("
+        "id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, entidade VARCHAR NOT NULL, "
+        "registro_id INTEGER NOT NULL)",
+        "CREATE TABLE IF NOT EXISTS envios_sync ("
+        "id_cliente VARCHAR NOT NULL, aluno_id INTEGER NOT NULL, sessao_id INTEGER NOT NULL, "
+        "recebido_em DATETIME, PRIMARY KEY (id_cliente))",
+    ):
+        conn.execute(text(comando))
+    # Cadastros e sessões já gravados entram no registro para a primeira
+    # sincronização; as frequências antigas ficam de fora (ver preencher_registro)
+    for entidade, tabela in (("turma", "turmas"), ("disciplina", "disciplinas"),
+                             ("aluno", "alunos"), ("sessao", "sessoes")):
+        conn.execute(text(
+            f"INSERT INTO mudancas_sync (entidade, registro_id) SELECT '{entidade}', id FROM {tabela} ORDER BY id"
+        ))
+
+def _m008_versao_dados(conn: Connection):
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS versao_dados ("
+        "id INTEGER NOT NULL, versao INTEGER NOT NULL, PRIMARY KEY (id))"
+    ))
+
+MIGRACOES = [
+    (1, "Índice único (aluno_id, sessao_id) em frequencias", _m001_unicidade_frequencias),
+    (2, "Índices compostos para marcação e relatórios", _m002_indices_compostos),
+    (3, "Tabelas de contadores de frequência por aluno e por aluno/disciplina", _m003_contadores),
+    (4, "Índice pelo dia da sessão e contadores por sessão para filtros por período e séries", _m004_series_temporais),
+    (5, "Índice em frequencias.data_registro para o motor analítico", _m005_indice_data_registro),
+    (6, "Registro de anos arquivados e resumos anuais por aluno/disciplina", _m006_arquivamento),
+    (7, "Registro de mudanças e envios dos clientes offline (/sync)", _m007_sincronizacao),
+    (8, "Versão das escritas em massa, para o cache de outros processos", _m008_versao_dados),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+def versao_banco(conn: Connection) -> int:
+    return conn.execute(text("PRAGMA user_version")).scalar()
+
+def _definir_versao(conn: Connection, versao: int):
+    # PRAGMA não aceita parâmetros
+    conn.execute(text(f"PRAGMA user_version = {int(versao)}"))
+
+def aplicar_migracoes(engine: Engine = engine_padrao, verbose: bool = False):
+    with engine.begin() as conn:
+        versao = versao_banco(conn)
+        if versao == 0 and not inspect(conn).has_table("frequencias"):
+            Base.metadata.create_all(bind=conn)
+            _definir_versao(conn, VERSAO_ATUAL)
+            if verbose:
+                print(f"Banco criado na versão {VERSAO_ATUAL}")
+            return VERSAO_ATUAL
+
+    for numero, descricao, migracao in MIGRACOES:
+        if numero <= versao:
+            continue
+        with engine.begin() as conn:
+            migracao(conn)
+            _definir_versao(conn, numero)
+        versao = numero
+        if verbose:
+            print(f"Migração {numero:03d} aplicada: {descricao}")
+    return versao
@@ -1,82 +1,236 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.schemas import TurmaCreate, AlunoCreate, SessaoCreate, FrequenciaLote, DisciplinaCreate, MatricularAluno, FrequenciaIndividual
+from app.schemas import (
+    TurmaCreate, AlunoCreate, SessaoCreate, AgendaSessoes, FrequenciaLote, EnvioFrequencias, DisciplinaCreate, MatricularAluno, FrequenciaIndividual,
+    Turma, Disciplina, Aluno, Sessao, TurmaItem, DisciplinaItem, AlunoItem, Pagina, Mensagem, ResultadoMatricula,
+    ResultadoLote, ResultadoImportacao, RelatorioAluno, RelatorioAlunoDisciplina, RelatorioAlunoTurma,
+    MatrizFrequencia, Dashboard, EstatisticasCache, SerieFrequencia, AlunoEmRisco, ResultadoAgenda,
+    ResultadoSincronizacao, Sincronizacao
+)
 from app.services.frequencia_service import FrequenciaService
-from typing import List
+from app.services.coalescer import agrupador_escritas
+from app.services.cache import cache_relatorios
+from app.routes.condicional import etag_aluno, etag_turma, etag_geral, etag_cadastro
+from app.services.exportacao import resposta_csv
+from app.services import colunar
+from app.services.importacao import ler_alunos, detectar_formato
+from typing import List, Optional, Union
+from datetime import date
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/turmas/")
+@router.post("/turmas/", response_model=Turma)
 def criar_turma(turma: TurmaCreate, db: Session = Depends(get_db)):
     return FrequenciaService.criar_turma(db, turma)
 
-@router.get("/turmas/")
-def listar_turmas(db: Session = Depends(get_db)):
-    return FrequenciaService.listar_turmas(db)
+@router.get("/turmas/", response_model=Union[List[TurmaItem], Pagina[TurmaItem]], response_model_exclude_unset=True, dependencies=[Depends(etag_cadastro)])
+def listar_turmas(limit: Optional[int] = Query(None, ge=1, le=1000), cursor: Optional[str] = None, ordem: str = "id", fields: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.listar_turmas(db, limit=limit, cursor=cursor, ordem=ordem, fields=fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/disciplinas/")
+@router.post("/disciplinas/", response_model=Disciplina)
 def criar_disciplina(disciplina: DisciplinaCreate, db: Session = Depends(get_db)):
     return FrequenciaService.criar_disciplina(db, disciplina)
 
-@router.get("/disciplinas/")
-def listar_disciplinas(db: Session = Depends(get_db)):
-    return FrequenciaService.listar_disciplinas(db)
+@router.get("/disciplinas/", response_model=Union[List[DisciplinaItem], Pagina[DisciplinaItem]], response_model_exclude_unset=True, dependencies=[Depends(etag_cadastro)])
+def listar_disciplinas(limit: Optional[int] = Query(None, ge=1, le=1000), cursor: Optional[str] = None, ordem: str = "id", fields: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.listar_disciplinas(db, limit=limit, cursor=cursor, ordem=ordem, fields=fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/disciplinas/{disciplina_id}")
+@router.get("/disciplinas/{disciplina_id}", response_model=Disciplina, dependencies=[Depends(etag_cadastro)])
 def get_disciplina(disciplina_id: int, db: Session = Depends(get_db)):
     disciplina = FrequenciaService.get_disciplina(db, disciplina_id)
     if not disciplina:
         raise HTTPException(status_code=404, detail="Disciplina não encontrada")
     return disciplina
 
-@router.post("/alunos/")
+@router.post("/alunos/", response_model=Aluno)
 def criar_aluno(aluno: AlunoCreate, db: Session = Depends(get_db)):
     return FrequenciaService.criar_aluno(db, aluno)
 
-@router.get("/turmas/{turma_id}/alunos/")
-def listar_alunos_turma(turma_id: int, db: Session = Depends(get_db)):
-    return FrequenciaService.listar_alunos_turma(db, turma_id)
+@router.get("/alunos/", response_model=Union[List[AlunoItem], Pagina[AlunoItem]], response_model_exclude_unset=True, dependencies=[Depends(etag_cadastro)])
+def listar_alunos(limit: Optional[int] = Query(None, ge=1, le=1000), cursor: Optional[str] = None, ordem: str = "id", fields: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.listar_alunos(db, limit=limit, cursor=cursor, ordem=ordem, fields=fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/disciplinas/{disciplina_id}/alunos/")
-def listar_alunos_disciplina(disciplina_id: int, db: Session = Depends(get_db)):
-    return FrequenciaService.listar_alunos_disciplina(db, disciplina_id)
+@router.post("/importar/alunos", response_model=ResultadoImportacao)
+def importar_alunos(arquivo: UploadFile = File(...), formato: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        registros = ler_alunos(arquivo.file, formato or detectar_formato(arquivo.filename))
+        return FrequenciaService.importar_alunos(db, registros)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/matricular/")
+@router.get("/turmas/{turma_id}/alunos/", response_model=Union[List[AlunoItem], Pagina[AlunoItem]], response_model_exclude_unset=True, dependencies=[Depends(etag_cadastro)])
+def listar_alunos_turma(turma_id: int, limit: Optional[int] = Query(None, ge=1, le=1000), cursor: Optional[str] = None, ordem: str = "id", fields: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.listar_alunos_turma(db, turma_id, limit=limit, cursor=cursor, ordem=ordem, fields=fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/disciplinas/{disciplina_id}/alunos/", response_model=Union[List[AlunoItem], Pagina[AlunoItem]], response_model_exclude_unset=True, dependencies=[Depends(etag_cadastro)])
+def listar_alunos_disciplina(disciplina_id: int, limit: Optional[int] = Query(None, ge=1, le=1000), cursor: Optional[str] = None, ordem: str = "id", fields: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.listar_alunos_disciplina(db, disciplina_id, limit=limit, cursor=cursor, ordem=ordem, fields=fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/matricular/", response_model=ResultadoMatricula, response_model_exclude_none=True)
 def matricular_aluno_disciplina(matricula: MatricularAluno, db: Session = Depends(get_db)):
     return FrequenciaService.matricular_aluno_disciplina(db, matricula)
 
-@router.post("/sessoes/")
+@router.post("/sessoes/", response_model=Sessao)
 def criar_sessao(sessao: SessaoCreate, db: Session = Depends(get_db)):
     return FrequenciaService.criar_sessao(db, sessao)
 
-@router.post("/frequencias/individual/")
+@router.post("/sessoes/agenda/", response_model=ResultadoAgenda)
+def agendar_sessoes(agenda: AgendaSessoes, db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.agendar_sessoes(db, agenda)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/frequencias/individual/", response_model=Mensagem)
 def marcar_frequencia_individual(frequencia: FrequenciaIndividual, db: Session = Depends(get_db)):
     try:
+        if agrupador_escritas.ativo:
+            return agrupador_escritas.aguardar(agrupador_escritas.enviar_individual(frequencia))
         return FrequenciaService.marcar_frequencia_individual(db, frequencia)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-@router.post("/frequencias/lote/")
+@router.post("/frequencias/lote/", response_model=ResultadoLote, response_model_exclude_unset=True)
 def marcar_frequencia_lote(frequencia_lote: FrequenciaLote, db: Session = Depends(get_db)):
-    return FrequenciaService.marcar_frequencia_lote(
-        db, 
-        frequencia_lote.sessao_id, 
-        frequencia_lote.frequencias
-    )
+    try:
+        if agrupador_escritas.ativo:
+            return agrupador_escritas.aguardar(
+                agrupador_escritas.enviar_lote(frequencia_lote.sessao_id, frequencia_lote.frequencias)
+            )
+        return FrequenciaService.marcar_frequencia_lote(
+            db, 
+            frequencia_lote.sessao_id, 
+            frequencia_lote.frequencias
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except TimeoutError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.post("/sync/frequencias", response_model=ResultadoSincronizacao, response_model_exclude_none=True)
+def sincronizar_frequencias(envio: EnvioFrequencias, db: Session = Depends(get_db)):
+    try:
+        if agrupador_escritas.ativo:
+            return agrupador_escritas.aguardar(agrupador_escritas.enviar_sincronizacao(envio.registros))
+        return FrequenciaService.sincronizar_frequencias(db, envio.registros)
+    except TimeoutError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@router.get("/sync", response_model=Sincronizacao)
+def sincronizar(since: int = Query(0, ge=0), turma_id: Optional[int] = None, limit: Optional[int] = Query(None, ge=1, le=5000), db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.sincronizar(db, since, turma_id=turma_id, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/relatorio/aluno/{aluno_id}", response_model=RelatorioAluno, dependencies=[Depends(etag_aluno)])
+def relatorio_aluno(aluno_id: int, inicio: Optional[date] = None, fim: Optional[date] = None, db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.relatorio_aluno(db, aluno_id, inicio=inicio, fim=fim)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/relatorio/aluno/{aluno_id}/disciplina/{disciplina_id}", response_model=RelatorioAlunoDisciplina, dependencies=[Depends(etag_aluno)])
+def relatorio_aluno_disciplina(aluno_id: int, disciplina_id: int, inicio: Optional[date] = None, fim: Optional[date] = None, db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.relatorio_aluno_disciplina(db, aluno_id, disciplina_id, inicio=inicio, fim=fim)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/relatorio/aluno/{aluno_id}")
-def relatorio_aluno(aluno_id: int, db: Session = Depends(get_db)):
-    return FrequenciaService.relatorio_aluno(db, aluno_id)
+@router.get("/relatorio/turma/{turma_id}", response_model=List[RelatorioAlunoTurma], dependencies=[Depends(etag_turma)])
+def relatorio_turma(turma_id: int, inicio: Optional[date] = None, fim: Optional[date] = None, db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.relatorio_turma(db, turma_id, inicio=inicio, fim=fim)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/relatorio/aluno/{aluno_id}/disciplina/{disciplina_id}")
-def relatorio_aluno_disciplina(aluno_id: int, disciplina_id: int, db: Session = Depends(get_db)):
-    return FrequenciaService.relatorio_aluno_disciplina(db, aluno_id, disciplina_id)
+@router.get("/relatorio/matriz", response_model=MatrizFrequencia, dependencies=[Depends(etag_geral)])
+def matriz_frequencia(turma_id: Optional[int] = None, disciplina_id: Optional[int] = None, inicio: Optional[date] = None, fim: Optional[date] = None, db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.matriz_frequencia(db, turma_id, disciplina_id, inicio=inicio, fim=fim)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.get("/relatorio/turma/{turma_id}")
-def relatorio_turma(turma_id: int, db: Session = Depends(get_db)):
-    return FrequenciaService.relatorio_turma(db, turma_id)
+@router.get("/relatorio/serie", response_model=SerieFrequencia, dependencies=[Depends(etag_geral)])
+def serie_frequencia(granularidade: str = "dia", por: Optional[str] = None, turma_id: Optional[int] = None,
+                     disciplina_id: Optional[int] = None, inicio: Optional[date] = None, fim: Optional[date] = None, db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.serie_frequencia(db, granularidade, turma_id=turma_id, disciplina_id=disciplina_id, inicio=inicio, fim=fim, por=por)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/relatorio/risco", response_model=List[AlunoEmRisco], dependencies=[Depends(etag_geral)])
+def alunos_em_risco(limite: float = Query(75.0, gt=0, le=100), turma_id: Optional[int] = None, disciplina_id: Optional[int] = None,
+                    por_disciplina: bool = False, min_sessoes: int = Query(1, ge=1), k: int = Query(100, ge=1, le=1000),
+                    inicio: Optional[date] = None, fim: Optional[date] = None, db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.alunos_em_risco(db, limite, turma_id=turma_id, disciplina_id=disciplina_id, por_disciplina=por_disciplina,
+                                                 min_sessoes=min_sessoes, k=k, inicio=inicio, fim=fim)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/dashboard", response_model=Dashboard, dependencies=[Depends(etag_geral)])
+def dashboard(inicio: Optional[date] = None, fim: Optional[date] = None, db: Session = Depends(get_db)):
+    try:
+        return FrequenciaService.dashboard(db, inicio=inicio, fim=fim)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/cache/relatorios", response_model=EstatisticasCache)
+def estatisticas_cache_relatorios():
+    return cache_relatorios.estatisticas()
+
+@router.get("/exportar/turma/{turma_id}")
+def exportar_turma(turma_id: int, gzip: bool = False, inicio: Optional[date] = None, fim: Optional[date] = None, db: Session = Depends(get_db)):
+    if not FrequenciaService.get_turma(db, turma_id):
+        raise HTTPException(status_code=404, detail="Turma não encontrada")
+    try:
+        return resposta_csv(f"relatorio_turma_{turma_id}.csv", gzip, turma_id=turma_id, inicio=inicio, fim=fim)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/exportar/disciplina/{disciplina_id}")
+def exportar_disciplina(disciplina_id: int, gzip: bool = False, inicio: Optional[date] = None, fim: Optional[date] = None, db: Session = Depends(get_db)):
+    if not FrequenciaService.get_disciplina(db, disciplina_id):
+        raise HTTPException(status_code=404, detail="Disciplina não encontrada")
+    try:
+        return resposta_csv(f"relatorio_disciplina_{disciplina_id}.csv", gzip, disciplina_id=disciplina_id, inicio=inicio, fim=fim)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/exportar/instituicao")
+def exportar_instituicao(gzip: bool = False, inicio: Optional[date] = None, fim: Optional[date] = None):
+    try:
+        return resposta_csv("relatorio_instituicao.csv", gzip, inicio=inicio, fim=fim)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/exportar/colunar/{tabela}")
+def exportar_colunar(tabela: str, formato: str = "parquet", inicio: Optional[date] = None, fim: Optional[date] = None):
+    if not colunar.disponivel():
+        raise HTTPException(status_code=501, detail="Exportação colunar requer pyarrow")
+    try:
+        return colunar.resposta_colunar(tabela, formato, inicio=inicio, fim=fim)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
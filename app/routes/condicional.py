@@ -0,0 +1,33 @@
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.services.cache import cache_relatorios, GERAL, CADASTRO
+
+# GET condicional: o ETag vem das versões em memória dos escopos de que a
+# resposta depende (sem executar a consulta nem serializar o corpo; do banco só
+# se lê versao_dados quando outro processo escreveu; ver app/services/cache.py).
+# Com If-None-Match igual, a rota responde 304 antes de executar a consulta. A
+# sessão só identifica o arquivo de banco; na pilha síncrona é a mesma da rota.
+
+def _verificar(request: Request, response: Response, db: Session, escopos):
+    cache_relatorios.sincronizar(db)
+    etag = cache_relatorios.etag(escopos)
+    enviados = request.headers.get("if-none-match")
+    if enviados:
+        etags = {valor.strip() for valor in enviados.split(",")}
+        etags |= {valor[2:] for valor in etags if valor.startswith("W/")}
+        if etag in etags or "*" in etags:
+            raise HTTPException(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+async def etag_aluno(aluno_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    _verificar(request, response, db, [("aluno", aluno_id)])
+
+async def etag_turma(turma_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    _verificar(request, response, db, [("turma", turma_id)])
+
+async def etag_geral(request: Request, response: Response, db: Session = Depends(get_db)):
+    _verificar(request, response, db, [GERAL])
+
+async def etag_cadastro(request: Request, response: Response, db: Session = Depends(get_db)):
+    _verificar(request, response, db, [CADASTRO])
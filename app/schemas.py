@@ -1,6 +1,6 @@
-from pydantic import BaseModel
-from datetime import datetime
-from typing import Optional, List
+from pydantic import BaseModel, Field
+from datetime import date, datetime, time
+from typing import Dict, Generic, List, Optional, TypeVar
 
 class TurmaBase(BaseModel):
     nome: str
@@ -58,6 +58,23 @@ class Sessao(SessaoBase):
     class Config:
         from_attributes = True
 
+class HorarioSemanal(BaseModel):
+    turma_id: int
+    disciplina_id: int
+    dia_semana: int = Field(ge=0, le=6)  # 0 = segunda-feira ... 6 = domingo
+    horario: time
+    descricao: Optional[str] = None
+
+class AgendaSessoes(BaseModel):
+    inicio: date
+    fim: date
+    horarios: List[HorarioSemanal]
+    feriados: List[date] = []
+
+class ResultadoAgenda(BaseModel):
+    criadas: int
+    existentes: int
+
 class FrequenciaBase(BaseModel):
     presente: bool = True
     justificado: bool = False
@@ -74,9 +91,21 @@ class FrequenciaIndividual(BaseModel):
     justificado: bool = False
     observacao: Optional[str] = None
 
+class FrequenciaLoteItem(FrequenciaBase):
+    aluno_id: int
+
 class FrequenciaLote(BaseModel):
     sessao_id: int
-    frequencias: List[dict]
+    frequencias: List[FrequenciaLoteItem]
+
+class FrequenciaSync(FrequenciaBase):
+    # Marcação de um cliente offline; id_cliente é gerado por ele (ex.: UUID)
+    id_cliente: str = Field(min_length=1, max_length=64)
+    aluno_id: int
+    sessao_id: int
+
+class EnvioFrequencias(BaseModel):
+    registros: List[FrequenciaSync]
 
 class Frequencia(FrequenciaBase):
     id: int
@@ -88,4 +117,191 @@ class Frequencia(FrequenciaBase):
 
 class MatricularAluno(BaseModel):
     aluno_id: int
-    disciplina_id: int
\ No newline at end of file
+    disciplina_id: int
+
+# Respostas das rotas (response_model): a serialização é feita pelo Pydantic
+# direto para JSON, sem passar pelo jsonable_encoder
+
+T = TypeVar("T")
+
+class Pagina(BaseModel, Generic[T]):
+    itens: List[T]
+    proximo_cursor: Optional[str] = None
+
+# Itens das listagens: todos os campos opcionais porque `fields=` pode pedir só
+# alguns; as rotas usam response_model_exclude_unset para não devolver os demais
+class TurmaItem(BaseModel):
+    id: Optional[int] = None
+    nome: Optional[str] = None
+    ano: Optional[int] = None
+    periodo: Optional[str] = None
+
+class DisciplinaItem(BaseModel):
+    id: Optional[int] = None
+    nome: Optional[str] = None
+    codigo: Optional[str] = None
+    carga_horaria: Optional[int] = None
+    professor: Optional[str] = None
+
+class AlunoItem(BaseModel):
+    id: Optional[int] = None
+    nome: Optional[str] = None
+    matricula: Optional[str] = None
+    email: Optional[str] = None
+    turma_id: Optional[int] = None
+
+class Mensagem(BaseModel):
+    message: str
+
+class ResultadoMatricula(BaseModel):
+    message: Optional[str] = None
+    error: Optional[str] = None
+
+class ResultadoFrequencia(BaseModel):
+    aluno_id: int
+    status: str
+    erro: Optional[str] = None
+
+class ResultadoLote(BaseModel):
+    message: str
+    registradas: int
+    resultados: List[ResultadoFrequencia]
+    nao_informados: List[int]
+
+class ResultadoEnvio(BaseModel):
+    id_cliente: str
+    status: str  # registrado, ignorado (repetido no envio), repetido (já recebido) ou erro
+    erro: Optional[str] = None
+
+class ResultadoSincronizacao(BaseModel):
+    registradas: int
+    repetidas: int
+    resultados: List[ResultadoEnvio]
+
+class AlunoSync(AlunoItem):
+    disciplina_ids: List[int] = []
+
+class Sincronizacao(BaseModel):
+    cursor: int
+    mais: bool
+    turmas: List[TurmaItem]
+    disciplinas: List[DisciplinaItem]
+    alunos: List[AlunoSync]
+    sessoes: List[Sessao]
+    frequencias: List[Frequencia]
+    removidos: Dict[str, List[int]] = {}
+
+class ErroImportacao(BaseModel):
+    linha: int
+    erro: str
+
+class ResultadoImportacao(BaseModel):
+    alunos: int
+    matriculas: int
+    turmas_criadas: int
+    erros: List[ErroImportacao]
+
+class ResumoFrequencia(BaseModel):
+    total_sessoes: int
+    presencas: int
+    faltas: int
+    faltas_justificadas: int
+    percentual_presenca: float
+
+class RelatorioAluno(ResumoFrequencia):
+    aluno_id: int
+
+class RelatorioAlunoDisciplina(ResumoFrequencia):
+    aluno_id: int
+    disciplina_id: int
+
+class RelatorioAlunoTurma(RelatorioAluno):
+    nome: Optional[str] = None
+    matricula: Optional[str] = None
+
+class AlunoEmRisco(ResumoFrequencia):
+    aluno_id: int
+    disciplina_id: Optional[int] = None
+    nome: Optional[str] = None
+    matricula: Optional[str] = None
+    turma_id: Optional[int] = None
+    carga_horaria: Optional[int] = None
+    faltas_permitidas: Optional[int] = None
+    faltas_restantes: Optional[int] = None
+    limite_excedido: bool = False
+
+class TotaisDashboard(BaseModel):
+    turmas: int
+    disciplinas: int
+    alunos: int
+    presencas: int
+    faltas: int
+    faltas_justificadas: int
+
+class TurmaDashboard(BaseModel):
+    id: int
+    nome: Optional[str] = None
+    ano: Optional[int] = None
+    periodo: Optional[str] = None
+    total_alunos: int
+    presencas: int
+    faltas: int
+    faltas_justificadas: int
+    alunos: List[RelatorioAlunoTurma]
+
+class Dashboard(BaseModel):
+    totais: TotaisDashboard
+    turmas: List[TurmaDashboard]
+
+class MatrizAlunos(BaseModel):
+    id: List[int]
+    nome: List[Optional[str]]
+    matricula: List[Optional[str]]
+
+class MatrizDisciplinas(BaseModel):
+    id: List[int]
+    nome: List[Optional[str]]
+    codigo: List[Optional[str]]
+    professor: List[Optional[str]]
+
+class MatrizCelulas(BaseModel):
+    aluno_id: List[int]
+    disciplina_id: List[int]
+    total_sessoes: List[int]
+    presencas: List[int]
+    faltas: List[int]
+    faltas_justificadas: List[int]
+
+class MatrizFrequencia(BaseModel):
+    turma_id: Optional[int] = None
+    disciplina_id: Optional[int] = None
+    alunos: MatrizAlunos
+    disciplinas: MatrizDisciplinas
+    celulas: MatrizCelulas
+
+class SeriePontos(BaseModel):
+    periodo: List[str]
+    grupo: List[Optional[int]]
+    sessoes: List[int]
+    presencas: List[int]
+    faltas: List[int]
+    faltas_justificadas: List[int]
+    percentual_presenca: List[float]
+
+class SerieFrequencia(BaseModel):
+    granularidade: str
+    por: Optional[str] = None
+    turma_id: Optional[int] = None
+    disciplina_id: Optional[int] = None
+    inicio: Optional[date] = None
+    fim: Optional[date] = None
+    pontos: SeriePontos
+
+class EstatisticasCache(BaseModel):
+    ativo: bool
+    entradas: int
+    max_entradas: int
+    hits: int
+    misses: int
+    evictions: int
+    taxa_acerto: float
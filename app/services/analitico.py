@@ -0,0 +1,399 @@
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import Integer, cast, func, select
+from sqlalchemy.orm import Session
+from app import config
+from app.database import Frequencia, Sessao
+from app.services.matriculas import chave_banco
+
+try:
+    import numpy as np
+except ImportError:  # dependência opcional
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Motor analítico em memória (FREQUENCIA_ANALITICO=1, requer numpy). Guarda os
+# registros de frequencias em arrays colunares (id, aluno, sessão, disciplina e dia
+# da sessão, em dias desde 1970-01-01, e os bits presente/justificado) e, sobre eles:
+#   - contagens por sessão e por aluno (bincount das chaves, mantidas a cada leitura
+#     e remarcação): séries e relatórios sem período são leituras diretas;
+#   - um índice por aluno (posições ordenadas por aluno + início de cada um): os
+#     relatórios de um aluno com período ou disciplina olham só os registros dele.
+#     Registros chegados depois da ordenação ficam numa cauda varrida por máscara,
+#     e o índice é refeito quando a cauda passa de CAUDA_MAXIMA;
+#   - máscaras sobre todas as colunas para o painel com período.
+# Antes de cada consulta o motor lê só o que mudou: registros com id acima do
+# último carregado e registros remarcados, cujo data_registro passa da marca
+# d'água. Uma transação pode gravar um horário anterior à marca e terminar depois
+# da leitura: por isso também são relidos os registros com data_registro a menos
+# de SOBREPOSICAO do horário da leitura anterior. Um motor por arquivo de banco,
+# como o índice de matrículas.
+
+PRESENTE = 1
+JUSTIFICADO = 2
+DIA_NULO = -(2 ** 31)  # sessão sem data ou registro sem sessão: fora de qualquer período
+SOBREPOSICAO = timedelta(seconds=60)
+LOTE = 500_000
+CAUDA_MAXIMA = 250_000
+
+_COLUNAS = (("id", "int64"), ("aluno", "int32"), ("sessao", "int32"), ("disciplina", "int32"),
+            ("dia", "int32"), ("bits", "uint8"))
+
+def disponivel() -> bool:
+    return np is not None
+
+def _dia(valor: date) -> int:
+    return (valor - date(1970, 1, 1)).days
+
+def _rotulo(dia: int, granularidade: str) -> str:
+    atual = date(1970, 1, 1) + timedelta(days=int(dia))
+    if granularidade == "semana":
+        return (atual - timedelta(days=atual.weekday())).isoformat()
+    if granularidade == "mes":
+        return atual.strftime("%Y-%m")
+    return atual.isoformat()
+
+def _categorias(contagens) -> Tuple:
+    # contagens[..., bits]: 0 falta, 1 presença, 2 falta justificada, 3 presença (justificado ignorado)
+    presencas = contagens[..., PRESENTE] + contagens[..., PRESENTE | JUSTIFICADO]
+    return contagens.sum(axis=-1), presencas, contagens[..., JUSTIFICADO]
+
+def _crescer(array, tamanho: int, vazio=0):
+    # Cópia com pelo menos `tamanho` posições na primeira dimensão (dobrando)
+    if tamanho <= len(array):
+        return array
+    novo = np.full((max(tamanho, len(array) * 2),) + array.shape[1:], vazio, dtype=array.dtype)
+    novo[:len(array)] = array
+    return novo
+
+def _somar_chaves(contagens, chaves, bits, sinal: int = 1):
+    # contagens[chave, bits] += sinal para cada registro
+    combinadas = chaves.astype(np.int64) * 4 + bits
+    contagens += sinal * np.bincount(combinadas, minlength=contagens.size).reshape(contagens.shape)
+
+class _Colunas:
+    # Arrays com capacidade de sobra: registros novos entram no fim sem copiar tudo
+
+    def __init__(self):
+        self.n = 0
+        self._dados = {nome: np.empty(0, dtype=tipo) for nome, tipo in _COLUNAS}
+
+    def __getattr__(self, nome):
+        dados = self.__dict__.get("_dados")
+        if dados is None or nome not in dados:
+            raise AttributeError(nome)
+        return dados[nome][:self.n]
+
+    @property
+    def bytes(self) -> int:
+        return sum(coluna.nbytes for coluna in self._dados.values())
+
+    def reservar(self, quantidade: int):
+        if self.n + quantidade > len(self._dados["id"]):
+            capacidade = max(self.n + quantidade, int(len(self._dados["id"]) * 1.5), 1024)
+            for nome, tipo in _COLUNAS:
+                novo = np.empty(capacidade, dtype=tipo)
+                novo[:self.n] = self._dados[nome][:self.n]
+                self._dados[nome] = novo
+
+    def acrescentar(self, **colunas):
+        quantidade = len(colunas["id"])
+        self.reservar(quantidade)
+        for nome, _ in _COLUNAS:
+            self._dados[nome][self.n:self.n + quantidade] = colunas[nome]
+        self.n += quantidade
+
+    def posicoes(self, ids):
+        # Posição de cada id já carregado (ids desconhecidos ficam de fora)
+        visao = self._dados["id"][:self.n]
+        posicoes = np.searchsorted(visao, ids)
+        validas = posicoes < self.n
+        validas[validas] = visao[posicoes[validas]] == ids[validas]
+        return posicoes[validas], validas
+
+class MotorAnalitico:
+
+    def __init__(self):
+        self.registros = _Colunas()
+        # Por sessão, indexados pelo id: turma, disciplina, dia e contagens por bits
+        self.sessao_turma = np.zeros(1, dtype=np.int32)
+        self.sessao_disciplina = np.zeros(1, dtype=np.int32)
+        self.sessao_dia = np.full(1, DIA_NULO, dtype=np.int32)
+        self.por_sessao = np.zeros((1, 4), dtype=np.int64)
+        self.por_aluno = np.zeros((1, 4), dtype=np.int64)
+        self.ultima_sessao = 0
+        # Índice por aluno sobre os `ordenados` primeiros registros
+        self.ordem = np.empty(0, dtype=np.int32)
+        self.inicio_aluno = np.zeros(1, dtype=np.int64)
+        self.ordenados = 0
+        self.ultimo_id = 0
+        self.marca: Optional[datetime] = None
+        self.lido_em: Optional[datetime] = None
+        self._lock = threading.Lock()
+
+    def atualizar(self, db: Session):
+        with self._lock:
+            # Uma consulta só (três buscas em índice) diz se há algo a ler; tudo na
+            # mesma transação de leitura
+            lido_em = datetime.utcnow()
+            ultima_sessao, ultimo_id, marca = db.execute(select(
+                select(func.max(Sessao.id)).scalar_subquery(),
+                select(func.max(Frequencia.id)).scalar_subquery(),
+                select(func.max(Frequencia.data_registro)).scalar_subquery()
+            )).one()
+            # Sessões primeiro: os registros novos podem apontar para elas
+            if (ultima_sessao or 0) > self.ultima_sessao:
+                self._carregar_sessoes(db)
+            if self.marca is not None and marca is not None and (
+                    marca > self.marca or self.marca > self.lido_em - SOBREPOSICAO):
+                self._carregar_remarcados(db)
+            if (ultimo_id or 0) > self.ultimo_id:
+                self._carregar_registros(db, ultimo_id - self.ultimo_id)
+            if self.registros.n - self.ordenados > CAUDA_MAXIMA:
+                self._indexar_alunos()
+            if marca is not None:
+                self.marca = marca
+            self.lido_em = lido_em
+
+    def _carregar_sessoes(self, db: Session):
+        dia = cast(func.julianday(func.date(Sessao.data)) - 2440587.5, Integer)
+        linhas = db.execute(
+            select(Sessao.id, func.coalesce(Sessao.turma_id, 0), func.coalesce(Sessao.disciplina_id, 0),
+                   func.coalesce(dia, DIA_NULO)).where(Sessao.id > self.ultima_sessao).order_by(Sessao.id)
+        ).all()
+        dados = np.array(linhas, dtype=np.int64)
+        maior = int(dados[-1, 0])
+        self.sessao_turma = _crescer(self.sessao_turma, maior + 1)
+        self.sessao_disciplina = _crescer(self.sessao_disciplina, maior + 1)
+        self.sessao_dia = _crescer(self.sessao_dia, maior + 1, DIA_NULO)
+        self.por_sessao = _crescer(self.por_sessao, maior + 1)
+        ids = dados[:, 0]
+        self.sessao_turma[ids] = dados[:, 1]
+        self.sessao_disciplina[ids] = dados[:, 2]
+        self.sessao_dia[ids] = dados[:, 3]
+        self.ultima_sessao = maior
+
+    def _carregar_remarcados(self, db: Session):
+        # Só pelo índice de data_registro (sem ORDER BY nem filtro por id, que levariam
+        # o SQLite à chave primária); ids ainda não carregados são ignorados aqui e
+        # entram em _carregar_registros
+        remarcados = db.execute(select(Frequencia.id, Frequencia.presente, Frequencia.justificado).where(
+            Frequencia.data_registro > min(self.marca, self.lido_em - SOBREPOSICAO)
+        )).all()
+        if not remarcados:
+            return
+        dados = np.array(remarcados, dtype=np.int64)
+        posicoes, validas = self.registros.posicoes(dados[:, 0])
+        bits = self._bits(dados[validas, 1], dados[validas, 2])
+        registros = self.registros
+        antigos = registros.bits[posicoes]
+        mudaram = antigos != bits
+        if not mudaram.any():
+            return
+        posicoes, antigos, bits = posicoes[mudaram], antigos[mudaram], bits[mudaram]
+        for contagens, chaves in ((self.por_sessao, registros.sessao[posicoes]),
+                                  (self.por_aluno, registros.aluno[posicoes])):
+            _somar_chaves(contagens, chaves, antigos, -1)
+            _somar_chaves(contagens, chaves, bits)
+        registros.bits[posicoes] = bits
+
+    def _carregar_registros(self, db: Session, previstos: int):
+        # Direto no cursor do driver, em lotes: as Rows do SQLAlchemy custam mais que
+        # a própria leitura no SQLite, e são milhões de linhas na carga inicial
+        self.registros.reservar(previstos)
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.execute(
+                "SELECT id, aluno_id, coalesce(sessao_id, 0), coalesce(presente, 0), coalesce(justificado, 0) "
+                "FROM frequencias WHERE id > ? AND aluno_id IS NOT NULL ORDER BY id", (self.ultimo_id,)
+            )
+            while True:
+                linhas = cursor.fetchmany(LOTE)
+                if not linhas:
+                    break
+                dados = np.fromiter(chain.from_iterable(linhas), dtype=np.int64,
+                                    count=len(linhas) * 5).reshape(-1, 5)
+                # Sessão inexistente conta como sessão sem data (posição 0)
+                sessoes = dados[:, 2]
+                sessoes[sessoes > self.ultima_sessao] = 0
+                alunos = dados[:, 1]
+                bits = self._bits(dados[:, 3], dados[:, 4])
+                self.por_aluno = _crescer(self.por_aluno, int(alunos.max()) + 1)
+                _somar_chaves(self.por_sessao, sessoes, bits)
+                _somar_chaves(self.por_aluno, alunos, bits)
+                self.registros.acrescentar(
+                    id=dados[:, 0],
+                    aluno=alunos,
+                    sessao=sessoes,
+                    disciplina=self.sessao_disciplina[sessoes],
+                    dia=self.sessao_dia[sessoes],
+                    bits=bits
+                )
+                self.ultimo_id = int(dados[-1, 0])
+        finally:
+            cursor.close()
+
+    def _indexar_alunos(self):
+        alunos = self.registros.aluno
+        self.ordem = np.argsort(alunos).astype(np.int32)
+        self.inicio_aluno = np.zeros(len(self.por_aluno) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(alunos, minlength=len(self.por_aluno)), out=self.inicio_aluno[1:])
+        self.ordenados = len(alunos)
+
+    @staticmethod
+    def _bits(presente, justificado):
+        return ((presente != 0) * PRESENTE + (justificado != 0) * JUSTIFICADO).astype(np.uint8)
+
+    def _posicoes_alunos(self, aluno_ids):
+        # Registros dos alunos pedidos: fatias do índice mais a cauda não ordenada
+        registros = self.registros
+        validos = aluno_ids[aluno_ids < len(self.inicio_aluno) - 1]
+        partes = [self.ordem[self.inicio_aluno[a]:self.inicio_aluno[a + 1]] for a in validos]
+        cauda = registros.aluno[self.ordenados:]
+        if len(aluno_ids) == 1:
+            na_cauda = cauda == aluno_ids[0]
+        else:
+            na_cauda = np.isin(cauda, aluno_ids)
+        partes.append(np.nonzero(na_cauda)[0].astype(np.int64) + self.ordenados)
+        return np.concatenate(partes)
+
+    def _filtrar(self, posicoes, inicio: date = None, fim: date = None, disciplina_id: int = None):
+        # Posições (ou None = todos os registros) filtradas por período e disciplina
+        registros = self.registros
+        if inicio is None and fim is None and disciplina_id is None:
+            return posicoes
+        dias = registros.dia if posicoes is None else registros.dia[posicoes]
+        mascara = np.ones(len(dias), dtype=bool)
+        if inicio is not None:
+            mascara &= dias >= _dia(inicio)
+        if fim is not None:
+            mascara &= (dias <= _dia(fim)) & (dias != DIA_NULO)
+        if disciplina_id is not None:
+            disciplinas = registros.disciplina if posicoes is None else registros.disciplina[posicoes]
+            mascara &= disciplinas == disciplina_id
+        return np.nonzero(mascara)[0] if posicoes is None else posicoes[mascara]
+
+    def contar_aluno(self, aluno_id: int, disciplina_id: int = None, inicio: date = None, fim: date = None):
+        # (total, presenças, justificadas)
+        with self._lock:
+            if disciplina_id is None and inicio is None and fim is None:
+                contagens = self.por_aluno[aluno_id] if aluno_id < len(self.por_aluno) else np.zeros(4, dtype=np.int64)
+            else:
+                posicoes = self._filtrar(self._posicoes_alunos(np.array([aluno_id])), inicio, fim, disciplina_id)
+                contagens = np.bincount(self.registros.bits[posicoes], minlength=4)
+            return tuple(int(valor) for valor in _categorias(contagens))
+
+    def contar_alunos(self, aluno_ids: Iterable[int], inicio: date = None, fim: date = None) -> Dict[int, Tuple]:
+        # (total, presenças, justificadas) de cada aluno pedido
+        aluno_ids = np.fromiter(aluno_ids, dtype=np.int64)
+        if not len(aluno_ids):
+            return {}
+        with self._lock:
+            if inicio is None and fim is None:
+                contagens = self.por_aluno
+            else:
+                # Poucos alunos (uma turma): pelo índice; muitos (o painel): varredura
+                # de todos os registros com máscara do período
+                registros = self.registros
+                fatia = aluno_ids[aluno_ids < len(self.inicio_aluno) - 1]
+                estimados = int((self.inicio_aluno[fatia + 1] - self.inicio_aluno[fatia]).sum())
+                if estimados * 8 < registros.n:
+                    posicoes = self._filtrar(self._posicoes_alunos(aluno_ids), inicio, fim)
+                else:
+                    posicoes = self._filtrar(None, inicio, fim)
+                contagens = np.zeros(self.por_aluno.shape, dtype=np.int64)
+                _somar_chaves(contagens, registros.aluno[posicoes], registros.bits[posicoes])
+            validos = aluno_ids < len(contagens)
+            selecionadas = np.zeros((len(aluno_ids), 4), dtype=np.int64)
+            selecionadas[validos] = contagens[aluno_ids[validos]]
+        total, presencas, justificadas = (valores.tolist() for valores in _categorias(selecionadas))
+        return dict(zip(aluno_ids.tolist(), zip(total, presencas, justificadas)))
+
+    def serie(self, granularidade: str, turma_id: int = None, disciplina_id: int = None,
+              inicio: date = None, fim: date = None, por: str = None) -> List[Tuple]:
+        # (periodo, grupo, sessoes, presencas, faltas, justificadas), na ordem da
+        # série SQL. Só sobre as contagens por sessão: cada sessão vai para o período
+        # do seu dia e um bincount por coluna soma período x grupo.
+        with self._lock:
+            sessoes = np.arange(1, self.ultima_sessao + 1)
+            dias_sessoes = self.sessao_dia[sessoes]
+            mascara = dias_sessoes != DIA_NULO
+            for valores, valor in ((self.sessao_turma, turma_id), (self.sessao_disciplina, disciplina_id)):
+                if valor is not None:
+                    mascara &= valores[sessoes] == valor
+            if inicio is not None:
+                mascara &= dias_sessoes >= _dia(inicio)
+            if fim is not None:
+                mascara &= dias_sessoes <= _dia(fim)
+            sessoes = sessoes[mascara]
+            if not len(sessoes):
+                return []
+
+            # Rótulo de cada dia do intervalo (ISO: a ordem do texto é a cronológica)
+            dias_sessoes = dias_sessoes[mascara].astype(np.int64)
+            primeiro = int(dias_sessoes.min())
+            rotulos = [_rotulo(dia, granularidade) for dia in range(primeiro, int(dias_sessoes.max()) + 1)]
+            periodos, periodo_do_dia = np.unique(rotulos, return_inverse=True)
+            if por == "turma":
+                grupos = self.sessao_turma[sessoes]
+            elif por == "disciplina":
+                grupos = self.sessao_disciplina[sessoes]
+            else:
+                grupos = np.zeros(len(sessoes), dtype=np.int32)
+            largura = int(grupos.max()) + 1
+            chaves = periodo_do_dia.ravel()[dias_sessoes - primeiro] * largura + grupos
+            tamanho = len(periodos) * largura
+            por_sessoes = np.bincount(chaves, minlength=tamanho)
+            total, presencas, justificadas = (
+                np.bincount(chaves, weights=valores, minlength=tamanho).astype(np.int64)
+                for valores in _categorias(self.por_sessao[sessoes])
+            )
+
+        return [
+            (str(periodos[chave // largura]), int(chave % largura) if por else None, int(por_sessoes[chave]),
+             int(presencas[chave]), int(total[chave] - presencas[chave]), int(justificadas[chave]))
+            for chave in np.nonzero(por_sessoes)[0]
+        ]
+
+    @property
+    def bytes(self) -> int:
+        return self.registros.bytes + sum(array.nbytes for array in (
+            self.sessao_turma, self.sessao_disciplina, self.sessao_dia, self.por_sessao,
+            self.por_aluno, self.ordem, self.inicio_aluno))
+
+class MotoresAnaliticos:
+
+    def __init__(self):
+        self._motores: Dict[object, MotorAnalitico] = {}
+        self._lock = threading.Lock()
+
+    def para(self, db: Session) -> Optional[MotorAnalitico]:
+        # Motor do banco da sessão, já atualizado; None com o motor desligado
+        if not config.ANALITICO or np is None:
+            return None
+        chave = chave_banco(db)
+        motor = self._motores.get(chave)
+        if motor is None:
+            with self._lock:
+                motor = self._motores.get(chave)
+                if motor is None:
+                    inicio = time.perf_counter()
+                    motor = MotorAnalitico()
+                    motor.atualizar(db)
+                    logger.info("Motor analítico: %d registros carregados em %.1f s (%.0f MiB)",
+                                motor.registros.n, time.perf_counter() - inicio, motor.bytes / 2 ** 20)
+                    self._motores[chave] = motor
+                    return motor
+        motor.atualizar(db)
+        return motor
+
+    def descartar(self):
+        with self._lock:
+            self._motores.clear()
+
+motores_analiticos = MotoresAnaliticos()
@@ -0,0 +1,139 @@
+import os
+from datetime import date
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional
+from sqlalchemy import MetaData, Table, create_engine, select
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.visitors import replacement_traverse
+from app import config
+from app.database import Base, Sessao, Frequencia, ContadorSessao, ArquivoAnual, ResumoAnual
+
+# Anos letivos encerrados saem do banco principal: sessoes, frequencias e
+# contadores_sessao do ano vão para data/arquivo/frequencia_<ano>.db (mesmo esquema
+# e mesmos ids) e ficam no banco os resumos por aluno/disciplina (resumos_anuais).
+# Consultas sem período usam os contadores, que continuam somando a história toda.
+# Consultas com período que alcançam um ano arquivado usam o resumo se o período
+# cobre o ano inteiro e, se não, anexam (ATTACH) o arquivo do ano na conexão e
+# somam as mesmas consultas sobre as tabelas dele. Os anexos ficam na conexão do
+# pool para as próximas consultas.
+
+TABELAS = (Sessao.__table__, Frequencia.__table__, ContadorSessao.__table__)
+
+# SQLite anexa no máximo 10 bancos por conexão (SQLITE_MAX_ATTACHED)
+LIMITE_ANEXOS = 10
+
+_CHAVE_CONEXAO = "arquivos_anexados"
+
+class PeriodoArquivado(NamedTuple):
+    # Anos arquivados que o período alcança: cobertos por inteiro (podem vir dos
+    # resumos) e cobertos em parte (precisam do arquivo anexado)
+    inteiros: List[int]
+    parciais: List[int]
+
+    @property
+    def anos(self) -> List[int]:
+        return sorted(self.inteiros + self.parciais)
+
+def esquema(ano: int) -> str:
+    return f"arquivo_{int(ano)}"
+
+def pasta(db: Session) -> str:
+    if config.PASTA_ARQUIVO:
+        return config.PASTA_ARQUIVO
+    banco = db.get_bind().engine.url.database
+    base = os.path.dirname(os.path.abspath(banco)) if banco and banco != ":memory:" else "data"
+    return os.path.join(base, "arquivo")
+
+def caminho(db: Session, ano: int) -> str:
+    return os.path.join(pasta(db), f"frequencia_{int(ano)}.db")
+
+@lru_cache(maxsize=None)
+def tabelas(ano: int) -> Dict[Table, Table]:
+    # Cópia de cada tabela arquivada no esquema do anexo (arquivo_<ano>.sessoes, ...)
+    metadata = MetaData()
+    return {tabela: tabela.to_metadata(metadata, schema=esquema(ano)) for tabela in TABELAS}
+
+def adaptar(elemento, ano: int):
+    # A mesma consulta (ou filtro) lendo as tabelas do arquivo do ano; tabelas que
+    # não são arquivadas (alunos, disciplinas...) continuam no banco principal
+    copias = tabelas(ano)
+
+    def trocar(item):
+        if isinstance(item, Table):
+            return copias.get(item)
+        tabela = getattr(item, "table", None)
+        if isinstance(tabela, Table) and tabela in copias and hasattr(item, "name"):
+            return copias[tabela].c[item.name]
+        return None
+
+    return replacement_traverse(elemento, {}, trocar)
+
+def para_resumo(filtro):
+    # Filtro sobre frequencias/sessoes reescrito sobre resumos_anuais; None se usa
+    # alguma coluna que o resumo não tem (aí o ano precisa ser anexado)
+    colunas = {
+        (Frequencia.__table__, "aluno_id"): ResumoAnual.__table__.c.aluno_id,
+        (Sessao.__table__, "disciplina_id"): ResumoAnual.__table__.c.disciplina_id,
+    }
+    faltando = []
+
+    def trocar(item):
+        if isinstance(item, Table) and item in TABELAS:
+            faltando.append(item)
+            return None
+        tabela = getattr(item, "table", None)
+        if isinstance(tabela, Table) and tabela in TABELAS and hasattr(item, "name"):
+            coluna = colunas.get((tabela, item.name))
+            if coluna is None:
+                faltando.append(item)
+            return coluna
+        return None
+
+    adaptado = replacement_traverse(filtro, {}, trocar)
+    return None if faltando else adaptado
+
+def periodo_arquivado(db: Session, inicio: date = None, fim: date = None) -> Optional[PeriodoArquivado]:
+    # Anos arquivados dentro de [inicio, fim] (sem limites: todos); None se nenhum
+    consulta = select(ArquivoAnual.ano).order_by(ArquivoAnual.ano)
+    if inicio is not None:
+        consulta = consulta.where(ArquivoAnual.ano >= inicio.year)
+    if fim is not None:
+        consulta = consulta.where(ArquivoAnual.ano <= fim.year)
+    anos = db.execute(consulta).scalars().all()
+    if not anos:
+        return None
+    inteiros, parciais = [], []
+    for ano in anos:
+        cobre = (inicio is None or inicio <= date(ano, 1, 1)) and (fim is None or fim >= date(ano, 12, 31))
+        (inteiros if cobre else parciais).append(ano)
+    return PeriodoArquivado(inteiros, parciais)
+
+def anexar(db: Session, anos: List[int]):
+    # Anexa à conexão da sessão os arquivos que ainda não estão nela. Passando do
+    # limite do SQLite, solta os anexos que esta consulta não usa.
+    if len(anos) > LIMITE_ANEXOS:
+        raise ValueError(f"O período alcança {len(anos)} anos arquivados; o limite por consulta é {LIMITE_ANEXOS}")
+    conexao = db.connection()
+    anexados = conexao.info.setdefault(_CHAVE_CONEXAO, set())
+    novos = [ano for ano in anos if ano not in anexados]
+    if len(anexados) + len(novos) > LIMITE_ANEXOS:
+        for ano in sorted(anexados - set(anos)):
+            conexao.exec_driver_sql(f"DETACH DATABASE {esquema(ano)}")
+            anexados.discard(ano)
+    for ano in novos:
+        arquivo = caminho(db, ano)
+        if not os.path.exists(arquivo):
+            raise FileNotFoundError(f"Arquivo do ano {ano} não encontrado: {arquivo}")
+        conexao.exec_driver_sql(f"ATTACH DATABASE ? AS {esquema(ano)}", (arquivo,))
+        anexados.add(ano)
+
+def criar_arquivo(db: Session, ano: int) -> str:
+    # Arquivo do ano com as tabelas e índices dos modelos (se ainda não existir)
+    arquivo = caminho(db, ano)
+    os.makedirs(os.path.dirname(arquivo), exist_ok=True)
+    engine = create_engine(f"sqlite:///{arquivo}")
+    try:
+        Base.metadata.create_all(engine, tables=list(TABELAS))
+    finally:
+        engine.dispose()
+    return arquivo
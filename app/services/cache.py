@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from functools import wraps
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import config
+from app.services.matriculas import chave_banco
+
+# Escopos de invalidação: ("aluno", id), ("turma", id), GERAL (painel, matriz)
+# e CADASTRO (listagens de turmas, disciplinas e alunos). Cada escopo tem um
+# contador de versão; uma entrada guarda as versões dos escopos de que depende
+# no momento em que foi calculada e só é servida enquanto nenhuma delas mudou.
+# As escritas registram os escopos alterados na sessão e as versões sobem depois
+# do commit (um rollback descarta o registro). As mesmas versões geram os ETags
+# das rotas, mesmo com o cache desligado.
+# Essas versões só sobem com os commits deste processo. As escritas que invalidam
+# TUDO (importação, recontagem, arquivamento), que também rodam pelo manage.py
+# com o servidor no ar, sobem ainda versao_dados no banco, na mesma transação;
+# cada leitura do cache e cada ETag compara essa versão com a última vista e,
+# se mudou, invalida tudo. A comparação usa uma conexão própria por arquivo de
+# banco: PRAGMA data_version só muda quando outra conexão confirma uma escrita,
+# e só então versao_dados é lida.
+GERAL = ("geral",)
+CADASTRO = ("cadastro",)
+TUDO = ("tudo",)
+
+_CHAVE_SESSAO = "cache_relatorios_alteracoes"
+
+class CacheRelatorios:
+
+    def __init__(self, max_entradas: int = config.CACHE_RELATORIOS_MAX):
+        self.max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._versoes = {}
+        self._geracao = 0
+        # Por arquivo de banco (chave_banco): [conexão, data_version, versao_dados]
+        self._observadores = {}
+        # Muda a cada processo: ETags de outro processo ou de antes de um
+        # reinício nunca coincidem com os atuais
+        self._epoca = os.urandom(4).hex()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def ativo(self) -> bool:
+        return self.max_entradas > 0
+
+    def _assinatura(self, escopos):
+        return (self._geracao, *(self._versoes.get(escopo, 0) for escopo in escopos))
+
+    def obter(self, chave, escopos, calcular):
+        if not self.ativo:
+            return calcular()
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            assinatura = self._assinatura(escopos)
+            if entrada is not None and entrada[0] == assinatura:
+                self._entradas.move_to_end(chave)
+                self.hits += 1
+                return entrada[1]
+            self.misses += 1
+        # A assinatura é lida antes de calcular: se uma escrita terminar no meio
+        # do cálculo, a versão sobe e o valor guardado já nasce inválido
+        valor = calcular()
+        with self._lock:
+            self._entradas[chave] = (assinatura, valor)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entradas:
+                self._entradas.popitem(last=False)
+                self.evictions += 1
+        return valor
+
+    def sincronizar(self, db: Session):
+        # Escrita em massa de outro processo desde a última leitura: tudo inválido.
+        # Banco em memória não tem outro processo escrevendo.
+        chave = chave_banco(db)
+        if not isinstance(chave, str):
+            return
+        with self._lock:
+            observador = self._observadores.get(chave)
+            if observador is None:
+                conexao = sqlite3.connect(chave, timeout=30, check_same_thread=False, isolation_level=None)
+                observador = self._observadores[chave] = [conexao, None, None]
+            conexao = observador[0]
+            data_version = conexao.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == observador[1]:
+                return
+            linha = conexao.execute("SELECT versao FROM versao_dados WHERE id = 1").fetchone()
+            versao = linha[0] if linha else 0
+            if observador[2] is not None and observador[2] != versao:
+                self._geracao += 1
+                self._entradas.clear()
+            observador[1:] = [data_version, versao]
+
+    def etag(self, escopos) -> str:
+        with self._lock:
+            assinatura = self._assinatura(escopos)
+        return '"' + "-".join([self._epoca, *map(str, assinatura)]) + '"'
+
+    def invalidar(self, escopos):
+        with self._lock:
+            for escopo in escopos:
+                if escopo == TUDO:
+                    self._geracao += 1
+                    self._entradas.clear()
+                else:
+                    self._versoes[escopo] = self._versoes.get(escopo, 0) + 1
+
+    def limpar(self):
+        self.invalidar([TUDO])
+
+    def estatisticas(self):
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "ativo": self.ativo,
+                "entradas": len(self._entradas),
+                "max_entradas": self.max_entradas,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "taxa_acerto": round(self.hits / consultas, 4) if consultas else 0.0
+            }
+
+    def cacheado(self, tipo: str, escopos):
+        # Decorador para métodos de relatório com assinatura (db, *ids). `escopos`
+        # recebe os mesmos argumentos (sem db) e diz de quais escopos o resultado depende.
+        # O bind faz parte da chave para bancos diferentes não se misturarem.
+        def decorar(metodo):
+            @wraps(metodo)
+            def executar(db: Session, *args, **kwargs):
+                if self.ativo:
+                    self.sincronizar(db)
+                chave = (tipo, id(db.get_bind()), *args, *sorted(kwargs.items()))
+                return self.obter(chave, escopos(*args, **kwargs), lambda: metodo(db, *args, **kwargs))
+            return executar
+        return decorar
+
+cache_relatorios = CacheRelatorios()
+
+def registrar_alteracao(db: Session, *escopos):
+    # Chamado pelas escritas; os escopos só são invalidados após o commit
+    db.info.setdefault(_CHAVE_SESSAO, set()).update(escopos)
+    if TUDO in escopos:
+        db.connection().exec_driver_sql(
+            "INSERT INTO versao_dados (id, versao) VALUES (1, 1) "
+            "ON CONFLICT (id) DO UPDATE SET versao = versao + 1"
+        )
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_alteracoes(session):
+    alteracoes = session.info.pop(_CHAVE_SESSAO, None)
+    if alteracoes:
+        cache_relatorios.invalidar(alteracoes)
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_alteracoes(session):
+    session.info.pop(_CHAVE_SESSAO, None)
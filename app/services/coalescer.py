@@ -0,0 +1,152 @@
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FuturoTempoEsgotado
+from typing import List
+from app import config
+from app.database import SessionLocal
+from app.schemas import FrequenciaIndividual, FrequenciaLoteItem, FrequenciaSync
+from app.services.frequencia_service import FrequenciaService
+
+class AgrupadorEscritas:
+    # Fila única de escritas de frequência: uma thread grava os pedidos acumulados
+    # a cada `intervalo_ms` (ou ao juntar `max_registros`) em uma só transação e
+    # resolve o Future de cada chamador depois do commit. Como só essa thread grava,
+    # duas marcações do mesmo dia nunca criam sessões duplicadas.
+
+    def __init__(self, session_factory=SessionLocal,
+                 intervalo_ms: int = config.AGRUPAR_INTERVALO_MS,
+                 max_registros: int = config.AGRUPAR_MAX_REGISTROS,
+                 espera_s: float = config.AGRUPAR_ESPERA_S):
+        self._session_factory = session_factory
+        self._intervalo = intervalo_ms / 1000
+        self._max_registros = max_registros
+        self._espera = espera_s
+        self._fila = queue.Queue()
+        self._thread = None
+
+    @property
+    def ativo(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def iniciar(self):
+        if self.ativo:
+            return
+        self._thread = threading.Thread(target=self._executar, name="agrupador-escritas", daemon=True)
+        self._thread.start()
+
+    def parar(self):
+        # Os pedidos já enfileirados são gravados antes de a thread terminar
+        if not self.ativo:
+            return
+        self._fila.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def enviar_individual(self, frequencia: FrequenciaIndividual) -> Future:
+        return self._enfileirar(lambda db: FrequenciaService._registrar_individual(db, frequencia), 1)
+
+    def enviar_lote(self, sessao_id: int, frequencias: List[FrequenciaLoteItem]) -> Future:
+        return self._enfileirar(
+            lambda db: FrequenciaService._registrar_lote(db, sessao_id, frequencias),
+            max(len(frequencias), 1)
+        )
+
+    def enviar_sincronizacao(self, registros: List[FrequenciaSync]) -> Future:
+        return self._enfileirar(
+            lambda db: FrequenciaService._registrar_sincronizacao(db, registros),
+            max(len(registros), 1)
+        )
+
+    def _enfileirar(self, executar, registros: int) -> Future:
+        futuro = Future()
+        self._fila.put((executar, registros, futuro))
+        return futuro
+
+    def _executar(self):
+        while True:
+            pedido = self._fila.get()
+            if pedido is None:
+                break
+            pedidos, registros = [pedido], pedido[1]
+            limite = time.monotonic() + self._intervalo
+            while registros < self._max_registros:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    proximo = self._fila.get(timeout=restante)
+                except queue.Empty:
+                    break
+                if proximo is None:
+                    # Parada pedida: gravar este lote e encerrar em seguida
+                    self._fila.put(None)
+                    break
+                pedidos.append(proximo)
+                registros += proximo[1]
+            self._gravar(pedidos)
+
+    def _gravar(self, pedidos):
+        pedidos = [p for p in pedidos if p[2].set_running_or_notify_cancel()]
+        db = None
+        concluidos = []
+        try:
+            db = self._session_factory()
+            for executar, _, futuro in pedidos:
+                try:
+                    concluidos.append((futuro, executar(db)))
+                except ValueError as e:
+                    # Erro de validação acontece antes de qualquer escrita do pedido
+                    futuro.set_exception(e)
+                except Exception as e:
+                    # O pedido pode ter gravado parte das linhas: ele falha e a
+                    # transação do lote é descartada
+                    futuro.set_exception(e)
+                    raise
+            db.commit()
+        except Exception:
+            if db is not None:
+                db.rollback()
+                db.close()
+            # Falha inesperada: refazer em sua própria transação cada pedido que
+            # ainda não tem resposta (os já gravados no lote e os que vinham depois)
+            self._gravar_separadamente([(executar, futuro) for executar, _, futuro in pedidos if not futuro.done()])
+            return
+        db.close()
+        for futuro, resultado in concluidos:
+            futuro.set_result(resultado)
+
+    def _gravar_separadamente(self, pedidos):
+        for executar, futuro in pedidos:
+            db = None
+            try:
+                db = self._session_factory()
+                resultado = executar(db)
+                db.commit()
+                futuro.set_result(resultado)
+            except Exception as e:
+                if db is not None:
+                    db.rollback()
+                futuro.set_exception(e)
+            finally:
+                if db is not None:
+                    db.close()
+
+    def aguardar(self, futuro: Future):
+        # Espera limitada: o chamador não fica preso se a gravação nunca responder.
+        # O pedido ainda na fila é cancelado; um já em gravação pode concluir depois.
+        try:
+            return futuro.result(timeout=self._espera)
+        except FuturoTempoEsgotado:
+            futuro.cancel()
+            raise TimeoutError(f"Gravação não concluída em {self._espera:g}s")
+
+    async def aguardar_async(self, futuro: Future):
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(futuro), self._espera)
+        except asyncio.TimeoutError:
+            # wait_for já cancelou o pedido, se ele ainda estava na fila
+            raise TimeoutError(f"Gravação não concluída em {self._espera:g}s")
+
+agrupador_escritas = AgrupadorEscritas()
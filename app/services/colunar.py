@@ -0,0 +1,242 @@
+import io
+import os
+import tempfile
+from datetime import date
+from typing import Dict, Iterable, List
+from fastapi.responses import FileResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
+from app.database import SessionLocal, Turma, Disciplina
+from app.services.frequencia_service import FrequenciaService
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as ipc
+    import pyarrow.parquet as pq
+except ImportError:  # dependência opcional
+    pa = None
+
+# Exportação colunar (Parquet ou Arrow IPC, requer pyarrow) para pandas/DuckDB:
+#   - frequencias: registros × sessões × alunos, um por linha;
+#   - sessoes: sessões com os totais por sessão (contadores_sessao);
+#   - alunos_disciplinas: o relatório de cada matrícula (contadores ou, com período,
+#     somas do intervalo), sem partição.
+# As linhas vêm de FrequenciaService.lotes_colunares em lotes de um mesmo mês e
+# cada lote vira um record batch (um row group no Parquet), então a exportação de
+# um ano inteiro nunca fica toda em memória. turma e disciplina saem com o id e o
+# nome codificado em dicionário (índices int32 sobre os nomes, o mesmo dicionário
+# em todos os lotes). Nas pastas gravadas pelo manage.py as tabelas com mês são
+# particionadas no estilo Hive (frequencias/mes=2024-03/parte-0.parquet); no
+# arquivo único e no fluxo Arrow o mês é a coluna "mes".
+
+TABELAS = ("frequencias", "sessoes", "alunos_disciplinas")
+FORMATOS = ("parquet", "arrow")
+
+TIPOS_CONTEUDO = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+# Colunas de cada tabela na ordem das linhas de lotes_colunares. "turma" e
+# "disciplina" são o id e viram duas colunas: o id e o nome em dicionário.
+COLUNAS = {
+    "frequencias": (
+        ("mes", "mes"), ("frequencia_id", "int64"), ("sessao_id", "int32"), ("data", "timestamp"),
+        ("aluno_id", "int32"), ("matricula", "string"), ("aluno", "string"), ("turma", "turma"),
+        ("disciplina", "disciplina"), ("presente", "bool"), ("justificado", "bool"),
+        ("observacao", "string"), ("data_registro", "timestamp"),
+    ),
+    "sessoes": (
+        ("mes", "mes"), ("sessao_id", "int32"), ("data", "timestamp"), ("turma", "turma"),
+        ("disciplina", "disciplina"), ("descricao", "string"), ("presencas", "int32"), ("faltas", "int32"),
+        ("faltas_justificadas", "int32"),
+    ),
+    "alunos_disciplinas": (
+        ("aluno_id", "int32"), ("matricula", "string"), ("aluno", "string"), ("turma", "turma"),
+        ("disciplina", "disciplina"), ("total_sessoes", "int32"), ("presencas", "int32"),
+        ("faltas_justificadas", "int32"),
+    ),
+}
+
+# Tipos Arrow das colunas simples (pyarrow só é importado se instalado)
+_TIPOS = {
+    "int32": lambda: pa.int32(),
+    "int64": lambda: pa.int64(),
+    "string": lambda: pa.string(),
+    "timestamp": lambda: pa.timestamp("us"),
+    "bool": lambda: pa.bool_(),
+}
+
+def disponivel() -> bool:
+    return pa is not None
+
+def _exigir():
+    if pa is None:
+        raise RuntimeError("pyarrow não está instalado")
+
+def validar(tabela: str, formato: str = "parquet", inicio: date = None, fim: date = None):
+    # Para a rota recusar o pedido antes de começar a responder
+    if tabela not in TABELAS:
+        raise ValueError(f"Tabela desconhecida: {tabela} (opções: {', '.join(TABELAS)})")
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato desconhecido: {formato} (opções: {', '.join(FORMATOS)})")
+    FrequenciaService.validar_periodo(inicio, fim)
+
+class Conversor:
+    # Lotes de linhas de uma tabela -> record batches com esquema fixo
+
+    def __init__(self, db: Session, tabela: str, com_mes: bool = True):
+        _exigir()
+        self.tabela = tabela
+        self.colunas = COLUNAS[tabela]
+        self.com_mes = com_mes
+        self._dicionarios = {}
+        for nome, modelo in (("turma", Turma), ("disciplina", Disciplina)):
+            pares = db.execute(select(modelo.id, modelo.nome).order_by(modelo.id)).all()
+            self._dicionarios[nome] = (
+                pa.array([id_ for id_, _ in pares], pa.int32()),
+                pa.array([nome_ for _, nome_ in pares], pa.string()),
+            )
+
+        campos = []
+        for nome, tipo in self.colunas:
+            if tipo == "mes":
+                if com_mes:
+                    campos.append(pa.field("mes", pa.string()))
+            elif tipo in ("turma", "disciplina"):
+                campos.append(pa.field(f"{nome}_id", pa.int32()))
+                campos.append(pa.field(nome, pa.dictionary(pa.int32(), pa.string())))
+            else:
+                campos.append(pa.field(nome, _TIPOS[tipo]()))
+        if tabela == "alunos_disciplinas":
+            # Mesmos campos derivados do relatório
+            indice = [campo.name for campo in campos].index("presencas") + 1
+            campos[indice:indice] = [pa.field("faltas", pa.int32())]
+            campos.append(pa.field("percentual_presenca", pa.float64()))
+        self.esquema = pa.schema(campos)
+
+    def lote(self, linhas: List) -> "pa.RecordBatch":
+        valores = list(zip(*linhas))
+        arrays = {}
+        for posicao, (nome, tipo) in enumerate(self.colunas):
+            coluna = valores[posicao]
+            if tipo == "mes":
+                if self.com_mes:
+                    arrays["mes"] = pa.array(coluna, pa.string())
+            elif tipo in ("turma", "disciplina"):
+                ids = pa.array(coluna, pa.int32())
+                chaves, nomes = self._dicionarios[tipo]
+                arrays[f"{nome}_id"] = ids
+                arrays[nome] = pa.DictionaryArray.from_arrays(pc.index_in(ids, value_set=chaves), nomes)
+            elif tipo == "timestamp":
+                # Texto do SQLite ('AAAA-MM-DD HH:MM:SS.ffffff') convertido pelo Arrow
+                arrays[nome] = pa.array(coluna, pa.string()).cast(pa.timestamp("us"))
+            elif tipo == "bool":
+                arrays[nome] = pa.array(coluna, pa.int8()).cast(pa.bool_())
+            else:
+                arrays[nome] = pa.array(coluna, _TIPOS[tipo]())
+        if self.tabela == "alunos_disciplinas":
+            total, presencas = arrays["total_sessoes"], arrays["presencas"]
+            arrays["faltas"] = pc.subtract(total, presencas)
+            percentual = pc.round(pc.multiply(pc.divide(pc.cast(presencas, pa.float64()), total), 100), 2)
+            arrays["percentual_presenca"] = pc.if_else(pc.greater(total, 0), percentual, 0.0)
+        return pa.RecordBatch.from_arrays([arrays[nome] for nome in self.esquema.names], schema=self.esquema)
+
+def _lotes(db: Session, conversor: Conversor, inicio: date = None, fim: date = None) -> Iterable:
+    for mes, linhas in FrequenciaService.lotes_colunares(db, conversor.tabela, inicio, fim):
+        yield mes, conversor.lote(linhas)
+
+def gerar_arrow(tabela: str, inicio: date = None, fim: date = None, session_factory=SessionLocal):
+    # Fluxo Arrow IPC em blocos de bytes para um StreamingResponse, um record
+    # batch por vez. Abre a própria sessão, como o CSV.
+    buffer = io.BytesIO()
+
+    def esvaziar():
+        bloco = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return bloco
+
+    db = session_factory()
+    try:
+        conversor = Conversor(db, tabela)
+        with ipc.new_stream(buffer, conversor.esquema) as escritor:
+            for _, lote in _lotes(db, conversor, inicio, fim):
+                escritor.write_batch(lote)
+                yield esvaziar()
+        yield esvaziar()
+    finally:
+        db.close()
+
+def gravar_parquet(db: Session, tabela: str, caminho: str, inicio: date = None, fim: date = None) -> int:
+    # Um arquivo com a coluna "mes"; cada lote (de um só mês) é um row group
+    conversor = Conversor(db, tabela)
+    linhas = 0
+    with pq.ParquetWriter(caminho, conversor.esquema, compression="zstd") as escritor:
+        for _, lote in _lotes(db, conversor, inicio, fim):
+            escritor.write_batch(lote)
+            linhas += lote.num_rows
+    return linhas
+
+def exportar_pasta(db: Session, destino: str, tabelas: Iterable[str] = TABELAS, formato: str = "parquet",
+                   inicio: date = None, fim: date = None) -> Dict[str, Dict[str, int]]:
+    # Grava destino/<tabela>/mes=AAAA-MM/parte-N.<formato> (tabela sem mês:
+    # destino/<tabela>/parte-0.<formato>). Só o arquivo do mês corrente fica
+    # aberto; um mês que reaparece (sessão lançada num ano já arquivado) ganha
+    # outra parte na mesma pasta.
+    _exigir()
+    extensao = "parquet" if formato == "parquet" else "arrow"
+    resultado = {}
+    for tabela in tabelas:
+        validar(tabela, formato, inicio, fim)
+        conversor = Conversor(db, tabela, com_mes=False)
+        partes: Dict[str, int] = {}
+        linhas = 0
+        escritor, mes_aberto = None, object()
+        try:
+            for mes, lote in _lotes(db, conversor, inicio, fim):
+                if mes != mes_aberto:
+                    if escritor is not None:
+                        escritor.close()
+                    pasta = os.path.join(destino, tabela, f"mes={mes}" if mes is not None else "")
+                    os.makedirs(pasta, exist_ok=True)
+                    numero = partes[mes] = partes.get(mes, -1) + 1
+                    caminho = os.path.join(pasta, f"parte-{numero}.{extensao}")
+                    if formato == "parquet":
+                        escritor = pq.ParquetWriter(caminho, conversor.esquema, compression="zstd")
+                    else:
+                        escritor = ipc.new_file(caminho, conversor.esquema)
+                    mes_aberto = mes
+                escritor.write_batch(lote)
+                linhas += lote.num_rows
+        finally:
+            if escritor is not None:
+                escritor.close()
+        resultado[tabela] = {"linhas": linhas, "particoes": len(partes)}
+    return resultado
+
+def resposta_colunar(tabela: str, formato: str = "parquet", inicio: date = None, fim: date = None):
+    _exigir()
+    validar(tabela, formato, inicio, fim)
+    sufixo = f"_{inicio or 'inicio'}_{fim or 'fim'}" if inicio or fim else ""
+    nome_arquivo = f"{tabela}{sufixo}.{formato}"
+    cabecalhos = {"Content-Disposition": f'attachment; filename="{nome_arquivo}"'}
+    if formato == "arrow":
+        return StreamingResponse(gerar_arrow(tabela, inicio, fim), media_type=TIPOS_CONTEUDO["arrow"],
+                                 headers=cabecalhos)
+    # O rodapé do Parquet só é escrito no fim: o arquivo é montado em disco, um
+    # row group por vez, e apagado depois de enviado
+    descritor, caminho = tempfile.mkstemp(suffix=".parquet", prefix="exportacao_")
+    os.close(descritor)
+    db = SessionLocal()
+    try:
+        gravar_parquet(db, tabela, caminho, inicio, fim)
+    except BaseException:
+        os.remove(caminho)
+        raise
+    finally:
+        db.close()
+    return FileResponse(caminho, media_type=TIPOS_CONTEUDO["parquet"], headers=cabecalhos,
+                        background=BackgroundTask(os.remove, caminho))
@@ -0,0 +1,184 @@
+import asyncio
+import json
+import threading
+from urllib.parse import parse_qs
+from typing import Dict, List, Optional, Set, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import config
+
+# Canal de eventos ao vivo (Server-Sent Events). As marcações de frequência
+# registram na sessão do banco um evento compacto por sessão de aula (deltas de
+# presenças/faltas por aluno e os contadores da sessão) e ele só é publicado depois
+# do commit, como a invalidação do cache. Cada assinante é uma fila asyncio no
+# laço do servidor, registrada no tópico (turma_id, disciplina_id) pedido, com None
+# valendo "qualquer". O evento é serializado uma vez e a mesma string vai para
+# todas as filas; um assinante parado não custa mais que a fila e duas tarefas
+# suspensas, e uma única tarefa manda o comentário de keep-alive para todos.
+
+_CHAVE_SESSAO = "eventos_pendentes"
+
+PING = ": ping\n\n"
+RECONECTAR_MS = 3000
+# Assinante lento: a fila cheia é trocada por um aviso para recarregar tudo
+RECARREGAR = "event: recarregar\ndata: {}\n\n"
+
+class Assinatura:
+    __slots__ = ("topico", "fila")
+
+    def __init__(self, topico: Tuple, tamanho_fila: int):
+        self.topico = topico
+        self.fila = asyncio.Queue(tamanho_fila)
+
+class CanalEventos:
+
+    def __init__(self, intervalo_ping: float = config.EVENTOS_PING_S, tamanho_fila: int = config.EVENTOS_FILA):
+        self.intervalo_ping = intervalo_ping
+        self.tamanho_fila = tamanho_fila
+        self._assinantes: Dict[Tuple, Set[Assinatura]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._ping = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _topicos(turma_id, disciplina_id) -> List[Tuple]:
+        # Assinaturas que recebem um evento da turma/disciplina
+        return [(turma_id, disciplina_id), (turma_id, None), (None, disciplina_id), (None, None)]
+
+    @property
+    def assinantes(self) -> int:
+        return sum(len(assinaturas) for assinaturas in self._assinantes.values())
+
+    def assinado(self, turma_id: int, disciplina_id: int) -> bool:
+        # As escritas só montam o evento se alguém vai recebê-lo
+        return any(self._assinantes.get(topico) for topico in self._topicos(turma_id, disciplina_id))
+
+    def assinar(self, turma_id: int = None, disciplina_id: int = None) -> Assinatura:
+        # Chamado no laço do servidor, que passa a receber as publicações
+        assinatura = Assinatura((turma_id, disciplina_id), self.tamanho_fila)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._assinantes.setdefault(assinatura.topico, set()).add(assinatura)
+            if self._ping is None or self._ping.done():
+                self._ping = self._loop.create_task(self._pingar())
+        return assinatura
+
+    def cancelar(self, assinatura: Assinatura):
+        with self._lock:
+            assinaturas = self._assinantes.get(assinatura.topico)
+            if assinaturas is not None:
+                assinaturas.discard(assinatura)
+                if not assinaturas:
+                    del self._assinantes[assinatura.topico]
+
+    def publicar(self, evento: Dict):
+        # Pode ser chamado de qualquer thread (rotas síncronas, agrupador de escritas)
+        loop = self._loop
+        if loop is None or loop.is_closed() or not self.assinado(evento["turma_id"], evento["disciplina_id"]):
+            return
+        texto = f"event: frequencia\ndata: {json.dumps(evento, separators=(',', ':'))}\n\n"
+        loop.call_soon_threadsafe(self._distribuir, self._topicos(evento["turma_id"], evento["disciplina_id"]), texto)
+
+    def _distribuir(self, topicos, texto: str):
+        for topico in topicos:
+            for assinatura in list(self._assinantes.get(topico, ())):
+                self._entregar(assinatura, texto)
+
+    @staticmethod
+    def _entregar(assinatura: Assinatura, texto: str):
+        try:
+            assinatura.fila.put_nowait(texto)
+        except asyncio.QueueFull:
+            while not assinatura.fila.empty():
+                assinatura.fila.get_nowait()
+            assinatura.fila.put_nowait(RECARREGAR)
+
+    async def _pingar(self):
+        while self._assinantes:
+            await asyncio.sleep(self.intervalo_ping)
+            for assinaturas in list(self._assinantes.values()):
+                for assinatura in list(assinaturas):
+                    if assinatura.fila.empty():
+                        self._entregar(assinatura, PING)
+
+canal_eventos = CanalEventos()
+
+def registrar_evento(db: Session, evento: Dict):
+    # Chamado pelas escritas; o evento só é publicado após o commit
+    db.info.setdefault(_CHAVE_SESSAO, []).append(evento)
+
+@event.listens_for(Session, "after_commit")
+def _publicar_eventos(session):
+    for evento in session.info.pop(_CHAVE_SESSAO, ()):
+        canal_eventos.publicar(evento)
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_eventos(session):
+    session.info.pop(_CHAVE_SESSAO, None)
+
+class MiddlewareEventos:
+    # Serve GET /api/v1/eventos em ASGI puro, por fora dos outros middlewares (e
+    # das métricas, que contariam cada conexão como uma requisição de horas): as
+    # conexões ficam abertas e cada evento vira um envio em cada uma delas, sem
+    # roteamento, CORS nem StreamingResponse no caminho. Uma tarefa por assinante
+    # espera a desconexão do cliente e encerra o fluxo.
+
+    def __init__(self, app, caminho: str = "/api/v1/eventos", canal: CanalEventos = None):
+        self.app = app
+        self.caminho = caminho
+        self.canal = canal or canal_eventos
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].rstrip("/") != self.caminho or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        try:
+            parametros = parse_qs(scope["query_string"].decode("latin-1"))
+            turma_id, disciplina_id = (
+                int(parametros[nome][0]) if nome in parametros else None for nome in ("turma_id", "disciplina_id")
+            )
+        except ValueError:
+            await _responder(send, 400, {"detail": "turma_id e disciplina_id devem ser inteiros"})
+            return
+        
+        await send({"type": "http.response.start", "status": 200, "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            # Sem cache nem buffer de proxy (nginx) no meio do fluxo
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+            (b"access-control-allow-origin", b"*"),
+        ]})
+        assinatura = self.canal.assinar(turma_id, disciplina_id)
+        
+        async def vigiar():
+            while (await receive())["type"] != "http.disconnect":
+                pass
+            while not assinatura.fila.empty():
+                assinatura.fila.get_nowait()
+            assinatura.fila.put_nowait(None)
+        
+        vigia = asyncio.ensure_future(vigiar())
+        try:
+            await _enviar(send, f"retry: {RECONECTAR_MS}\n\n")
+            while True:
+                texto = await assinatura.fila.get()
+                if texto is None:
+                    break
+                # Eventos acumulados enquanto o laço estava ocupado vão juntos
+                pendentes = [texto]
+                while not assinatura.fila.empty():
+                    pendentes.append(assinatura.fila.get_nowait())
+                if None in pendentes:
+                    break
+                await _enviar(send, "".join(pendentes))
+        finally:
+            vigia.cancel()
+            self.canal.cancelar(assinatura)
+
+async def _enviar(send, texto: str):
+    await send({"type": "http.response.body", "body": texto.encode(), "more_body": True})
+
+async def _responder(send, status: int, corpo: Dict):
+    await send({"type": "http.response.start", "status": status,
+                "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": json.dumps(corpo).encode()})
@@ -0,0 +1,61 @@
+import csv
+import io
+import zlib
+from datetime import date
+from fastapi.responses import StreamingResponse
+from app.database import SessionLocal
+from app.services.frequencia_service import FrequenciaService
+
+CABECALHO_CSV = (
+    "nome", "matricula", "total_sessoes", "presencas", "faltas",
+    "faltas_justificadas", "percentual_presenca"
+)
+
+def gerar_csv(turma_id: int = None, disciplina_id: int = None, compactar: bool = False,
+              linhas_por_bloco: int = 500, session_factory=SessionLocal, inicio: date = None, fim: date = None):
+    # Gera o CSV em blocos de bytes para um StreamingResponse. Abre a própria
+    # sessão porque o corpo é consumido depois que a rota já retornou.
+    compressor = zlib.compressobj(wbits=31) if compactar else None  # formato gzip
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, lineterminator="\n")
+    
+    def esvaziar():
+        bloco = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+        return compressor.compress(bloco) if compressor else bloco
+    
+    db = session_factory()
+    try:
+        buffer.write("﻿")  # BOM, para o Excel reconhecer UTF-8
+        escritor.writerow(CABECALHO_CSV)
+        pendentes = 0
+        for linha in FrequenciaService.linhas_exportacao(db, turma_id, disciplina_id, inicio=inicio, fim=fim):
+            escritor.writerow(linha)
+            pendentes += 1
+            if pendentes >= linhas_por_bloco:
+                pendentes = 0
+                bloco = esvaziar()
+                if bloco:
+                    yield bloco
+        bloco = esvaziar()
+        if compressor:
+            bloco += compressor.flush()
+        if bloco:
+            yield bloco
+    finally:
+        db.close()
+
+def resposta_csv(nome_arquivo: str, compactar: bool = False, **filtros) -> StreamingResponse:
+    # Depois que o streaming começa não dá mais para responder 400
+    FrequenciaService.validar_periodo(filtros.get("inicio"), filtros.get("fim"))
+    if compactar:
+        nome_arquivo += ".gz"
+        tipo = "application/gzip"
+    else:
+        tipo = "text/csv; charset=utf-8"
+    return StreamingResponse(
+        gerar_csv(compactar=compactar, **filtros),
+        media_type=tipo,
+        headers={"Content-Disposition": f'attachment; filename="{nome_arquivo}"'}
+    )
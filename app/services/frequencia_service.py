@@ -1,9 +1,250 @@
-from sqlalchemy.orm import Session
-from app.database import Turma, Aluno, Sessao, Frequencia, Disciplina, aluno_disciplina
-from app.schemas import TurmaCreate, AlunoCreate, SessaoCreate, FrequenciaCreate, DisciplinaCreate, MatricularAluno, FrequenciaIndividual
-from datetime import datetime, timedelta
+from sqlalchemy import func, case, and_, select, delete, literal, tuple_, union_all, inspect, type_coerce, Integer, String
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session, aliased
+from app.database import Turma, Aluno, Sessao, Frequencia, Disciplina, aluno_disciplina, ContadorAluno, ContadorAlunoDisciplina, ContadorSessao, ArquivoAnual, ResumoAnual, EnvioSync
+from app import config
+from app.services.cache import cache_relatorios, registrar_alteracao, GERAL, CADASTRO, TUDO
+from app.services.matriculas import indice_matriculas, registrar_matricula
+from app.services.sessoes import indice_sessoes, registrar_sessao
+from app.services.analitico import motores_analiticos
+from app.services.eventos import canal_eventos, registrar_evento
+from app.services import arquivamento, sincronizacao
+from app.services.sincronizacao import registrar_mudancas
+from app.schemas import TurmaCreate, AlunoCreate, SessaoCreate, FrequenciaCreate, DisciplinaCreate, MatricularAluno, FrequenciaIndividual, FrequenciaLoteItem, AgendaSessoes, FrequenciaSync
+from datetime import date, datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+import base64
+import math
 import json
-from typing import List, Dict
+from typing import List, Dict, Iterable, Tuple
+
+def _somas_categoria(sinal: int = 1):
+    # Presença, falta e falta justificada de cada registro, somadas (ou subtraídas)
+    return (
+        func.sum(case((Frequencia.presente, sinal), else_=0)),
+        func.sum(case((Frequencia.presente, 0), else_=sinal)),
+        func.sum(case((Frequencia.presente, 0), (Frequencia.justificado, sinal), else_=0)),
+    )
+
+def _colunas_contador(contador):
+    # Total de registros, presenças e faltas justificadas lidos das tabelas de contadores
+    presencas = func.coalesce(contador.presencas, 0)
+    faltas = func.coalesce(contador.faltas, 0)
+    return (
+        (presencas + faltas).label("total_sessoes"),
+        presencas.label("presencas"),
+        func.coalesce(contador.faltas_justificadas, 0).label("faltas_justificadas"),
+    )
+
+def _categoria(presente, justificado) -> Dict:
+    if presente:
+        return {"presencas": 1, "faltas": 0, "faltas_justificadas": 0}
+    return {"presencas": 0, "faltas": 1, "faltas_justificadas": 1 if justificado else 0}
+
+def _evento_frequencia(db: Session, sessao_id: int, turma_id: int, disciplina_id: int,
+                       deltas: List[Dict], anteriores: Dict) -> Dict:
+    # Evento de /eventos de uma marcação: delta líquido [presenças, faltas,
+    # justificadas] de cada aluno alterado, a soma deles e os contadores da sessão
+    # já atualizados (lidos na mesma transação)
+    campos = ("presencas", "faltas", "faltas_justificadas")
+    vazio = dict.fromkeys(campos, 0)
+    alunos = {}
+    for delta in deltas:
+        anterior = anteriores.get(delta["aluno_id"], vazio)
+        liquido = [delta[campo] - anterior[campo] for campo in campos]
+        if any(liquido):
+            alunos[delta["aluno_id"]] = liquido
+    sessao = db.execute(select(
+        ContadorSessao.presencas, ContadorSessao.faltas, ContadorSessao.faltas_justificadas
+    ).where(ContadorSessao.sessao_id == sessao_id)).one()
+    return {
+        "sessao_id": sessao_id,
+        "turma_id": turma_id,
+        "disciplina_id": disciplina_id,
+        **{campo: sum(liquido[i] for liquido in alunos.values()) for i, campo in enumerate(campos)},
+        "sessao": list(sessao),
+        "alunos": alunos
+    }
+
+def _upsert_contadores(contador, chaves: List[str], fonte=None, linhas: List[Dict] = None):
+    # Soma os deltas ao contador existente (ou cria a linha)
+    tabela = contador.__table__
+    campos = ("presencas", "faltas", "faltas_justificadas")
+    if fonte is not None:
+        stmt = sqlite_insert(tabela).from_select([*chaves, *campos], fonte)
+    else:
+        stmt = sqlite_insert(tabela)
+    return stmt.on_conflict_do_update(
+        index_elements=chaves,
+        set_={campo: tabela.c[campo] + stmt.excluded[campo] for campo in campos}
+    )
+
+def _montar_relatorio(total: int, presencas: int, justificadas: int) -> Dict:
+    return {
+        "total_sessoes": total,
+        "presencas": presencas,
+        "faltas": total - presencas,
+        "faltas_justificadas": justificadas,
+        "percentual_presenca": round((presencas / total * 100) if total > 0 else 0, 2)
+    }
+
+def _dia_sessao():
+    # Mesma expressão do índice ix_sessoes_dia ('AAAA-MM-DD')
+    return func.date(Sessao.data)
+
+def _periodo(inicio: date = None, fim: date = None) -> List:
+    # Filtros pelo dia da sessão para o intervalo [inicio, fim], datas inclusivas
+    if inicio is not None and fim is not None and inicio > fim:
+        raise ValueError("inicio deve ser anterior ou igual a fim")
+    filtros = []
+    if inicio is not None:
+        filtros.append(_dia_sessao() >= inicio.isoformat())
+    if fim is not None:
+        filtros.append(_dia_sessao() <= fim.isoformat())
+    return filtros
+
+def _periodo_arquivado(db: Session, inicio: date = None, fim: date = None):
+    # Anos arquivados que um relatório com período precisa somar (None: nenhum).
+    # Sem período os contadores já incluem os anos arquivados.
+    if inicio is None and fim is None:
+        return None
+    return arquivamento.periodo_arquivado(db, inicio, fim)
+
+def _motor(db: Session, inicio: date = None, fim: date = None):
+    # O motor analítico só carrega o banco principal: se o relatório alcança um ano
+    # arquivado (sem período, todos), a resposta vem do SQL
+    if not config.ANALITICO or arquivamento.periodo_arquivado(db, inicio, fim):
+        return None
+    return motores_analiticos.para(db)
+
+def _contadores(contador, periodo: List, *filtros, db: Session = None, arquivado=None):
+    # Sem período, a própria tabela de contadores. Com período, os mesmos campos
+    # somados dos registros das sessões do intervalo, com a forma do contador
+    # (aliased), para as consultas dos relatórios não mudarem. `filtros` restringem
+    # a agregação aos alunos/disciplinas que o relatório vai ler. Anos arquivados
+    # (`arquivado`, de _periodo_arquivado) entram pelos resumos anuais, quando o
+    # período cobre o ano inteiro, ou pelo arquivo anexado na conexão de `db`.
+    if not periodo:
+        return contador
+    por_disciplina = contador is ContadorAlunoDisciplina
+    chaves = [Frequencia.aluno_id]
+    if por_disciplina:
+        chaves.append(Sessao.disciplina_id)
+    campos = ("presencas", "faltas", "faltas_justificadas")
+    somas = [soma.label(nome) for nome, soma in zip(campos, _somas_categoria())]
+    agregado = select(*chaves, *somas).join(Sessao, Sessao.id == Frequencia.sessao_id).where(
+        *periodo, *filtros
+    ).group_by(*chaves)
+    if arquivado:
+        partes = [agregado]
+        anexar = list(arquivado.parciais)
+        filtros_resumo = [arquivamento.para_resumo(filtro) for filtro in filtros]
+        if arquivado.inteiros and all(filtro is not None for filtro in filtros_resumo):
+            chaves_resumo = [ResumoAnual.aluno_id]
+            if por_disciplina:
+                chaves_resumo.append(ResumoAnual.disciplina_id)
+                filtros_resumo.append(ResumoAnual.disciplina_id != 0)
+            partes.append(select(*chaves_resumo, *(
+                func.sum(getattr(ResumoAnual, campo)).label(campo) for campo in campos
+            )).where(ResumoAnual.ano.in_(arquivado.inteiros), *filtros_resumo).group_by(*chaves_resumo))
+        else:
+            anexar += arquivado.inteiros
+        if anexar:
+            arquivamento.anexar(db, anexar)
+            partes += [arquivamento.adaptar(agregado, ano) for ano in anexar]
+        uniao = union_all(*partes).subquery()
+        chaves_uniao = [uniao.c[chave.name] for chave in chaves]
+        agregado = select(*chaves_uniao, *(
+            func.sum(uniao.c[campo]).label(campo) for campo in campos
+        )).group_by(*chaves_uniao)
+    return aliased(contador, agregado.subquery(), adapt_on_names=True)
+
+def _preencher_contadores_sessao():
+    return ContadorSessao.__table__.insert().from_select(
+        ["sessao_id", "presencas", "faltas", "faltas_justificadas"],
+        select(Frequencia.sessao_id, *_somas_categoria()).where(
+            Frequencia.sessao_id.isnot(None)
+        ).group_by(Frequencia.sessao_id)
+    )
+
+# Rótulo de cada ponto da série a partir do dia ('AAAA-MM-DD'); a semana é
+# identificada pela data da sua segunda-feira
+GRANULARIDADES = {
+    "dia": lambda dia: dia,
+    "semana": lambda dia: func.date(dia, "weekday 0", "-6 days"),
+    "mes": lambda dia: func.strftime("%Y-%m", dia),
+}
+
+LIMITE_PADRAO = 100
+
+# Linhas por lote da exportação colunar (um record batch / row group)
+LOTE_COLUNAR = 65536
+
+# Maior período aceito por agendar_sessoes (um ano letivo com folga)
+DIAS_AGENDA_MAX = 366
+
+def _codificar_cursor(valores: List) -> str:
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode().rstrip("=")
+
+def _decodificar_cursor(cursor: str, tamanho: int) -> List:
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("Cursor inválido")
+    if not isinstance(valores, list) or len(valores) != tamanho:
+        raise ValueError("Cursor inválido para esta ordenação")
+    return valores
+
+def _campos_projecao(modelo, fields: str = None) -> List[str]:
+    colunas = list(modelo.__table__.columns.keys())
+    if fields is None:
+        return colunas
+    pedidos = [campo.strip() for campo in fields.split(",") if campo.strip()]
+    if not pedidos:
+        raise ValueError("Informe ao menos um campo em fields")
+    invalidos = [campo for campo in pedidos if campo not in colunas]
+    if invalidos:
+        raise ValueError(f"Campos inválidos: {', '.join(invalidos)}. Disponíveis: {', '.join(colunas)}")
+    return pedidos
+
+def _listar(db: Session, modelo, *filtros, join=None, coluna_id=None, limit: int = None,
+            cursor: str = None, ordem: str = "id", fields: str = None):
+    # Listagem comum das rotas GET de cadastro. Sem limit/cursor devolve a lista
+    # completa, como sempre; com `fields` só as colunas pedidas; com `limit` ou
+    # `cursor` uma página {"itens", "proximo_cursor"} por keyset (WHERE (nome, id)
+    # > cursor), sem OFFSET. As linhas saem das tuplas do SQL, sem objetos ORM. `coluna_id` permite ordenar pela
+    # coluna de junção equivalente ao id, para seguir o índice da junção.
+    if ordem not in ("id", "nome"):
+        raise ValueError("Ordem inválida: use id ou nome")
+    chaves = ["id"] if ordem == "id" else ["nome", "id"]
+    colunas_ordem = {"id": coluna_id if coluna_id is not None else modelo.__table__.c.id, "nome": modelo.__table__.c.nome}
+    ordenacao = [colunas_ordem[chave] for chave in chaves]
+    paginar = limit is not None or cursor is not None
+    
+    campos = _campos_projecao(modelo, fields)
+    consulta = db.query(*[modelo.__table__.c[campo] for campo in dict.fromkeys(campos + chaves)])
+    if join is not None:
+        consulta = consulta.join(*join)
+    consulta = consulta.filter(*filtros)
+    if cursor is not None:
+        consulta = consulta.filter(tuple_(*ordenacao) > tuple_(*_decodificar_cursor(cursor, len(chaves))))
+    consulta = consulta.order_by(*ordenacao)
+    
+    # As colunas pedidas vêm primeiro no SELECT: cada linha vira dict por zip
+    if not paginar:
+        return [dict(zip(campos, linha)) for linha in consulta]
+    
+    limite = limit or LIMITE_PADRAO
+    linhas = consulta.limit(limite + 1).all()
+    proximo_cursor = None
+    if len(linhas) > limite:
+        linhas = linhas[:limite]
+        proximo_cursor = _codificar_cursor([getattr(linhas[-1], chave) for chave in chaves])
+    return {
+        "itens": [dict(zip(campos, linha)) for linha in linhas],
+        "proximo_cursor": proximo_cursor
+    }
 
 class FrequenciaService:
     
@@ -11,25 +252,36 @@ class FrequenciaService:
     def criar_turma(db: Session, turma: TurmaCreate):
         db_turma = Turma(**turma.dict())
         db.add(db_turma)
+        db.flush()
+        registrar_alteracao(db, GERAL, CADASTRO)
+        registrar_mudancas(db, "turma", [db_turma.id])
         db.commit()
         db.refresh(db_turma)
         return db_turma
     
     @staticmethod
-    def listar_turmas(db: Session):
-        return db.query(Turma).all()
+    def listar_turmas(db: Session, limit: int = None, cursor: str = None, ordem: str = "id", fields: str = None):
+        return _listar(db, Turma, limit=limit, cursor=cursor, ordem=ordem, fields=fields)
+    
+    @staticmethod
+    def get_turma(db: Session, turma_id: int):
+        return db.query(Turma).filter(Turma.id == turma_id).first()
     
     @staticmethod
     def criar_disciplina(db: Session, disciplina: DisciplinaCreate):
         db_disciplina = Disciplina(**disciplina.dict())
         db.add(db_disciplina)
+        db.flush()
+        registrar_alteracao(db, GERAL, CADASTRO)
+        registrar_matricula(db, ("disciplina", db_disciplina.id))
+        registrar_mudancas(db, "disciplina", [db_disciplina.id])
         db.commit()
         db.refresh(db_disciplina)
         return db_disciplina
     
     @staticmethod
-    def listar_disciplinas(db: Session):
-        return db.query(Disciplina).all()
+    def listar_disciplinas(db: Session, limit: int = None, cursor: str = None, ordem: str = "id", fields: str = None):
+        return _listar(db, Disciplina, limit=limit, cursor=cursor, ordem=ordem, fields=fields)
     
     @staticmethod
     def get_disciplina(db: Session, disciplina_id: int):
@@ -41,38 +293,159 @@ class FrequenciaService:
         disciplina_ids = aluno_data.pop('disciplina_ids', [])
         
         db_aluno = Aluno(**aluno_data)
+        
+        # Matricular aluno nas disciplinas (ids inexistentes são ignorados)
+        disciplinas = db.query(Disciplina).filter(Disciplina.id.in_(disciplina_ids)).all() if disciplina_ids else []
+        db_aluno.disciplinas = disciplinas
+        
         db.add(db_aluno)
+        db.flush()
+        registrar_alteracao(db, ("turma", db_aluno.turma_id), GERAL, CADASTRO)
+        registrar_matricula(
+            db, ("aluno", db_aluno.id, db_aluno.turma_id),
+            *(("matricula", db_aluno.id, disciplina.id) for disciplina in disciplinas)
+        )
+        registrar_mudancas(db, "aluno", [db_aluno.id])
         db.commit()
         db.refresh(db_aluno)
+        return db_aluno
+    
+    @staticmethod
+    def importar_alunos(db: Session, registros: Iterable[Tuple[int, Dict]], tamanho_lote: int = 5000):
+        # Importação em massa de alunos e matrículas. `registros` traz pares
+        # (número da linha, dados) ou (número da linha, mensagem de erro) vindos
+        # do leitor do arquivo. Turmas e disciplinas são resolvidas por mapas
+        # carregados uma vez; cada lote vira poucos executemany e um commit.
+        # Linhas inválidas entram em "erros" sem interromper o arquivo, e a
+        # reimportação de uma matrícula atualiza o aluno em vez de duplicá-lo.
+        turmas = dict(db.query(Turma.nome, Turma.id).all())
+        disciplinas = dict(db.query(Disciplina.codigo, Disciplina.id).all())
+        resultado = {"alunos": 0, "matriculas": 0, "turmas_criadas": 0, "erros": []}
         
-        # Matricular aluno nas disciplinas
-        for disciplina_id in disciplina_ids:
-            disciplina = db.query(Disciplina).filter(Disciplina.id == disciplina_id).first()
-            if disciplina:
-                db_aluno.disciplinas.append(disciplina)
+        def gravar(lote):
+            if not lote:
+                return
+            alunos_tabela = Aluno.__table__
+            stmt = sqlite_insert(alunos_tabela)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["matricula"],
+                set_={campo: stmt.excluded[campo] for campo in ("nome", "email", "turma_id")}
+            ).returning(alunos_tabela.c.id, alunos_tabela.c.matricula)
+            ids = dict(
+                (matricula, aluno_id) for aluno_id, matricula in
+                db.execute(stmt, [aluno for aluno, _ in lote]).all()
+            )
+            matriculas = [
+                {"aluno_id": ids[aluno["matricula"]], "disciplina_id": disciplina_id}
+                for aluno, disciplina_ids in lote
+                for disciplina_id in disciplina_ids
+            ]
+            registrar_matricula(
+                db,
+                *(("aluno", ids[aluno["matricula"]], aluno["turma_id"]) for aluno, _ in lote),
+                *(("matricula", m["aluno_id"], m["disciplina_id"]) for m in matriculas)
+            )
+            if matriculas:
+                # Matrículas já existentes são ignoradas; rowcount conta só as novas
+                novas = db.execute(sqlite_insert(aluno_disciplina).on_conflict_do_nothing(), matriculas).rowcount
+                resultado["matriculas"] += novas
+            registrar_alteracao(db, TUDO)
+            registrar_mudancas(db, "aluno", sorted(ids.values()))
+            db.commit()
+            resultado["alunos"] += len(ids)
         
+        lote = []
+        for numero, dados in registros:
+            if isinstance(dados, str):
+                resultado["erros"].append({"linha": numero, "erro": dados})
+                continue
+            # JSONL pode trazer números (ou outros tipos) onde se espera texto
+            nome = str(dados.get("nome") or "").strip()
+            matricula = str(dados.get("matricula") or "").strip()
+            nome_turma = str(dados.get("turma") or "").strip()
+            if not nome or not matricula or not nome_turma:
+                resultado["erros"].append({"linha": numero, "erro": "Campos obrigatórios: nome, matricula, turma"})
+                continue
+            
+            codigos = dados.get("disciplinas") or []
+            if isinstance(codigos, str):
+                codigos = codigos.split(";")
+            elif not isinstance(codigos, list):
+                resultado["erros"].append({"linha": numero, "erro": "disciplinas deve ser uma lista de códigos ou texto separado por ';'"})
+                continue
+            codigos = [str(codigo).strip() for codigo in codigos if str(codigo).strip()]
+            desconhecidas = [codigo for codigo in codigos if codigo not in disciplinas]
+            if desconhecidas:
+                resultado["erros"].append({"linha": numero, "erro": f"Disciplina não encontrada: {', '.join(desconhecidas)}"})
+                continue
+            
+            turma_id = turmas.get(nome_turma)
+            if turma_id is None:
+                # Turma nova só é criada quando a linha informa ano e período
+                try:
+                    ano = int(dados.get("ano"))
+                except (TypeError, ValueError):
+                    ano = None
+                periodo = str(dados.get("periodo") or "").strip()
+                if ano is None or not periodo:
+                    resultado["erros"].append({"linha": numero, "erro": f"Turma não encontrada: {nome_turma}"})
+                    continue
+                turma = Turma(nome=nome_turma, ano=ano, periodo=periodo)
+                db.add(turma)
+                db.flush()
+                registrar_mudancas(db, "turma", [turma.id])
+                registrar_alteracao(db, TUDO)
+                turma_id = turmas[nome_turma] = turma.id
+                resultado["turmas_criadas"] += 1
+            
+            lote.append((
+                {"nome": nome, "matricula": matricula, "email": str(dados.get("email") or "").strip() or None, "turma_id": turma_id},
+                {disciplinas[codigo] for codigo in codigos}
+            ))
+            if len(lote) >= tamanho_lote:
+                gravar(lote)
+                lote = []
+        gravar(lote)
         db.commit()
-        return db_aluno
+        return resultado
     
     @staticmethod
     def matricular_aluno_disciplina(db: Session, matricula: MatricularAluno):
-        aluno = db.query(Aluno).filter(Aluno.id == matricula.aluno_id).first()
-        disciplina = db.query(Disciplina).filter(Disciplina.id == matricula.disciplina_id).first()
+        indice = indice_matriculas.para(db)
+        if (not indice.aluno_existe(db, matricula.aluno_id)
+                or not indice.disciplina_existe(db, matricula.disciplina_id)
+                or indice.matriculado(db, matricula.aluno_id, matricula.disciplina_id)):
+            return {"error": "Matrícula não realizada"}
         
-        if aluno and disciplina and disciplina not in aluno.disciplinas:
-            aluno.disciplinas.append(disciplina)
-            db.commit()
-            return {"message": f"Aluno {aluno.nome} matriculado em {disciplina.nome}"}
-        return {"error": "Matrícula não realizada"}
+        nome_aluno = db.query(Aluno.nome).filter(Aluno.id == matricula.aluno_id).scalar()
+        nome_disciplina = db.query(Disciplina.nome).filter(Disciplina.id == matricula.disciplina_id).scalar()
+        db.execute(sqlite_insert(aluno_disciplina).on_conflict_do_nothing(), [
+            {"aluno_id": matricula.aluno_id, "disciplina_id": matricula.disciplina_id}
+        ])
+        registrar_alteracao(db, ("aluno", matricula.aluno_id), GERAL, CADASTRO)
+        registrar_matricula(db, ("matricula", matricula.aluno_id, matricula.disciplina_id))
+        # A matrícula vai para o cliente junto do aluno (disciplina_ids)
+        registrar_mudancas(db, "aluno", [matricula.aluno_id])
+        db.commit()
+        return {"message": f"Aluno {nome_aluno} matriculado em {nome_disciplina}"}
     
     @staticmethod
-    def listar_alunos_turma(db: Session, turma_id: int):
-        return db.query(Aluno).filter(Aluno.turma_id == turma_id).all()
+    def listar_alunos(db: Session, limit: int = None, cursor: str = None, ordem: str = "id", fields: str = None):
+        return _listar(db, Aluno, limit=limit, cursor=cursor, ordem=ordem, fields=fields)
     
     @staticmethod
-    def listar_alunos_disciplina(db: Session, disciplina_id: int):
-        disciplina = db.query(Disciplina).filter(Disciplina.id == disciplina_id).first()
-        return disciplina.alunos if disciplina else []
+    def listar_alunos_turma(db: Session, turma_id: int, limit: int = None, cursor: str = None, ordem: str = "id", fields: str = None):
+        return _listar(db, Aluno, Aluno.turma_id == turma_id, limit=limit, cursor=cursor, ordem=ordem, fields=fields)
+    
+    @staticmethod
+    def listar_alunos_disciplina(db: Session, disciplina_id: int, limit: int = None, cursor: str = None, ordem: str = "id", fields: str = None):
+        # Join direto em aluno_disciplina em vez de carregar a coleção Disciplina.alunos
+        return _listar(
+            db, Aluno, aluno_disciplina.c.disciplina_id == disciplina_id,
+            join=(aluno_disciplina, aluno_disciplina.c.aluno_id == Aluno.id),
+            coluna_id=aluno_disciplina.c.aluno_id,
+            limit=limit, cursor=cursor, ordem=ordem, fields=fields
+        )
     
     @staticmethod
     def criar_sessao(db: Session, sessao: SessaoCreate):
@@ -84,147 +457,868 @@ class FrequenciaService:
             data=data_sessao
         )
         db.add(db_sessao)
+        db.flush()
+        # GERAL: a série temporal conta sessões, mesmo sem frequência marcada
+        registrar_alteracao(db, ("turma", db_sessao.turma_id), GERAL)
+        registrar_sessao(db, (db_sessao.turma_id, db_sessao.disciplina_id, data_sessao.date(), db_sessao.id))
+        registrar_mudancas(db, "sessao", [db_sessao.id])
         db.commit()
         db.refresh(db_sessao)
         return db_sessao
     
     @staticmethod
-    def marcar_frequencia_individual(db: Session, frequencia: FrequenciaIndividual):
-        # Verificar se aluno está matriculado na disciplina
-        aluno = db.query(Aluno).filter(Aluno.id == frequencia.aluno_id).first()
-        disciplina = db.query(Disciplina).filter(Disciplina.id == frequencia.disciplina_id).first()
+    def agendar_sessoes(db: Session, agenda: AgendaSessoes):
+        # Cria de uma vez as sessões do período pela grade semanal de cada
+        # turma/disciplina, pulando feriados e os dias em que a turma já tem sessão
+        # da disciplina: reagendar o mesmo período não duplica nada. Um executemany
+        # e um commit para o período inteiro.
+        if agenda.inicio > agenda.fim:
+            raise ValueError("inicio deve ser anterior ou igual a fim")
+        if (agenda.fim - agenda.inicio).days >= DIAS_AGENDA_MAX:
+            raise ValueError(f"O período da agenda é limitado a {DIAS_AGENDA_MAX} dias")
+        turma_ids = {horario.turma_id for horario in agenda.horarios}
+        disciplina_ids = {horario.disciplina_id for horario in agenda.horarios}
+        if db.query(func.count(Turma.id)).filter(Turma.id.in_(turma_ids)).scalar() < len(turma_ids) or \
+                db.query(func.count(Disciplina.id)).filter(Disciplina.id.in_(disciplina_ids)).scalar() < len(disciplina_ids):
+            raise ValueError("Turma ou disciplina não encontrada")
+        
+        # Uma sessão por turma/disciplina/dia, como na marcação individual
+        grade = {}
+        for horario in agenda.horarios:
+            chave = (horario.turma_id, horario.disciplina_id, horario.dia_semana)
+            if chave in grade:
+                raise ValueError(f"Mais de um horário para a turma {chave[0]}, disciplina {chave[1]} no mesmo dia da semana")
+            grade[chave] = horario
+        por_dia_semana = {}
+        for horario in grade.values():
+            por_dia_semana.setdefault(horario.dia_semana, []).append(horario)
         
-        if not aluno or not disciplina:
+        ocupados = set(db.execute(select(Sessao.turma_id, Sessao.disciplina_id, _dia_sessao()).where(
+            *_periodo(agenda.inicio, agenda.fim), Sessao.turma_id.in_(turma_ids)
+        )).all())
+        feriados = set(agenda.feriados)
+        linhas = []
+        existentes = 0
+        dia = agenda.inicio
+        while dia <= agenda.fim:
+            for horario in por_dia_semana.get(dia.weekday(), ()) if dia not in feriados else ():
+                if (horario.turma_id, horario.disciplina_id, dia.isoformat()) in ocupados:
+                    existentes += 1
+                    continue
+                linhas.append({
+                    "turma_id": horario.turma_id,
+                    "disciplina_id": horario.disciplina_id,
+                    "descricao": horario.descricao,
+                    "data": datetime.combine(dia, horario.horario.replace(tzinfo=None))
+                })
+            dia += timedelta(days=1)
+        
+        if linhas:
+            ids = db.execute(Sessao.__table__.insert().returning(Sessao.__table__.c.id), linhas).scalars().all()
+            registrar_mudancas(db, "sessao", ids)
+            registrar_alteracao(db, GERAL, *(("turma", turma_id) for turma_id in turma_ids))
+            db.commit()
+        return {"criadas": len(linhas), "existentes": existentes}
+    
+    @staticmethod
+    def marcar_frequencia_individual(db: Session, frequencia: FrequenciaIndividual):
+        resultado = FrequenciaService._registrar_individual(db, frequencia)
+        db.commit()
+        return resultado
+    
+    @staticmethod
+    def _registrar_individual(db: Session, frequencia: FrequenciaIndividual):
+        # Grava sem confirmar a transação (o commit fica com quem chama)
+        # Verificar se aluno está matriculado na disciplina (índice em memória)
+        indice = indice_matriculas.para(db)
+        if not indice.aluno_existe(db, frequencia.aluno_id) or not indice.disciplina_existe(db, frequencia.disciplina_id):
             raise ValueError("Aluno ou disciplina não encontrados")
         
-        if disciplina not in aluno.disciplinas:
+        if not indice.matriculado(db, frequencia.aluno_id, frequencia.disciplina_id):
             raise ValueError("Aluno não está matriculado nesta disciplina")
+        turma_id = indice.turma(db, frequencia.aluno_id)
         
-        # Criar sessão se não existir uma para hoje
-        hoje = datetime.now().date()
-        sessao = db.query(Sessao).filter(
-            Sessao.disciplina_id == frequencia.disciplina_id,
-            Sessao.turma_id == aluno.turma_id,
-            Sessao.data >= hoje,
-            Sessao.data < hoje + timedelta(days=1)
-        ).first()
-        
-        if not sessao:
+        # Sessão de hoje pelo cache (agendada ou criada antes); sem ela, criar
+        agora = datetime.now()
+        sessao_id = indice_sessoes.para(db).sessao(db, turma_id, frequencia.disciplina_id, agora.date())
+        if sessao_id is None:
             sessao = Sessao(
-                turma_id=aluno.turma_id,
+                turma_id=turma_id,
                 disciplina_id=frequencia.disciplina_id,
-                data=datetime.now()
+                data=agora
             )
             db.add(sessao)
-            db.commit()
-            db.refresh(sessao)
-        
-        # Verificar se já existe frequência para hoje
-        freq_existente = db.query(Frequencia).filter(
-            Frequencia.aluno_id == frequencia.aluno_id,
-            Frequencia.sessao_id == sessao.id
-        ).first()
-        
-        if freq_existente:
-            # Atualizar frequência existente
-            freq_existente.presente = frequencia.presente
-            freq_existente.justificado = frequencia.justificado
-            freq_existente.observacao = frequencia.observacao
-            freq_existente.data_registro = datetime.now()
-        else:
-            # Criar nova frequência
-            db_freq = Frequencia(
-                aluno_id=frequencia.aluno_id,
-                sessao_id=sessao.id,
-                presente=frequencia.presente,
-                justificado=frequencia.justificado,
-                observacao=frequencia.observacao
-            )
-            db.add(db_freq)
+            db.flush()
+            sessao_id = sessao.id
+            registrar_sessao(db, (turma_id, frequencia.disciplina_id, agora.date(), sessao_id))
+            registrar_mudancas(db, "sessao", [sessao_id])
+        
+        FrequenciaService._upsert_frequencias(db, sessao_id, turma_id, frequencia.disciplina_id, [{
+            "aluno_id": frequencia.aluno_id,
+            "presente": frequencia.presente,
+            "justificado": frequencia.justificado,
+            "observacao": frequencia.observacao
+        }])
         
-        db.commit()
         return {"message": "Frequência registrada com sucesso"}
     
     @staticmethod
-    def marcar_frequencia_lote(db: Session, sessao_id: int, frequencias: List[Dict]):
+    def _upsert_frequencias(db: Session, sessao_id: int, turma_id: int, disciplina_id: int, linhas: List[Dict]):
+        aluno_ids = [linha["aluno_id"] for linha in linhas]
+        filtro = (Frequencia.sessao_id == sessao_id, Frequencia.aluno_id.in_(aluno_ids))
+        
+        # Com alguém assinando a turma/disciplina em /eventos, as categorias anteriores
+        # são lidas para o evento levar o delta líquido de cada aluno
+        anteriores = None
+        if canal_eventos.assinado(turma_id, disciplina_id):
+            anteriores = {
+                aluno_id: _categoria(presente, justificado) for aluno_id, presente, justificado in
+                db.execute(select(Frequencia.aluno_id, Frequencia.presente, Frequencia.justificado).where(*filtro))
+            }
+        
+        # Descontar dos contadores os registros que serão sobrescritos. Feito em SQL,
+        # na mesma transação e antes do upsert, para o delta nunca contar duas vezes
+        existentes = select(Frequencia.aluno_id, *_somas_categoria(-1)).where(*filtro).group_by(Frequencia.aluno_id)
+        db.execute(_upsert_contadores(ContadorAluno, ["aluno_id"], existentes))
+        existentes = select(
+            Frequencia.aluno_id, literal(disciplina_id, Integer), *_somas_categoria(-1)
+        ).where(*filtro).group_by(Frequencia.aluno_id)
+        db.execute(_upsert_contadores(ContadorAlunoDisciplina, ["aluno_id", "disciplina_id"], existentes))
+        existentes = select(Frequencia.sessao_id, *_somas_categoria(-1)).where(*filtro).group_by(Frequencia.sessao_id)
+        db.execute(_upsert_contadores(ContadorSessao, ["sessao_id"], existentes))
+        
+        # INSERT ... ON CONFLICT DO UPDATE em um único executemany
+        agora = datetime.utcnow()
+        stmt = sqlite_insert(Frequencia)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Frequencia.aluno_id, Frequencia.sessao_id],
+            set_={
+                "presente": stmt.excluded.presente,
+                "justificado": stmt.excluded.justificado,
+                "observacao": stmt.excluded.observacao,
+                "data_registro": stmt.excluded.data_registro
+            }
+        )
+        db.execute(stmt, [{**linha, "sessao_id": sessao_id, "data_registro": agora} for linha in linhas])
+        registrar_mudancas(db, "frequencia", select(Frequencia.id).where(*filtro))
+        
+        # Somar as novas categorias
+        deltas = [
+            {"aluno_id": linha["aluno_id"], **_categoria(linha["presente"], linha["justificado"])}
+            for linha in linhas
+        ]
+        db.execute(_upsert_contadores(ContadorAluno, ["aluno_id"]), deltas)
+        db.execute(
+            _upsert_contadores(ContadorAlunoDisciplina, ["aluno_id", "disciplina_id"]),
+            [{**delta, "disciplina_id": disciplina_id} for delta in deltas]
+        )
+        db.execute(_upsert_contadores(ContadorSessao, ["sessao_id"]), {
+            "sessao_id": sessao_id,
+            **{campo: sum(delta[campo] for delta in deltas) for campo in ("presencas", "faltas", "faltas_justificadas")}
+        })
+        
+        if anteriores is not None:
+            evento = _evento_frequencia(db, sessao_id, turma_id, disciplina_id, deltas, anteriores)
+            if evento["alunos"]:
+                registrar_evento(db, evento)
+        
+        indice = indice_matriculas.para(db)
+        turma_ids = {indice.turma(db, aluno_id) for aluno_id in aluno_ids}
+        registrar_alteracao(
+            db, GERAL,
+            *(("aluno", aluno_id) for aluno_id in aluno_ids),
+            *(("turma", turma_id) for turma_id in turma_ids)
+        )
+    
+    @staticmethod
+    def marcar_frequencia_lote(db: Session, sessao_id: int, frequencias: List[FrequenciaLoteItem]):
+        resultado = FrequenciaService._registrar_lote(db, sessao_id, frequencias)
+        db.commit()
+        return resultado
+    
+    @staticmethod
+    def _registrar_lote(db: Session, sessao_id: int, frequencias: List[FrequenciaLoteItem]):
+        sessao = db.query(Sessao.id, Sessao.turma_id, Sessao.disciplina_id).filter(Sessao.id == sessao_id).first()
+        if not sessao:
+            raise ValueError("Sessão não encontrada")
+        
+        # Matrículas validadas pelo índice em memória; só os alunos ausentes dele
+        # são procurados no banco
+        indice = indice_matriculas.para(db)
+        matriculados = indice.confirmar_matriculas(db, sessao.disciplina_id, [f.aluno_id for f in frequencias])
+        
+        resultados = []
+        linhas = {}
         for freq_data in frequencias:
-            # Verificar se já existe frequência
-            freq_existente = db.query(Frequencia).filter(
-                Frequencia.aluno_id == freq_data['aluno_id'],
-                Frequencia.sessao_id == sessao_id
-            ).first()
+            aluno_id = freq_data.aluno_id
+            if aluno_id not in matriculados:
+                resultados.append({"aluno_id": aluno_id, "status": "erro", "erro": "Aluno não está matriculado nesta disciplina"})
+                continue
             
-            if freq_existente:
-                freq_existente.presente = freq_data.get('presente', True)
-                freq_existente.justificado = freq_data.get('justificado', False)
-                freq_existente.observacao = freq_data.get('observacao')
-                freq_existente.data_registro = datetime.now()
-            else:
-                db_freq = Frequencia(
-                    aluno_id=freq_data['aluno_id'],
-                    sessao_id=sessao_id,
-                    presente=freq_data.get('presente', True),
-                    justificado=freq_data.get('justificado', False),
-                    observacao=freq_data.get('observacao')
-                )
-                db.add(db_freq)
+            # Registro repetido no mesmo lote: vale o último
+            if aluno_id in linhas:
+                anterior = linhas[aluno_id][0]
+                resultados[anterior] = {"aluno_id": aluno_id, "status": "ignorado", "erro": "Registro repetido no lote"}
+            linhas[aluno_id] = (len(resultados), {
+                "aluno_id": aluno_id,
+                "presente": freq_data.presente,
+                "justificado": freq_data.justificado,
+                "observacao": freq_data.observacao
+            })
+            resultados.append({"aluno_id": aluno_id, "status": "registrado"})
+        
+        if linhas:
+            FrequenciaService._upsert_frequencias(
+                db, sessao_id, sessao.turma_id, sessao.disciplina_id, [linha for _, linha in linhas.values()]
+            )
+        
+        # Alunos da turma matriculados na disciplina que ficaram fora da chamada
+        nao_informados = sorted(indice.matriculados(sessao.disciplina_id, sessao.turma_id) - linhas.keys())
+        
+        return {
+            "message": f"{len(linhas)} frequências registradas",
+            "registradas": len(linhas),
+            "resultados": resultados,
+            "nao_informados": nao_informados
+        }
+    
+    @staticmethod
+    def sincronizar_frequencias(db: Session, registros: List[FrequenciaSync]):
+        resultado = FrequenciaService._registrar_sincronizacao(db, registros)
         db.commit()
-        return {"message": f"{len(frequencias)} frequências registradas"}
+        return resultado
     
     @staticmethod
-    def relatorio_aluno_disciplina(db: Session, aluno_id: int, disciplina_id: int):
-        # Buscar frequências do aluno na disciplina
-        frequencias = db.query(Frequencia).join(Sessao).filter(
-            Frequencia.aluno_id == aluno_id,
-            Sessao.disciplina_id == disciplina_id
-        ).all()
+    def _registrar_sincronizacao(db: Session, registros: List[FrequenciaSync]):
+        # Marcações enviadas por um cliente offline, cada uma com um id gerado por
+        # ele. Ids já recebidos voltam como "repetido" sem tocar em frequências nem
+        # contadores: um reenvio depois de uma queda de conexão não sobrescreve uma
+        # remarcação feita depois em outro aparelho. Os ids são reservados antes de
+        # tudo em envios_sync (INSERT ... ON CONFLICT DO NOTHING RETURNING): o
+        # INSERT toma a trava de escrita, então dois envios simultâneos do mesmo id
+        # não passam os dois, e só os reservados são gravados, por sessão, como um
+        # lote. Reservas de marcações com erro são desfeitas para o envio poder ser
+        # refeito (ex.: depois da matrícula).
+        reservados = set()
+        primeiros = {}
+        for registro in registros:
+            primeiros.setdefault(registro.id_cliente, registro)
+        if primeiros:
+            reservados = set(db.execute(
+                sqlite_insert(EnvioSync).on_conflict_do_nothing().returning(EnvioSync.id_cliente),
+                [{"id_cliente": registro.id_cliente, "aluno_id": registro.aluno_id, "sessao_id": registro.sessao_id}
+                 for registro in primeiros.values()]
+            ).scalars())
+        resultados = [None] * len(registros)
+        por_sessao = {}
+        for posicao, registro in enumerate(registros):
+            # O repetido no mesmo envio vale a primeira marcação
+            if registro.id_cliente not in reservados or primeiros[registro.id_cliente] is not registro:
+                resultados[posicao] = {"id_cliente": registro.id_cliente, "status": "repetido"}
+                continue
+            por_sessao.setdefault(registro.sessao_id, []).append(posicao)
         
-        total = len(frequencias)
-        presencas = sum(1 for f in frequencias if f.presente)
-        faltas = total - presencas
-        justificadas = sum(1 for f in frequencias if not f.presente and f.justificado)
+        com_erro = []
+        for sessao_id, posicoes in por_sessao.items():
+            try:
+                # FrequenciaSync tem os campos de FrequenciaLoteItem
+                lote = FrequenciaService._registrar_lote(db, sessao_id, [registros[posicao] for posicao in posicoes])
+            except ValueError as e:
+                for posicao in posicoes:
+                    resultados[posicao] = {"id_cliente": registros[posicao].id_cliente, "status": "erro", "erro": str(e)}
+                com_erro.extend(registros[posicao].id_cliente for posicao in posicoes)
+                continue
+            for posicao, resultado in zip(posicoes, lote["resultados"]):
+                registro = registros[posicao]
+                resultados[posicao] = {"id_cliente": registro.id_cliente, "status": resultado["status"],
+                                       "erro": resultado.get("erro")}
+                if resultado["status"] == "erro":
+                    com_erro.append(registro.id_cliente)
+        if com_erro:
+            db.execute(delete(EnvioSync).where(EnvioSync.id_cliente.in_(com_erro)))
+        
+        return {
+            "registradas": sum(resultado["status"] == "registrado" for resultado in resultados),
+            "repetidas": sum(resultado["status"] == "repetido" for resultado in resultados),
+            "resultados": resultados
+        }
+    
+    @staticmethod
+    def sincronizar(db: Session, desde: int = 0, turma_id: int = None, limit: int = None):
+        # Registros criados ou alterados depois do cursor `desde` (0: desde o início)
+        if desde < 0:
+            raise ValueError("since deve ser um cursor devolvido por /sync")
+        limite = min(limit or sincronizacao.LIMITE_PADRAO, sincronizacao.LIMITE_MAXIMO)
+        return sincronizacao.mudancas_desde(db, desde, turma_id=turma_id, limite=limite)
+    
+    @staticmethod
+    @cache_relatorios.cacheado("relatorio_aluno_disciplina", lambda aluno_id, disciplina_id, **periodo: [("aluno", aluno_id)])
+    def relatorio_aluno_disciplina(db: Session, aluno_id: int, disciplina_id: int, inicio: date = None, fim: date = None):
+        periodo = _periodo(inicio, fim)
+        motor = _motor(db, inicio, fim)
+        if motor is not None:
+            total, presencas, justificadas = motor.contar_aluno(aluno_id, disciplina_id, inicio, fim)
+        else:
+            fonte = _contadores(ContadorAlunoDisciplina, periodo,
+                                Frequencia.aluno_id == aluno_id, Sessao.disciplina_id == disciplina_id,
+                                db=db, arquivado=_periodo_arquivado(db, inicio, fim))
+            contador = db.query(*_colunas_contador(fonte)).filter(
+                fonte.aluno_id == aluno_id,
+                fonte.disciplina_id == disciplina_id
+            ).first()
+            total, presencas, justificadas = contador or (0, 0, 0)
         
         return {
             "aluno_id": aluno_id,
             "disciplina_id": disciplina_id,
-            "total_sessoes": total,
-            "presencas": presencas,
-            "faltas": faltas,
-            "faltas_justificadas": justificadas,
-            "percentual_presenca": round((presencas / total * 100) if total > 0 else 0, 2)
+            **_montar_relatorio(total, presencas, justificadas)
         }
     
     @staticmethod
-    def relatorio_aluno(db: Session, aluno_id: int):
-        frequencias = db.query(Frequencia).filter(Frequencia.aluno_id == aluno_id).all()
-        total = len(frequencias)
-        presencas = sum(1 for f in frequencias if f.presente)
-        faltas = total - presencas
-        justificadas = sum(1 for f in frequencias if not f.presente and f.justificado)
+    @cache_relatorios.cacheado("relatorio_aluno", lambda aluno_id, **periodo: [("aluno", aluno_id)])
+    def relatorio_aluno(db: Session, aluno_id: int, inicio: date = None, fim: date = None):
+        periodo = _periodo(inicio, fim)
+        motor = _motor(db, inicio, fim)
+        if motor is not None:
+            total, presencas, justificadas = motor.contar_aluno(aluno_id, inicio=inicio, fim=fim)
+        else:
+            fonte = _contadores(ContadorAluno, periodo, Frequencia.aluno_id == aluno_id,
+                                db=db, arquivado=_periodo_arquivado(db, inicio, fim))
+            contador = db.query(*_colunas_contador(fonte)).filter(
+                fonte.aluno_id == aluno_id
+            ).first()
+            total, presencas, justificadas = contador or (0, 0, 0)
         
         return {
             "aluno_id": aluno_id,
-            "total_sessoes": total,
-            "presencas": presencas,
-            "faltas": faltas,
-            "faltas_justificadas": justificadas,
-            "percentual_presenca": round((presencas / total * 100) if total > 0 else 0, 2)
+            **_montar_relatorio(total, presencas, justificadas)
         }
     
     @staticmethod
-    def relatorio_turma(db: Session, turma_id: int):
-        try:
-            alunos = db.query(Aluno).filter(Aluno.turma_id == turma_id).all()
-            relatorio = []
-            
-            for aluno in alunos:
-                freq_aluno = FrequenciaService.relatorio_aluno(db, aluno.id)
-                freq_aluno['nome'] = aluno.nome
-                freq_aluno['matricula'] = aluno.matricula
-                relatorio.append(freq_aluno)
-            
-            return relatorio
-        except Exception as e:
-            print(f"Erro ao gerar relatório: {e}")
-            return []
+    def _relatorio_alunos(db: Session, *filtros, contador=ContadorAluno, inicio: date = None, fim: date = None):
+        # Leitura direta dos contadores: uma linha por aluno, sem varrer frequencias.
+        # Com o motor analítico os totais vêm dele (inicio/fim) e `contador` é ignorado.
+        motor = _motor(db, inicio, fim)
+        if motor is not None:
+            alunos = db.query(Aluno.id, Aluno.turma_id, Aluno.nome, Aluno.matricula).filter(*filtros).order_by(Aluno.id).all()
+            totais = motor.contar_alunos((aluno.id for aluno in alunos), inicio, fim)
+            linhas = [(*aluno, *totais[aluno.id]) for aluno in alunos]
+        else:
+            linhas = db.query(Aluno.id, Aluno.turma_id, Aluno.nome, Aluno.matricula, *_colunas_contador(contador)).outerjoin(
+                contador, contador.aluno_id == Aluno.id
+            ).filter(*filtros).order_by(Aluno.id).all()
+        
+        return [
+            (turma_id, {
+                "aluno_id": aluno_id,
+                **_montar_relatorio(total, presencas, justificadas),
+                "nome": nome,
+                "matricula": matricula
+            })
+            for aluno_id, turma_id, nome, matricula, total, presencas, justificadas in linhas
+        ]
+    
+    @staticmethod
+    @cache_relatorios.cacheado("relatorio_turma", lambda turma_id, **periodo: [("turma", turma_id)])
+    def relatorio_turma(db: Session, turma_id: int, inicio: date = None, fim: date = None):
+        periodo = _periodo(inicio, fim)
+        contador = _contadores(ContadorAluno, periodo, Frequencia.aluno_id.in_(
+            select(Aluno.id).where(Aluno.turma_id == turma_id)
+        ), db=db, arquivado=_periodo_arquivado(db, inicio, fim))
+        linhas = FrequenciaService._relatorio_alunos(db, Aluno.turma_id == turma_id, contador=contador, inicio=inicio, fim=fim)
+        return [relatorio for _, relatorio in linhas]
+    
+    @staticmethod
+    @cache_relatorios.cacheado("dashboard", lambda **periodo: [GERAL])
+    def dashboard(db: Session, inicio: date = None, fim: date = None):
+        contador = _contadores(ContadorAluno, _periodo(inicio, fim), db=db, arquivado=_periodo_arquivado(db, inicio, fim))
+        turmas = db.query(Turma.id, Turma.nome, Turma.ano, Turma.periodo).order_by(Turma.id).all()
+        total_disciplinas = db.query(func.count(Disciplina.id)).scalar()
+        
+        resumo_turmas = {
+            turma_id: {
+                "id": turma_id,
+                "nome": nome,
+                "ano": ano,
+                "periodo": periodo,
+                "total_alunos": 0,
+                "presencas": 0,
+                "faltas": 0,
+                "faltas_justificadas": 0,
+                "alunos": []
+            }
+            for turma_id, nome, ano, periodo in turmas
+        }
+        
+        totais = {
+            "turmas": len(turmas),
+            "disciplinas": total_disciplinas,
+            "alunos": 0,
+            "presencas": 0,
+            "faltas": 0,
+            "faltas_justificadas": 0
+        }
+        
+        # Alunos sem turma cadastrada não aparecem no painel
+        for turma_id, relatorio in FrequenciaService._relatorio_alunos(db, Aluno.turma_id.isnot(None), contador=contador,
+                                                                     inicio=inicio, fim=fim):
+            resumo = resumo_turmas.get(turma_id)
+            if resumo is None:
+                continue
+            resumo["alunos"].append(relatorio)
+            resumo["total_alunos"] += 1
+            totais["alunos"] += 1
+            for campo in ("presencas", "faltas", "faltas_justificadas"):
+                resumo[campo] += relatorio[campo]
+                totais[campo] += relatorio[campo]
+        
+        return {"totais": totais, "turmas": list(resumo_turmas.values())}
+    
+    @staticmethod
+    @cache_relatorios.cacheado("matriz_frequencia", lambda turma_id=None, disciplina_id=None, **periodo: [GERAL])
+    def matriz_frequencia(db: Session, turma_id: int = None, disciplina_id: int = None, inicio: date = None, fim: date = None):
+        # Uma célula por matrícula, mesmo sem registros de frequência
+        filtros_periodo = []
+        if turma_id is not None:
+            filtros_periodo.append(Frequencia.aluno_id.in_(select(Aluno.id).where(Aluno.turma_id == turma_id)))
+        if disciplina_id is not None:
+            filtros_periodo.append(Sessao.disciplina_id == disciplina_id)
+        contador = _contadores(ContadorAlunoDisciplina, _periodo(inicio, fim), *filtros_periodo,
+                               db=db, arquivado=_periodo_arquivado(db, inicio, fim))
+        consulta = db.query(
+            aluno_disciplina.c.aluno_id,
+            aluno_disciplina.c.disciplina_id,
+            Aluno.nome,
+            Aluno.matricula,
+            *_colunas_contador(contador)
+        ).join(
+            Aluno, Aluno.id == aluno_disciplina.c.aluno_id
+        ).outerjoin(contador, and_(
+            contador.aluno_id == aluno_disciplina.c.aluno_id,
+            contador.disciplina_id == aluno_disciplina.c.disciplina_id
+        ))
+        if disciplina_id is not None:
+            consulta = consulta.filter(aluno_disciplina.c.disciplina_id == disciplina_id)
+        if turma_id is not None:
+            consulta = consulta.filter(Aluno.turma_id == turma_id)
+        linhas = consulta.order_by(aluno_disciplina.c.disciplina_id, aluno_disciplina.c.aluno_id).all()
+        
+        disciplinas = db.query(Disciplina.id, Disciplina.nome, Disciplina.codigo, Disciplina.professor)
+        if disciplina_id is not None:
+            disciplinas = disciplinas.filter(Disciplina.id == disciplina_id)
+        disciplinas = disciplinas.order_by(Disciplina.id).all()
+        
+        # Layout colunar: listas paralelas em vez de um objeto por célula
+        alunos = {"id": [], "nome": [], "matricula": []}
+        celulas = {
+            "aluno_id": [],
+            "disciplina_id": [],
+            "total_sessoes": [],
+            "presencas": [],
+            "faltas": [],
+            "faltas_justificadas": []
+        }
+        vistos = set()
+        for aluno_id, disc_id, nome, matricula, total, presencas, justificadas in linhas:
+            if aluno_id not in vistos:
+                vistos.add(aluno_id)
+                alunos["id"].append(aluno_id)
+                alunos["nome"].append(nome)
+                alunos["matricula"].append(matricula)
+            celulas["aluno_id"].append(aluno_id)
+            celulas["disciplina_id"].append(disc_id)
+            celulas["total_sessoes"].append(total)
+            celulas["presencas"].append(presencas)
+            celulas["faltas"].append(total - presencas)
+            celulas["faltas_justificadas"].append(justificadas)
+        
+        return {
+            "turma_id": turma_id,
+            "disciplina_id": disciplina_id,
+            "alunos": alunos,
+            "disciplinas": {
+                "id": [d.id for d in disciplinas],
+                "nome": [d.nome for d in disciplinas],
+                "codigo": [d.codigo for d in disciplinas],
+                "professor": [d.professor for d in disciplinas]
+            },
+            "celulas": celulas
+        }
+    
+    @staticmethod
+    @cache_relatorios.cacheado("serie_frequencia", lambda *args, **kwargs: [GERAL])
+    def serie_frequencia(db: Session, granularidade: str = "dia", turma_id: int = None, disciplina_id: int = None,
+                         inicio: date = None, fim: date = None, por: str = None):
+        # Taxa de presença por dia, semana ou mês, agrupando pelo dia da sessão no SQL.
+        # Lê os totais por sessão (contadores_sessao) em vez dos registros, percorrendo
+        # sessoes na ordem do índice ix_sessoes_dia; semana e mês reagrupam os dias,
+        # então a expressão de data só é calculada uma vez por dia. Anos arquivados
+        # entram pelos arquivos anexados (os resumos anuais não têm o dia).
+        if granularidade not in GRANULARIDADES:
+            raise ValueError(f"granularidade deve ser uma de: {', '.join(GRANULARIDADES)}")
+        grupos = {None: None, "turma": Sessao.turma_id, "disciplina": Sessao.disciplina_id}
+        if por not in grupos:
+            raise ValueError("por deve ser 'turma' ou 'disciplina'")
+        filtros = _periodo(inicio, fim)
+        if turma_id is not None:
+            filtros.append(Sessao.turma_id == turma_id)
+        if disciplina_id is not None:
+            filtros.append(Sessao.disciplina_id == disciplina_id)
+        
+        motor = _motor(db, inicio, fim)
+        if motor is not None:
+            linhas = motor.serie(granularidade, turma_id, disciplina_id, inicio, fim, por)
+        else:
+            dia = _dia_sessao().label("dia")
+            chaves_dia = [dia] if por is None else [dia, grupos[por].label("grupo")]
+            campos = ("presencas", "faltas", "faltas_justificadas")
+            diario = select(
+                *chaves_dia,
+                func.count(Sessao.id).label("sessoes"),
+                *(func.coalesce(func.sum(getattr(ContadorSessao, campo)), 0).label(campo) for campo in campos)
+            ).select_from(Sessao).outerjoin(
+                ContadorSessao, ContadorSessao.sessao_id == Sessao.id
+            ).where(*filtros, dia.isnot(None)).group_by(*chaves_dia)
+            # Anos arquivados no período (sem período, todos): a mesma consulta sobre
+            # cada arquivo anexado, somada à do banco principal
+            arquivado = arquivamento.periodo_arquivado(db, inicio, fim)
+            if arquivado:
+                arquivamento.anexar(db, arquivado.anos)
+                diario = union_all(diario, *(arquivamento.adaptar(diario, ano) for ano in arquivado.anos))
+            if granularidade == "dia" and not arquivado:
+                linhas = db.execute(diario.order_by(*chaves_dia)).all()
+            else:
+                diario = diario.subquery()
+                chaves = [GRANULARIDADES[granularidade](diario.c.dia)]
+                if por is not None:
+                    chaves.append(diario.c.grupo)
+                linhas = db.execute(select(
+                    *chaves, func.sum(diario.c.sessoes), *(func.sum(diario.c[campo]) for campo in campos)
+                ).group_by(*chaves).order_by(*chaves)).all()
+        
+        # Layout colunar, como na matriz
+        pontos = {
+            "periodo": [],
+            "grupo": [],
+            "sessoes": [],
+            "presencas": [],
+            "faltas": [],
+            "faltas_justificadas": [],
+            "percentual_presenca": []
+        }
+        for linha in linhas:
+            periodo, *grupo, sessoes, presencas, faltas, justificadas = linha
+            pontos["periodo"].append(periodo)
+            pontos["grupo"].append(grupo[0] if grupo else None)
+            pontos["sessoes"].append(sessoes)
+            pontos["presencas"].append(presencas)
+            pontos["faltas"].append(faltas)
+            pontos["faltas_justificadas"].append(justificadas)
+            pontos["percentual_presenca"].append(_montar_relatorio(presencas + faltas, presencas, justificadas)["percentual_presenca"])
+        
+        return {
+            "granularidade": granularidade,
+            "por": por,
+            "turma_id": turma_id,
+            "disciplina_id": disciplina_id,
+            "inicio": inicio,
+            "fim": fim,
+            "pontos": pontos
+        }
+    
+    @staticmethod
+    @cache_relatorios.cacheado("alunos_em_risco", lambda *args, **kwargs: [GERAL])
+    def alunos_em_risco(db: Session, limite: float = 75.0, turma_id: int = None, disciplina_id: int = None,
+                        por_disciplina: bool = False, min_sessoes: int = 1, k: int = LIMITE_PADRAO,
+                        inicio: date = None, fim: date = None):
+        # Os k alunos (ou pares aluno/disciplina) com menor frequência abaixo de
+        # `limite`, em uma só consulta: o filtro pelo limite e pelo mínimo de sessões
+        # e ORDER BY ... LIMIT deixam o SQLite manter só os k piores. Com período a
+        # consulta agrupa os registros e filtra no HAVING; sem período os contadores
+        # já têm uma linha por grupo e o mesmo filtro vai no WHERE, sem GROUP BY.
+        # Período que alcança anos arquivados lê os contadores do período
+        # (_contadores, com resumos e arquivos anexados) pelo caminho do WHERE.
+        if not 0 < limite <= 100:
+            raise ValueError("limite deve estar entre 0 e 100")
+        if k < 1 or min_sessoes < 1:
+            raise ValueError("k e min_sessoes devem ser positivos")
+        periodo = _periodo(inicio, fim)
+        arquivado = _periodo_arquivado(db, inicio, fim)
+        agrupar = bool(periodo) and not arquivado
+        por_disciplina = por_disciplina or disciplina_id is not None
+        
+        if agrupar:
+            coluna_aluno, coluna_disciplina = Frequencia.aluno_id, Sessao.disciplina_id
+            presencas, faltas, justificadas = _somas_categoria()
+            origem = select().select_from(Frequencia).join(Sessao, Sessao.id == Frequencia.sessao_id).where(*periodo)
+        else:
+            filtros_periodo = []
+            if turma_id is not None:
+                filtros_periodo.append(Frequencia.aluno_id.in_(select(Aluno.id).where(Aluno.turma_id == turma_id)))
+            if disciplina_id is not None:
+                filtros_periodo.append(Sessao.disciplina_id == disciplina_id)
+            contador = _contadores(ContadorAlunoDisciplina if por_disciplina else ContadorAluno, periodo,
+                                   *filtros_periodo, db=db, arquivado=arquivado)
+            coluna_aluno, coluna_disciplina = contador.aluno_id, getattr(contador, "disciplina_id", None)
+            presencas, faltas, justificadas = contador.presencas, contador.faltas, contador.faltas_justificadas
+            origem = select().select_from(contador)
+        chaves = [coluna_aluno.label("aluno_id")]
+        if por_disciplina:
+            chaves.append(coluna_disciplina.label("disciplina_id"))
+        if turma_id is not None:
+            origem = origem.where(coluna_aluno.in_(select(Aluno.id).where(Aluno.turma_id == turma_id)))
+        if disciplina_id is not None:
+            origem = origem.where(coluna_disciplina == disciplina_id)
+        
+        total = presencas + faltas
+        percentual = presencas * 100.0 / total
+        condicoes = (total >= min_sessoes, presencas * 100.0 < total * limite)
+        piores = origem.add_columns(
+            *chaves,
+            total.label("total_sessoes"),
+            presencas.label("presencas"),
+            justificadas.label("faltas_justificadas"),
+            percentual.label("percentual")
+        )
+        piores = piores.group_by(*chaves).having(*condicoes) if agrupar else piores.where(*condicoes)
+        piores = piores.order_by(percentual, *chaves).limit(k).subquery()
+        
+        if por_disciplina:
+            carga = Disciplina.carga_horaria
+            consulta = select(piores, Aluno.nome, Aluno.matricula, Aluno.turma_id, carga).join(
+                Aluno, Aluno.id == piores.c.aluno_id
+            ).outerjoin(Disciplina, Disciplina.id == piores.c.disciplina_id)
+        else:
+            # Carga horária total das disciplinas em que o aluno está matriculado
+            carga = select(func.sum(Disciplina.carga_horaria)).select_from(aluno_disciplina).join(
+                Disciplina, Disciplina.id == aluno_disciplina.c.disciplina_id
+            ).where(aluno_disciplina.c.aluno_id == piores.c.aluno_id).scalar_subquery()
+            consulta = select(piores, Aluno.nome, Aluno.matricula, Aluno.turma_id, carga.label("carga_horaria")).join(
+                Aluno, Aluno.id == piores.c.aluno_id
+            )
+        linhas = db.execute(consulta.order_by(piores.c.percentual, *(piores.c[c.name] for c in chaves))).mappings().all()
+        
+        alunos = []
+        for linha in linhas:
+            relatorio = _montar_relatorio(linha["total_sessoes"], linha["presencas"], linha["faltas_justificadas"])
+            # Cada sessão conta como uma aula da carga horária; faltas justificadas
+            # também entram no limite
+            carga_horaria = linha["carga_horaria"]
+            permitidas = math.floor(carga_horaria * (100 - config.FREQUENCIA_MINIMA) / 100) if carga_horaria else None
+            alunos.append({
+                "aluno_id": linha["aluno_id"],
+                "disciplina_id": linha["disciplina_id"] if por_disciplina else None,
+                "nome": linha["nome"],
+                "matricula": linha["matricula"],
+                "turma_id": linha["turma_id"],
+                **relatorio,
+                "carga_horaria": carga_horaria,
+                "faltas_permitidas": permitidas,
+                "faltas_restantes": max(permitidas - relatorio["faltas"], 0) if permitidas is not None else None,
+                "limite_excedido": permitidas is not None and relatorio["faltas"] > permitidas
+            })
+        return alunos
+    
+    @staticmethod
+    def validar_periodo(inicio: date = None, fim: date = None):
+        # Para quem precisa recusar o intervalo antes de começar a responder (streaming)
+        _periodo(inicio, fim)
+    
+    @staticmethod
+    def linhas_exportacao(db: Session, turma_id: int = None, disciplina_id: int = None, lote: int = 1000,
+                          inicio: date = None, fim: date = None):
+        # Gerador de linhas do CSV (nome, matricula, total, presenças, faltas,
+        # justificadas, percentual). O cursor é lido de `lote` em `lote` linhas,
+        # então nem a exportação da instituição inteira fica toda em memória.
+        periodo = _periodo(inicio, fim)
+        arquivado = _periodo_arquivado(db, inicio, fim)
+        filtros_periodo = []
+        if turma_id is not None:
+            filtros_periodo.append(Frequencia.aluno_id.in_(select(Aluno.id).where(Aluno.turma_id == turma_id)))
+        if disciplina_id is not None:
+            contador = _contadores(ContadorAlunoDisciplina, periodo, Sessao.disciplina_id == disciplina_id, *filtros_periodo,
+                                   db=db, arquivado=arquivado)
+            consulta = db.query(
+                Aluno.nome, Aluno.matricula, *_colunas_contador(contador)
+            ).select_from(aluno_disciplina).join(
+                Aluno, Aluno.id == aluno_disciplina.c.aluno_id
+            ).outerjoin(contador, and_(
+                contador.aluno_id == aluno_disciplina.c.aluno_id,
+                contador.disciplina_id == aluno_disciplina.c.disciplina_id
+            )).filter(aluno_disciplina.c.disciplina_id == disciplina_id)
+        else:
+            contador = _contadores(ContadorAluno, periodo, *filtros_periodo, db=db, arquivado=arquivado)
+            consulta = db.query(
+                Aluno.nome, Aluno.matricula, *_colunas_contador(contador)
+            ).outerjoin(contador, contador.aluno_id == Aluno.id)
+        if turma_id is not None:
+            consulta = consulta.filter(Aluno.turma_id == turma_id)
+        
+        for nome, matricula, total, presencas, justificadas in consulta.order_by(Aluno.turma_id, Aluno.id).yield_per(lote):
+            relatorio = _montar_relatorio(total, presencas, justificadas)
+            yield (
+                nome,
+                matricula,
+                total,
+                presencas,
+                relatorio["faltas"],
+                justificadas,
+                relatorio["percentual_presenca"]
+            )
     
+    @staticmethod
+    def lotes_colunares(db: Session, tabela: str, inicio: date = None, fim: date = None, lote: int = LOTE_COLUNAR):
+        # Linhas cruas das tabelas da exportação colunar (app/services/colunar.py),
+        # em pares (mês, linhas) com até `lote` linhas de um mesmo mês; mês None na
+        # tabela sem partição. Datas e booleanos vêm como estão no SQLite (texto e
+        # 0/1), sem conversão linha a linha, e o cursor é lido em streaming na
+        # ordem do dia da sessão (índice ix_sessoes_dia). Anos arquivados do período
+        # (sem período, todos) são lidos do arquivo anexado, antes do banco principal.
+        periodo = _periodo(inicio, fim)
+        if tabela == "alunos_disciplinas":
+            contador = _contadores(ContadorAlunoDisciplina, periodo, db=db, arquivado=_periodo_arquivado(db, inicio, fim))
+            consulta = select(
+                Aluno.id, Aluno.matricula, Aluno.nome, Aluno.turma_id, aluno_disciplina.c.disciplina_id,
+                *_colunas_contador(contador)
+            ).select_from(aluno_disciplina).join(
+                Aluno, Aluno.id == aluno_disciplina.c.aluno_id
+            ).outerjoin(contador, and_(
+                contador.aluno_id == aluno_disciplina.c.aluno_id,
+                contador.disciplina_id == aluno_disciplina.c.disciplina_id
+            )).order_by(Aluno.turma_id, Aluno.id, aluno_disciplina.c.disciplina_id)
+            for linhas in db.connection().execute(consulta.execution_options(yield_per=lote)).partitions():
+                yield None, linhas
+            return
+        
+        mes = func.strftime("%Y-%m", Sessao.data)
+        if tabela == "frequencias":
+            consulta = select(
+                mes, Frequencia.id, Frequencia.sessao_id, type_coerce(Sessao.data, String), Frequencia.aluno_id,
+                Aluno.matricula, Aluno.nome, Sessao.turma_id, Sessao.disciplina_id,
+                type_coerce(Frequencia.presente, Integer), type_coerce(Frequencia.justificado, Integer),
+                Frequencia.observacao, type_coerce(Frequencia.data_registro, String)
+            ).select_from(Sessao).join(Frequencia, Frequencia.sessao_id == Sessao.id).join(Aluno, Aluno.id == Frequencia.aluno_id)
+        elif tabela == "sessoes":
+            consulta = select(
+                mes, Sessao.id, type_coerce(Sessao.data, String), Sessao.turma_id, Sessao.disciplina_id, Sessao.descricao,
+                func.coalesce(ContadorSessao.presencas, 0), func.coalesce(ContadorSessao.faltas, 0),
+                func.coalesce(ContadorSessao.faltas_justificadas, 0)
+            ).select_from(Sessao).outerjoin(ContadorSessao, ContadorSessao.sessao_id == Sessao.id)
+        else:
+            raise ValueError(f"Tabela desconhecida: {tabela}")
+        consulta = consulta.where(*periodo).order_by(_dia_sessao())
+        
+        fontes = []
+        arquivado = arquivamento.periodo_arquivado(db, inicio, fim)
+        for ano in arquivado.anos if arquivado else ():
+            fontes.append((ano, arquivamento.adaptar(consulta, ano)))
+        fontes.append((None, consulta))
+        for ano, fonte in fontes:
+            if ano is not None:
+                arquivamento.anexar(db, [ano])
+            # Pela conexão (Core): sem a montagem de linhas do ORM, que custava mais que o SQLite
+            for linhas in db.connection().execute(fonte.execution_options(yield_per=lote)).partitions():
+                # O lote do cursor pode atravessar a virada do mês
+                for mes_lote, grupo in groupby(linhas, key=itemgetter(0)):
+                    yield mes_lote, list(grupo)
+    
+    @staticmethod
+    def reconstruir_contadores(db: Session):
+        # Recalcula os contadores do zero a partir de frequencias
+        db.execute(delete(ContadorSessao))
+        db.execute(delete(ContadorAlunoDisciplina))
+        db.execute(delete(ContadorAluno))
+        db.execute(ContadorAluno.__table__.insert().from_select(
+            ["aluno_id", "presencas", "faltas", "faltas_justificadas"],
+            select(Frequencia.aluno_id, *_somas_categoria()).where(
+                Frequencia.aluno_id.isnot(None)
+            ).group_by(Frequencia.aluno_id)
+        ))
+        db.execute(ContadorAlunoDisciplina.__table__.insert().from_select(
+            ["aluno_id", "disciplina_id", "presencas", "faltas", "faltas_justificadas"],
+            select(Frequencia.aluno_id, Sessao.disciplina_id, *_somas_categoria()).join(Sessao).where(
+                Frequencia.aluno_id.isnot(None),
+                Sessao.disciplina_id.isnot(None)
+            ).group_by(Frequencia.aluno_id, Sessao.disciplina_id)
+        ))
+        db.execute(_preencher_contadores_sessao())
+        # Os anos arquivados não estão mais em frequencias: entram pelos resumos
+        if inspect(db.connection()).has_table(ResumoAnual.__tablename__):
+            somas = [func.sum(ResumoAnual.presencas), func.sum(ResumoAnual.faltas), func.sum(ResumoAnual.faltas_justificadas)]
+            db.execute(_upsert_contadores(ContadorAluno, ["aluno_id"], select(
+                ResumoAnual.aluno_id, *somas
+            ).group_by(ResumoAnual.aluno_id)))
+            db.execute(_upsert_contadores(ContadorAlunoDisciplina, ["aluno_id", "disciplina_id"], select(
+                ResumoAnual.aluno_id, ResumoAnual.disciplina_id, *somas
+            ).where(ResumoAnual.disciplina_id != 0).group_by(ResumoAnual.aluno_id, ResumoAnual.disciplina_id)))
+        registrar_alteracao(db, TUDO)
+        db.commit()
+        return {
+            "alunos": db.query(func.count()).select_from(ContadorAluno).scalar(),
+            "alunos_disciplinas": db.query(func.count()).select_from(ContadorAlunoDisciplina).scalar(),
+            "sessoes": db.query(func.count()).select_from(ContadorSessao).scalar()
+        }
+    
+    @staticmethod
+    def arquivar_ano(db: Session, ano: int):
+        # Move sessoes, frequencias e contadores_sessao de um ano encerrado para o
+        # arquivo do ano (ver app/services/arquivamento.py) e guarda os resumos por
+        # aluno/disciplina. Os contadores não mudam: continuam somando a história toda.
+        # Primeiro a cópia é gravada no arquivo; só depois, numa segunda transação,
+        # o banco principal perde as linhas. A cópia é INSERT OR REPLACE pelos mesmos
+        # ids, então repetir o comando após uma falha no meio é seguro.
+        if ano >= date.today().year:
+            raise ValueError("Só anos encerrados podem ser arquivados")
+        no_ano = _dia_sessao().between(f"{ano:04d}-01-01", f"{ano:04d}-12-31")
+        do_ano = select(Sessao.id).where(no_ano)
+        # O SQLite reaproveita o maior id depois de apagado: o ano que tem o último
+        # registro não pode sair, ou um id novo colidiria com um id do arquivo
+        ultima_sessao = db.query(func.max(Sessao.id)).scalar()
+        ultimo_registro = db.query(func.max(Frequencia.id)).scalar()
+        if db.query(Sessao.id).filter(Sessao.id == ultima_sessao, no_ano).first() or \
+                db.query(Frequencia.id).filter(Frequencia.id == ultimo_registro, Frequencia.sessao_id.in_(do_ano)).first():
+            raise ValueError(f"O ano {ano} tem a sessão ou o registro mais recente do banco; registre um ano posterior antes de arquivá-lo")
+        
+        arquivo = arquivamento.criar_arquivo(db, ano)
+        arquivamento.anexar(db, [ano])
+        copias = arquivamento.tabelas(ano)
+        origens = {
+            Sessao.__table__: no_ano,
+            Frequencia.__table__: Frequencia.sessao_id.in_(do_ano),
+            ContadorSessao.__table__: ContadorSessao.sessao_id.in_(do_ano),
+        }
+        copiados = {}
+        for tabela, filtro in origens.items():
+            colunas = list(tabela.c.keys())
+            copiados[tabela.name] = db.execute(copias[tabela].insert().prefix_with("OR REPLACE").from_select(
+                colunas, select(*tabela.c).where(filtro)
+            )).rowcount
+        db.commit()
+        
+        db.execute(_upsert_contadores(ResumoAnual, ["ano", "aluno_id", "disciplina_id"], select(
+            literal(ano), Frequencia.aluno_id, func.coalesce(Sessao.disciplina_id, 0), *_somas_categoria()
+        ).join(Sessao, Sessao.id == Frequencia.sessao_id).where(
+            no_ano, Frequencia.aluno_id.isnot(None)
+        ).group_by(Frequencia.aluno_id, Sessao.disciplina_id)))
+        for tabela in (Frequencia.__table__, ContadorSessao.__table__, Sessao.__table__):
+            db.execute(delete(tabela).where(origens[tabela]))
+        totais = {
+            "sessoes": db.execute(select(func.count()).select_from(copias[Sessao.__table__])).scalar(),
+            "frequencias": db.execute(select(func.count()).select_from(copias[Frequencia.__table__])).scalar(),
+        }
+        registro = sqlite_insert(ArquivoAnual).values(ano=ano, arquivado_em=datetime.utcnow(), **totais)
+        db.execute(registro.on_conflict_do_update(
+            index_elements=["ano"], set_={campo: registro.excluded[campo] for campo in (*totais, "arquivado_em")}
+        ))
+        registrar_alteracao(db, TUDO)
+        db.commit()
+        # O motor analítico ainda tem os registros apagados: recarrega na próxima
+        # consulta; o cache de sessões pode apontar para sessões que saíram
+        motores_analiticos.descartar()
+        indice_sessoes.descartar()
+        return {
+            "ano": ano,
+            "sessoes": copiados["sessoes"],
+            "frequencias": copiados["frequencias"],
+            "arquivo": arquivo
+        }
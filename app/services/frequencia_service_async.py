@@ -0,0 +1,36 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.services.frequencia_service import FrequenciaService
+
+def _assincrono(metodo):
+    # Executa o método síncrono sobre a conexão assíncrona (AsyncSession.run_sync):
+    # a espera pelo banco não ocupa uma thread do threadpool
+    async def executar(db: AsyncSession, *args, **kwargs):
+        return await db.run_sync(metodo, *args, **kwargs)
+    executar.__name__ = metodo.__name__
+    return staticmethod(executar)
+
+class FrequenciaServiceAsync:
+    criar_turma = _assincrono(FrequenciaService.criar_turma)
+    listar_turmas = _assincrono(FrequenciaService.listar_turmas)
+    get_turma = _assincrono(FrequenciaService.get_turma)
+    criar_disciplina = _assincrono(FrequenciaService.criar_disciplina)
+    listar_disciplinas = _assincrono(FrequenciaService.listar_disciplinas)
+    get_disciplina = _assincrono(FrequenciaService.get_disciplina)
+    criar_aluno = _assincrono(FrequenciaService.criar_aluno)
+    matricular_aluno_disciplina = _assincrono(FrequenciaService.matricular_aluno_disciplina)
+    listar_alunos = _assincrono(FrequenciaService.listar_alunos)
+    listar_alunos_turma = _assincrono(FrequenciaService.listar_alunos_turma)
+    listar_alunos_disciplina = _assincrono(FrequenciaService.listar_alunos_disciplina)
+    criar_sessao = _assincrono(FrequenciaService.criar_sessao)
+    agendar_sessoes = _assincrono(FrequenciaService.agendar_sessoes)
+    marcar_frequencia_individual = _assincrono(FrequenciaService.marcar_frequencia_individual)
+    marcar_frequencia_lote = _assincrono(FrequenciaService.marcar_frequencia_lote)
+    sincronizar_frequencias = _assincrono(FrequenciaService.sincronizar_frequencias)
+    sincronizar = _assincrono(FrequenciaService.sincronizar)
+    relatorio_aluno_disciplina = _assincrono(FrequenciaService.relatorio_aluno_disciplina)
+    relatorio_aluno = _assincrono(FrequenciaService.relatorio_aluno)
+    relatorio_turma = _assincrono(FrequenciaService.relatorio_turma)
+    dashboard = _assincrono(FrequenciaService.dashboard)
+    matriz_frequencia = _assincrono(FrequenciaService.matriz_frequencia)
+    serie_frequencia = _assincrono(FrequenciaService.serie_frequencia)
+    alunos_em_risco = _assincrono(FrequenciaService.alunos_em_risco)
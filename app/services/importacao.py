@@ -0,0 +1,61 @@
+import codecs
+import csv
+import json
+from typing import IO, Dict, Iterable, Iterator, List, Tuple, Union
+
+# Colunas aceitas no arquivo de alunos (CSV com cabeçalho ou JSONL):
+#   nome, matricula, turma, email, disciplinas, ano, periodo
+# `turma` é o nome da turma; `disciplinas` são códigos separados por ";" no
+# CSV (ou uma lista no JSONL); `ano` e `periodo` só são usados para criar
+# turmas que ainda não existem.
+
+def _ler_csv(texto: Iterable[str]) -> Iterator[Tuple[int, Union[Dict, str]]]:
+    leitor = csv.DictReader(texto)
+    for registro in leitor:
+        yield leitor.line_num, registro
+
+def _ler_jsonl(texto: Iterable[str]) -> Iterator[Tuple[int, Union[Dict, str]]]:
+    for numero, linha in enumerate(texto, start=1):
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except json.JSONDecodeError as e:
+            yield numero, f"JSON inválido: {e.msg}"
+            continue
+        if not isinstance(registro, dict):
+            yield numero, "Cada linha deve ser um objeto JSON"
+            continue
+        yield numero, registro
+
+def detectar_formato(nome_arquivo: str) -> str:
+    return "jsonl" if (nome_arquivo or "").lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+def _decodificar(arquivo: IO[bytes], invalidas: List[int]) -> Iterator[str]:
+    # Decodifica linha a linha (aceita BOM UTF-8). Uma linha que não é UTF-8
+    # válido entra em `invalidas` e segue como linha vazia, que os dois leitores
+    # pulam sem perder a numeração das seguintes.
+    for numero, linha in enumerate(arquivo, start=1):
+        if numero == 1 and linha.startswith(codecs.BOM_UTF8):
+            linha = linha[len(codecs.BOM_UTF8):]
+        try:
+            yield linha.decode("utf-8")
+        except UnicodeDecodeError:
+            invalidas.append(numero)
+            yield "\n"
+
+def ler_alunos(arquivo: IO[bytes], formato: str = "csv") -> Iterator[Tuple[int, Union[Dict, str]]]:
+    # Lê o arquivo binário em streaming, linha a linha
+    if formato == "jsonl":
+        ler = _ler_jsonl
+    elif formato == "csv":
+        ler = _ler_csv
+    else:
+        raise ValueError(f"Formato não suportado: {formato}")
+    invalidas: List[int] = []
+    for numero, registro in ler(_decodificar(arquivo, invalidas)):
+        while invalidas:
+            yield invalidas.pop(0), "Linha não está em UTF-8"
+        yield numero, registro
+    while invalidas:
+        yield invalidas.pop(0), "Linha não está em UTF-8"
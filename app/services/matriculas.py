@@ -0,0 +1,155 @@
+import os
+import threading
+from typing import Dict, Iterable, Optional, Set, Union
+from sqlalchemy import event
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.database import Aluno, Disciplina, aluno_disciplina
+
+# Índice em memória das matrículas (aluno_disciplina) e da turma de cada aluno,
+# um por banco. É carregado do banco no primeiro uso (ou na subida da aplicação)
+# e atualizado pelas escritas de cadastro depois do commit, como o cache de
+# relatórios. Com ele a validação das marcações não consulta o banco. Só as
+# escritas deste processo chegam pelo commit: um aluno, disciplina ou matrícula
+# ausente do índice é procurado uma vez no banco (pode vir de `manage.py
+# importar` ou de outro processo) e, se existir, entra no índice.
+
+_CHAVE_SESSAO = "indice_matriculas_alteracoes"
+
+def chave_banco(db: Union[Session, Connection]):
+    # Identifica o arquivo de banco da sessão (ou conexão): as pilhas síncrona e
+    # assíncrona usam engines diferentes sobre o mesmo arquivo e compartilham o que
+    # está em memória
+    bind = db.get_bind() if isinstance(db, Session) else db
+    engine = getattr(bind, "engine", bind)
+    banco = engine.url.database
+    if banco and banco != ":memory:":
+        return os.path.abspath(banco)
+    return id(engine)
+
+class IndiceMatriculas:
+
+    def __init__(self):
+        self.turma_por_aluno: Dict[int, Optional[int]] = {}
+        self.alunos_por_disciplina: Dict[int, Set[int]] = {}
+        # Testes de pertinência dispensam o lock; iterar um conjunto não
+        self._lock = threading.Lock()
+
+    def carregar(self, db: Session):
+        self.turma_por_aluno = dict(db.query(Aluno.id, Aluno.turma_id).all())
+        self.alunos_por_disciplina = {disciplina_id: set() for (disciplina_id,) in db.query(Disciplina.id)}
+        for aluno_id, disciplina_id in db.query(aluno_disciplina.c.aluno_id, aluno_disciplina.c.disciplina_id):
+            self.alunos_por_disciplina.setdefault(disciplina_id, set()).add(aluno_id)
+
+    def aluno_existe(self, db: Session, aluno_id: int) -> bool:
+        return aluno_id in self.turma_por_aluno or bool(self._ler_alunos(db, [aluno_id]))
+
+    def disciplina_existe(self, db: Session, disciplina_id: int) -> bool:
+        if disciplina_id in self.alunos_por_disciplina:
+            return True
+        if db.query(Disciplina.id).filter(Disciplina.id == disciplina_id).first() is None:
+            return False
+        self.aplicar([("disciplina", disciplina_id)])
+        return True
+
+    def turma(self, db: Session, aluno_id: int) -> Optional[int]:
+        if aluno_id not in self.turma_por_aluno:
+            self._ler_alunos(db, [aluno_id])
+        return self.turma_por_aluno.get(aluno_id)
+
+    def matriculado(self, db: Session, aluno_id: int, disciplina_id: int) -> bool:
+        return aluno_id in self.confirmar_matriculas(db, disciplina_id, [aluno_id])
+
+    def confirmar_matriculas(self, db: Session, disciplina_id: int, aluno_ids: Iterable[int]) -> Set[int]:
+        # Os matriculados na disciplina entre aluno_ids; os ausentes do índice
+        # são procurados no banco em uma consulta
+        conhecidos = self.alunos_por_disciplina.get(disciplina_id, ())
+        aluno_ids = set(aluno_ids)
+        matriculados = {aluno_id for aluno_id in aluno_ids if aluno_id in conhecidos}
+        ausentes = aluno_ids - matriculados
+        if ausentes:
+            linhas = db.query(Aluno.id, Aluno.turma_id).join(
+                aluno_disciplina, aluno_disciplina.c.aluno_id == Aluno.id
+            ).filter(aluno_disciplina.c.disciplina_id == disciplina_id, Aluno.id.in_(ausentes)).all()
+            if linhas:
+                self.aplicar([
+                    *(("aluno", aluno_id, turma_id) for aluno_id, turma_id in linhas),
+                    *(("matricula", aluno_id, disciplina_id) for aluno_id, _ in linhas),
+                ])
+                matriculados.update(aluno_id for aluno_id, _ in linhas)
+        return matriculados
+
+    def _ler_alunos(self, db: Session, aluno_ids: Iterable[int]):
+        linhas = db.query(Aluno.id, Aluno.turma_id).filter(Aluno.id.in_(list(aluno_ids))).all()
+        if linhas:
+            self.aplicar([("aluno", aluno_id, turma_id) for aluno_id, turma_id in linhas])
+        return linhas
+
+    def matriculados(self, disciplina_id: int, turma_id: int = None) -> Set[int]:
+        with self._lock:
+            alunos = self.alunos_por_disciplina.get(disciplina_id, set())
+            if turma_id is None:
+                return set(alunos)
+            return {aluno_id for aluno_id in alunos if self.turma_por_aluno.get(aluno_id) == turma_id}
+
+    def aplicar(self, alteracoes: Iterable[tuple]):
+        with self._lock:
+            self._aplicar(alteracoes)
+
+    def _aplicar(self, alteracoes: Iterable[tuple]):
+        for alteracao in alteracoes:
+            tipo = alteracao[0]
+            if tipo == "aluno":
+                _, aluno_id, turma_id = alteracao
+                self.turma_por_aluno[aluno_id] = turma_id
+            elif tipo == "disciplina":
+                self.alunos_por_disciplina.setdefault(alteracao[1], set())
+            elif tipo == "matricula":
+                _, aluno_id, disciplina_id = alteracao
+                self.alunos_por_disciplina.setdefault(disciplina_id, set()).add(aluno_id)
+
+class IndicesMatriculas:
+    # Um IndiceMatriculas por arquivo de banco (chave_banco)
+
+    def __init__(self):
+        self._indices: Dict[object, IndiceMatriculas] = {}
+        self._lock = threading.Lock()
+
+    def para(self, db: Session) -> IndiceMatriculas:
+        chave = chave_banco(db)
+        indice = self._indices.get(chave)
+        if indice is None:
+            with self._lock:
+                indice = self._indices.get(chave)
+                if indice is None:
+                    indice = IndiceMatriculas()
+                    indice.carregar(db)
+                    self._indices[chave] = indice
+        return indice
+
+    def descartar(self):
+        with self._lock:
+            self._indices.clear()
+
+    def _aplicar(self, db: Session, alteracoes):
+        # Índice ainda não carregado: nada a fazer, ele virá do banco já atualizado
+        indice = self._indices.get(chave_banco(db))
+        if indice is not None:
+            indice.aplicar(alteracoes)
+
+indice_matriculas = IndicesMatriculas()
+
+def registrar_matricula(db: Session, *alteracoes):
+    # ("aluno", aluno_id, turma_id), ("disciplina", disciplina_id) ou
+    # ("matricula", aluno_id, disciplina_id); aplicadas só depois do commit
+    db.info.setdefault(_CHAVE_SESSAO, []).extend(alteracoes)
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_alteracoes(session):
+    alteracoes = session.info.pop(_CHAVE_SESSAO, None)
+    if alteracoes:
+        indice_matriculas._aplicar(session, alteracoes)
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_alteracoes(session):
+    session.info.pop(_CHAVE_SESSAO, None)
@@ -0,0 +1,197 @@
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+from app import config
+
+logger = logging.getLogger(__name__)
+
+# Métricas por rota (modelo do caminho, ex.: /api/v1/relatorio/aluno/{aluno_id}):
+# latência, número de comandos SQL e tempo gasto no banco em cada requisição.
+# Os hooks do engine somam em um acumulador da requisição atual (ContextVar, que
+# acompanha a rota até a threadpool das rotas síncronas) e o middleware fecha a
+# conta quando a resposta termina de ser enviada. Desligado (FREQUENCIA_METRICAS=0),
+# nem o middleware nem os hooks são registrados. O tempo de banco cobre a execução
+# de cada comando no cursor; no SQLite parte das linhas só é produzida durante o
+# fetch, que fica de fora (e entra na latência da requisição).
+
+LIMITES_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LIMITES_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+TIPO_CONTEUDO = "text/plain; version=0.0.4; charset=utf-8"
+
+_CHAVE_INICIO = "metricas_inicio_consulta"
+
+class _Histograma:
+    __slots__ = ("limites", "contagens", "soma", "total")
+
+    def __init__(self, limites):
+        self.limites = limites
+        self.contagens = [0] * len(limites)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        posicao = bisect_left(self.limites, valor)
+        if posicao < len(self.limites):
+            self.contagens[posicao] += 1
+        self.soma += valor
+        self.total += 1
+
+    def linhas(self, nome: str, rotulos: str):
+        acumulado = 0
+        for limite, contagem in zip(self.limites, self.contagens):
+            acumulado += contagem
+            yield f'{nome}_bucket{{{rotulos},le="{limite:g}"}} {acumulado}'
+        yield f'{nome}_bucket{{{rotulos},le="+Inf"}} {self.total}'
+        yield f"{nome}_sum{{{rotulos}}} {self.soma:.6f}"
+        yield f"{nome}_count{{{rotulos}}} {self.total}"
+
+class _Requisicao:
+    __slots__ = ("scope", "consultas", "tempo_banco")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.consultas = 0
+        self.tempo_banco = 0.0
+
+_requisicao_atual: ContextVar = ContextVar("metricas_requisicao", default=None)
+
+def _rota(scope) -> str:
+    # Rótulo pelo modelo da rota, nunca pelo caminho concreto (um por id)
+    modelo = getattr(scope.get("route"), "path", None)
+    if not modelo:
+        return "desconhecida"
+    # Nas versões do FastAPI que mantêm o router incluído como um nó próprio,
+    # route.path vem sem o prefixo (/api/v1): completar com o início do caminho
+    caminho = scope.get("path", "")
+    faltando = caminho.rstrip("/").count("/") - modelo.rstrip("/").count("/")
+    if faltando > 0:
+        modelo = "/".join(caminho.split("/")[:faltando + 1]) + modelo
+    return modelo
+
+def _rotulo(valor) -> str:
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Metricas:
+
+    def __init__(self, limite_consultas: int = config.METRICAS_LIMITE_CONSULTAS,
+                 consulta_lenta_ms: float = config.CONSULTA_LENTA_MS):
+        self.limite_consultas = limite_consultas
+        self.consulta_lenta_ms = consulta_lenta_ms
+        self._lock = threading.Lock()
+        self._requisicoes = {}
+        self._duracao = {}
+        self._consultas = {}
+        self._tempo_banco = {}
+        self._n_mais_1 = {}
+        self.consultas_lentas = 0
+
+    def registrar(self, scope, status: int, duracao: float, requisicao: _Requisicao):
+        chave = (scope["method"], _rota(scope))
+        with self._lock:
+            self._requisicoes[(*chave, status)] = self._requisicoes.get((*chave, status), 0) + 1
+            if chave not in self._duracao:
+                self._duracao[chave] = _Histograma(LIMITES_DURACAO)
+                self._consultas[chave] = _Histograma(LIMITES_CONSULTAS)
+                self._tempo_banco[chave] = _Histograma(LIMITES_DURACAO)
+            self._duracao[chave].observar(duracao)
+            self._consultas[chave].observar(requisicao.consultas)
+            self._tempo_banco[chave].observar(requisicao.tempo_banco)
+            if requisicao.consultas > self.limite_consultas:
+                self._n_mais_1[chave] = self._n_mais_1.get(chave, 0) + 1
+        if requisicao.consultas > self.limite_consultas:
+            logger.warning("Possível N+1: %s %s executou %d comandos SQL (%.1f ms no banco)",
+                           chave[0], chave[1], requisicao.consultas, requisicao.tempo_banco * 1000)
+
+    def _antes_da_consulta(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(_CHAVE_INICIO, []).append(time.perf_counter())
+
+    def _depois_da_consulta(self, conn, cursor, statement, parameters, context, executemany):
+        duracao = time.perf_counter() - conn.info[_CHAVE_INICIO].pop()
+        requisicao = _requisicao_atual.get()
+        if requisicao is not None:
+            requisicao.consultas += 1
+            requisicao.tempo_banco += duracao
+        if self.consulta_lenta_ms and duracao * 1000 >= self.consulta_lenta_ms:
+            with self._lock:
+                self.consultas_lentas += 1
+            origem = f" em {requisicao.scope['method']} {_rota(requisicao.scope)}" if requisicao else ""
+            # executemany pode trazer milhares de linhas de parâmetros
+            parametros = repr(parameters)
+            if len(parametros) > 500:
+                parametros = parametros[:500] + "..."
+            logger.warning("Consulta lenta (%.1f ms)%s: %s | parâmetros: %s", duracao * 1000, origem, statement, parametros)
+
+    def _erro_na_consulta(self, contexto):
+        # after_cursor_execute não roda quando o comando falha
+        inicios = contexto.connection.info.get(_CHAVE_INICIO) if contexto.connection is not None else None
+        if inicios:
+            inicios.pop()
+
+    def instrumentar(self, engine):
+        event.listen(engine, "before_cursor_execute", self._antes_da_consulta)
+        event.listen(engine, "after_cursor_execute", self._depois_da_consulta)
+        event.listen(engine, "handle_error", self._erro_na_consulta)
+
+    def prometheus(self) -> str:
+        with self._lock:
+            linhas = [
+                "# HELP frequencia_http_requisicoes_total Requisições atendidas por rota e status",
+                "# TYPE frequencia_http_requisicoes_total counter",
+            ]
+            for (metodo, rota, status), total in sorted(self._requisicoes.items()):
+                linhas.append(f'frequencia_http_requisicoes_total{{metodo="{metodo}",rota="{_rotulo(rota)}",status="{status}"}} {total}')
+            for nome, ajuda, historicos in (
+                ("frequencia_http_duracao_segundos", "Latência das requisições", self._duracao),
+                ("frequencia_http_consultas_sql", "Comandos SQL executados por requisição", self._consultas),
+                ("frequencia_http_tempo_banco_segundos", "Tempo gasto no banco por requisição", self._tempo_banco),
+            ):
+                linhas += [f"# HELP {nome} {ajuda}", f"# TYPE {nome} histogram"]
+                for (metodo, rota), historico in sorted(historicos.items()):
+                    linhas.extend(historico.linhas(nome, f'metodo="{metodo}",rota="{_rotulo(rota)}"'))
+            linhas += [
+                f"# HELP frequencia_http_n_mais_1_total Requisições com mais de {self.limite_consultas} comandos SQL",
+                "# TYPE frequencia_http_n_mais_1_total counter",
+            ]
+            for (metodo, rota), total in sorted(self._n_mais_1.items()):
+                linhas.append(f'frequencia_http_n_mais_1_total{{metodo="{metodo}",rota="{_rotulo(rota)}"}} {total}')
+            linhas += [
+                "# HELP frequencia_sql_consultas_lentas_total Comandos SQL acima de FREQUENCIA_CONSULTA_LENTA_MS",
+                "# TYPE frequencia_sql_consultas_lentas_total counter",
+                f"frequencia_sql_consultas_lentas_total {self.consultas_lentas}",
+            ]
+        return "\n".join(linhas) + "\n"
+
+class MiddlewareMetricas:
+    # Middleware ASGI puro: mede até o último pedaço do corpo, o que inclui as
+    # respostas em streaming (exportações CSV)
+
+    def __init__(self, app, registro: Metricas = None):
+        self.app = app
+        self.metricas = registro or metricas
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        requisicao = _Requisicao(scope)
+        token = _requisicao_atual.set(requisicao)
+        status = 500
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _requisicao_atual.reset(token)
+            self.metricas.registrar(scope, status, time.perf_counter() - inicio, requisicao)
+
+metricas = Metricas()
@@ -0,0 +1,122 @@
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, Optional, Set, Tuple
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from app.database import Sessao
+from app.services.matriculas import chave_banco
+
+# Cache em memória de (turma, disciplina, dia) -> sessao_id, um por banco, usado
+# pela marcação individual para achar a sessão do dia sem consultar o banco. No
+# primeiro uso de um dia as sessões dele vêm em uma consulta (índice ix_sessoes_dia);
+# as criadas depois por este processo entram após o commit, como no índice de
+# matrículas. Um par ausente do dia é procurado de novo no banco antes de a
+# marcação criar a sessão, porque outro processo pode tê-la criado. Sessões não
+# mudam de turma, disciplina nem dia, então uma entrada nunca fica velha; só o
+# arquivamento apaga sessões, e ele descarta o cache.
+
+_CHAVE_SESSAO = "indice_sessoes_alteracoes"
+
+# Dias mantidos em memória (os mais recentemente usados)
+MAX_DIAS = 31
+
+class IndiceSessoes:
+
+    def __init__(self, max_dias: int = MAX_DIAS):
+        self.max_dias = max_dias
+        self._dias: "OrderedDict[date, Dict[Tuple[int, int], int]]" = OrderedDict()
+        self._completos: Set[date] = set()
+        self._lock = threading.Lock()
+
+    def sessao(self, db: Session, turma_id: int, disciplina_id: int, dia: date) -> Optional[int]:
+        chave = (turma_id, disciplina_id)
+        with self._lock:
+            sessoes = self._dias.get(dia)
+            if sessoes is not None:
+                self._dias.move_to_end(dia)
+                if chave in sessoes:
+                    return sessoes[chave]
+            completo = dia in self._completos
+
+        if not completo:
+            # Primeiro uso do dia: todas as sessões dele de uma vez
+            linhas = db.execute(select(Sessao.turma_id, Sessao.disciplina_id, Sessao.id).where(
+                func.date(Sessao.data) == dia.isoformat()
+            ).order_by(Sessao.data, Sessao.id)).all()
+            with self._lock:
+                sessoes = self._dia(dia)
+                for turma, disciplina, sessao_id in linhas:
+                    sessoes.setdefault((turma, disciplina), sessao_id)
+                self._completos.add(dia)
+                if chave in sessoes:
+                    return sessoes[chave]
+
+        # Ausente do cache: pode ter sido criada por outro processo
+        sessao_id = db.execute(select(Sessao.id).where(
+            Sessao.turma_id == turma_id,
+            Sessao.disciplina_id == disciplina_id,
+            func.date(Sessao.data) == dia.isoformat()
+        ).order_by(Sessao.data, Sessao.id).limit(1)).scalar()
+        if sessao_id is not None:
+            self.aplicar([(turma_id, disciplina_id, dia, sessao_id)])
+        return sessao_id
+
+    def _dia(self, dia: date) -> Dict[Tuple[int, int], int]:
+        sessoes = self._dias.get(dia)
+        if sessoes is None:
+            sessoes = self._dias[dia] = {}
+            while len(self._dias) > self.max_dias:
+                antigo, _ = self._dias.popitem(last=False)
+                self._completos.discard(antigo)
+        self._dias.move_to_end(dia)
+        return sessoes
+
+    def aplicar(self, sessoes):
+        # (turma_id, disciplina_id, dia, sessao_id); só os dias já em memória
+        # precisam delas, os outros serão lidos do banco
+        with self._lock:
+            for turma_id, disciplina_id, dia, sessao_id in sessoes:
+                if dia in self._dias:
+                    self._dias[dia].setdefault((turma_id, disciplina_id), sessao_id)
+
+class IndicesSessoes:
+    # Um IndiceSessoes por arquivo de banco (chave_banco)
+
+    def __init__(self):
+        self._indices: Dict[object, IndiceSessoes] = {}
+        self._lock = threading.Lock()
+
+    def para(self, db: Session) -> IndiceSessoes:
+        chave = chave_banco(db)
+        indice = self._indices.get(chave)
+        if indice is None:
+            with self._lock:
+                indice = self._indices.setdefault(chave, IndiceSessoes())
+        return indice
+
+    def descartar(self):
+        with self._lock:
+            self._indices.clear()
+
+    def _aplicar(self, db: Session, sessoes):
+        indice = self._indices.get(chave_banco(db))
+        if indice is not None:
+            indice.aplicar(sessoes)
+
+indice_sessoes = IndicesSessoes()
+
+def registrar_sessao(db: Session, *sessoes):
+    # (turma_id, disciplina_id, dia, sessao_id) de sessões criadas; aplicadas só
+    # depois do commit
+    db.info.setdefault(_CHAVE_SESSAO, []).extend(sessoes)
+
+@event.listens_for(Session, "after_commit")
+def _aplicar_alteracoes(session):
+    sessoes = session.info.pop(_CHAVE_SESSAO, None)
+    if sessoes:
+        indice_sessoes._aplicar(session, sessoes)
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_alteracoes(session):
+    session.info.pop(_CHAVE_SESSAO, None)
@@ -0,0 +1,98 @@
+from typing import Dict, List
+from sqlalchemy import Select, insert, literal, select
+from sqlalchemy.orm import Session
+from app.database import Turma, Disciplina, Aluno, Sessao, Frequencia, MudancaSync, aluno_disciplina
+
+# Sincronização dos clientes offline (tablets de chamada). Cada escrita do
+# FrequenciaService grava em mudancas_sync, na mesma transação, uma linha
+# (entidade, registro_id) por registro criado ou alterado. /sync lê as linhas
+# depois do cursor do cliente, junta as repetidas e devolve o estado atual de cada
+# registro, então um aluno remarcado dez vezes vem uma vez só. Registros que não
+# existem mais no banco principal (anos arquivados) vêm em "removidos".
+
+# Linhas do registro lidas por página de /sync
+LIMITE_PADRAO = 1000
+LIMITE_MAXIMO = 5000
+
+# Entidade do registro -> (chave da resposta, colunas devolvidas)
+ENTIDADES = {
+    "turma": ("turmas", (Turma.id, Turma.nome, Turma.ano, Turma.periodo)),
+    "disciplina": ("disciplinas", (Disciplina.id, Disciplina.nome, Disciplina.codigo, Disciplina.carga_horaria,
+                                   Disciplina.professor)),
+    "aluno": ("alunos", (Aluno.id, Aluno.nome, Aluno.matricula, Aluno.email, Aluno.turma_id)),
+    "sessao": ("sessoes", (Sessao.id, Sessao.turma_id, Sessao.disciplina_id, Sessao.data, Sessao.descricao)),
+    "frequencia": ("frequencias", (Frequencia.id, Frequencia.aluno_id, Frequencia.sessao_id, Frequencia.presente,
+                                   Frequencia.justificado, Frequencia.observacao, Frequencia.data_registro)),
+}
+
+def registrar_mudancas(db: Session, entidade: str, ids):
+    # `ids`: lista de ids ou um select que devolve os ids (vira INSERT ... SELECT)
+    if isinstance(ids, Select):
+        db.execute(insert(MudancaSync).from_select(
+            ["entidade", "registro_id"], select(literal(entidade), ids.subquery())
+        ))
+    elif ids:
+        db.execute(insert(MudancaSync), [{"entidade": entidade, "registro_id": registro_id} for registro_id in ids])
+
+def preencher_registro(conn):
+    # Cadastros e sessões já gravados entram no registro para a primeira
+    # sincronização (bancos migrados ou gerados fora do serviço). As frequências
+    # antigas ficam de fora, porque dobrariam a maior tabela do banco; entram a
+    # partir das próximas marcações.
+    for entidade in ("turma", "disciplina", "aluno", "sessao"):
+        coluna_id = ENTIDADES[entidade][1][0]
+        conn.execute(insert(MudancaSync).from_select(
+            ["entidade", "registro_id"], select(literal(entidade), coluna_id).order_by(coluna_id)
+        ))
+
+def _turma_da_linha(entidade: str):
+    # Coluna que liga o registro à turma (filtro turma_id de /sync)
+    return {"turma": Turma.id, "aluno": Aluno.turma_id, "sessao": Sessao.turma_id,
+            "frequencia": Sessao.turma_id}.get(entidade)
+
+def mudancas_desde(db: Session, desde: int = 0, turma_id: int = None, limite: int = LIMITE_PADRAO) -> Dict:
+    linhas = db.execute(
+        select(MudancaSync.id, MudancaSync.entidade, MudancaSync.registro_id)
+        .where(MudancaSync.id > desde).order_by(MudancaSync.id).limit(limite + 1)
+    ).all()
+    mais = len(linhas) > limite
+    linhas = linhas[:limite]
+
+    alterados: Dict[str, set] = {entidade: set() for entidade in ENTIDADES}
+    for _, entidade, registro_id in linhas:
+        if entidade in alterados:
+            alterados[entidade].add(registro_id)
+
+    resposta = {"cursor": linhas[-1].id if linhas else desde, "mais": mais, "removidos": {}}
+    for entidade, (chave, colunas) in ENTIDADES.items():
+        ids = alterados[entidade]
+        resposta[chave] = []
+        if not ids:
+            continue
+        # O filtro de turma é aplicado depois de ler os registros para separar os
+        # de outra turma dos que saíram do banco
+        coluna_turma = _turma_da_linha(entidade)
+        consulta = select(*colunas, (coluna_turma if coluna_turma is not None else literal(None)).label("turma_da_linha"))
+        if entidade == "frequencia":
+            consulta = consulta.join(Sessao, Sessao.id == Frequencia.sessao_id)
+        consulta = consulta.where(colunas[0].in_(ids)).order_by(colunas[0])
+        encontrados = set()
+        for linha in db.execute(consulta).mappings():
+            encontrados.add(linha["id"])
+            if turma_id is None or coluna_turma is None or linha["turma_da_linha"] == turma_id:
+                resposta[chave].append({coluna.key: linha[coluna.key] for coluna in colunas})
+        if len(encontrados) < len(ids):
+            resposta["removidos"][chave] = sorted(ids - encontrados)
+
+    # Matrículas vão junto do aluno
+    if resposta["alunos"]:
+        matriculas: Dict[int, List[int]] = {aluno["id"]: [] for aluno in resposta["alunos"]}
+        for aluno_id, disciplina_id in db.execute(
+            select(aluno_disciplina.c.aluno_id, aluno_disciplina.c.disciplina_id)
+            .where(aluno_disciplina.c.aluno_id.in_(matriculas.keys()))
+            .order_by(aluno_disciplina.c.aluno_id, aluno_disciplina.c.disciplina_id)
+        ):
+            matriculas[aluno_id].append(disciplina_id)
+        for aluno in resposta["alunos"]:
+            aluno["disciplina_ids"] = matriculas[aluno["id"]]
+    return resposta
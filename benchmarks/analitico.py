@@ -0,0 +1,133 @@
+"""Compara o motor analítico (FREQUENCIA_ANALITICO=1, NumPy) com o caminho SQL.
+
+Trabalha sobre uma cópia do banco (gerado por gerar_dados.py ou passado em --banco).
+Mede a carga inicial do motor (tempo e memória dos arrays e índices), o custo de uma
+atualização sem novidades (paga antes de cada relatório) e, para cada relatório,
+a latência pelos dois caminhos com o cache de relatórios fora do caminho. Os dois
+resultados de cada chamada são comparados: qualquer diferença é apontada.
+
+    python benchmarks/analitico.py --escala media
+    python benchmarks/analitico.py --banco /tmp/20m.db --repeticoes 5
+
+Requer numpy.
+"""
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _amostras(db):
+    from sqlalchemy import func
+    from app.database import Turma, Aluno, Sessao, aluno_disciplina
+
+    turma_id = db.query(func.min(Turma.id)).scalar()
+    aluno_id = db.query(func.min(Aluno.id)).filter(Aluno.turma_id == turma_id).scalar()
+    disciplina_id = db.query(func.min(aluno_disciplina.c.disciplina_id)).filter(
+        aluno_disciplina.c.aluno_id == aluno_id).scalar()
+    ultima = db.query(func.max(Sessao.data)).scalar()
+    return {
+        "turma_id": turma_id,
+        "aluno_id": aluno_id,
+        "disciplina_id": disciplina_id,
+        "inicio": (ultima - timedelta(days=30)).date(),
+        "fim": ultima.date(),
+    }
+
+def casos(a):
+    # (nome, método do serviço, argumentos, pesado)
+    periodo = {"inicio": a["inicio"], "fim": a["fim"]}
+    return [
+        ("relatorio_aluno", "relatorio_aluno", ((a["aluno_id"],), {}), False),
+        ("relatorio_aluno (período)", "relatorio_aluno", ((a["aluno_id"],), periodo), False),
+        ("relatorio_aluno_disciplina", "relatorio_aluno_disciplina", ((a["aluno_id"], a["disciplina_id"]), {}), False),
+        ("relatorio_aluno_disciplina (período)", "relatorio_aluno_disciplina", ((a["aluno_id"], a["disciplina_id"]), periodo), False),
+        ("relatorio_turma", "relatorio_turma", ((a["turma_id"],), {}), False),
+        ("relatorio_turma (período)", "relatorio_turma", ((a["turma_id"],), periodo), False),
+        ("dashboard", "dashboard", ((), {}), True),
+        ("dashboard (período)", "dashboard", ((), periodo), True),
+        ("serie dia", "serie_frequencia", (("dia",), {}), False),
+        ("serie semana por turma", "serie_frequencia", (("semana",), {"por": "turma"}), True),
+        ("serie mes por disciplina", "serie_frequencia", (("mes",), {"por": "disciplina"}), False),
+        ("serie dia turma/disciplina (período)", "serie_frequencia",
+         (("dia",), {"turma_id": a["turma_id"], "disciplina_id": a["disciplina_id"], **periodo}), False),
+    ]
+
+def _medir(funcao, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return resultado, statistics.median(tempos)
+
+def rodar(banco: str, repeticoes: int, repeticoes_pesadas: int):
+    os.environ["FREQUENCIA_DATABASE_URL"] = f"sqlite:///{banco}"
+    sys.path.insert(0, RAIZ)
+    from app import config
+    from app.database import SessionLocal, engine
+    from app.migrations import aplicar_migracoes
+    from app.services import analitico
+    from app.services.frequencia_service import FrequenciaService
+
+    if not analitico.disponivel():
+        sys.exit("numpy não está instalado")
+    aplicar_migracoes(engine)
+    db = SessionLocal()
+    try:
+        amostra = _amostras(db)
+        config.ANALITICO = True
+        inicio = time.perf_counter()
+        motor = analitico.motores_analiticos.para(db)
+        carga = time.perf_counter() - inicio
+        memoria = motor.bytes
+        db.rollback()
+        _, atualizacao = _medir(lambda: (analitico.motores_analiticos.para(db), db.rollback()), 20)
+        print(f"{motor.registros.n} registros carregados em {carga:.1f} s, "
+              f"{memoria / 2 ** 20:.0f} MiB em arrays; atualização sem novidades: {atualizacao:.2f} ms\n")
+
+        print(f"{'relatório':40s} {'SQL p50':>10s} {'motor p50':>10s} {'ganho':>7s}  resultados")
+        for nome, metodo, (args, kwargs), pesado in casos(amostra):
+            # Sem o cache de relatórios: mede o cálculo, não o acerto no cache
+            funcao = getattr(FrequenciaService, metodo).__wrapped__
+            vezes = repeticoes_pesadas if pesado else repeticoes
+            medidas = {}
+            for ligado in (False, True):
+                config.ANALITICO = ligado
+                medidas[ligado] = _medir(lambda: funcao(db, *args, **kwargs), vezes)
+                db.rollback()
+            (via_sql, t_sql), (via_motor, t_motor) = medidas[False], medidas[True]
+            print(f"{nome:40s} {t_sql:8.2f} ms {t_motor:7.2f} ms {t_sql / t_motor:6.1f}x  "
+                  f"{'iguais' if via_sql == via_motor else 'DIFERENTES'}")
+    finally:
+        db.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", help="banco de origem (copiado antes da execução); sem ele um é gerado")
+    parser.add_argument("--escala", default="pequena", help="escala do banco gerado (ver gerar_dados.py)")
+    parser.add_argument("--repeticoes", type=int, default=10)
+    parser.add_argument("--repeticoes-pesadas", type=int, default=3, help="para o dashboard e a série semanal por turma")
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench_analitico_")
+    copia = os.path.join(pasta, "bench.db")
+    try:
+        if args.banco:
+            shutil.copy(args.banco, copia)
+        else:
+            print(f"Gerando banco (escala {args.escala})...")
+            subprocess.run([sys.executable, os.path.join(RAIZ, "benchmarks", "gerar_dados.py"), copia,
+                            "--escala", args.escala], check=True)
+        rodar(copia, args.repeticoes, args.repeticoes_pesadas)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
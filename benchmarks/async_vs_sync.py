@@ -0,0 +1,176 @@
+"""Compara a pilha síncrona e a assíncrona (FREQUENCIA_ASYNC=1) sob carga concorrente.
+
+Sobe um servidor uvicorn para cada modo sobre a mesma cópia de um banco temporário
+e dispara N clientes concorrentes (50, 200 e 1000 por padrão), cada um fazendo uma
+mistura de leituras de relatório e marcações individuais.
+
+    python benchmarks/async_vs_sync.py --clientes 50 200 1000 --requisicoes 20
+
+Requer httpx.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def popular_banco(caminho: str, turmas: int, alunos_por_turma: int, disciplinas: int, sessoes: int):
+    os.environ["FREQUENCIA_DATABASE_URL"] = f"sqlite:///{caminho}"
+    sys.path.insert(0, RAIZ)
+    from app.database import SessionLocal, Turma, Disciplina, Aluno, Sessao, engine
+    from app.migrations import aplicar_migracoes
+    from app.schemas import FrequenciaLoteItem
+    from app.services.frequencia_service import FrequenciaService
+
+    aplicar_migracoes(engine)
+    db = SessionLocal()
+    random.seed(7)
+    lista_disciplinas = [
+        Disciplina(nome=f"Disciplina {d}", codigo=f"D{d:03d}", carga_horaria=80, professor=f"Professor {d}")
+        for d in range(disciplinas)
+    ]
+    db.add_all(lista_disciplinas)
+    db.flush()
+    for t in range(turmas):
+        turma = Turma(nome=f"Turma {t}", ano=2024, periodo="Manhã")
+        db.add(turma)
+        db.flush()
+        alunos = [
+            Aluno(nome=f"Aluno {t}-{a}", matricula=f"{t:04d}{a:04d}", turma_id=turma.id, disciplinas=lista_disciplinas)
+            for a in range(alunos_por_turma)
+        ]
+        db.add_all(alunos)
+        db.flush()
+        for s in range(sessoes):
+            disciplina = lista_disciplinas[s % disciplinas]
+            sessao = Sessao(turma_id=turma.id, disciplina_id=disciplina.id)
+            db.add(sessao)
+            db.flush()
+            FrequenciaService.marcar_frequencia_lote(db, sessao.id, [
+                FrequenciaLoteItem(aluno_id=aluno.id, presente=random.random() < 0.85) for aluno in alunos
+            ])
+    db.commit()
+    ids = {
+        "turmas": [t for (t,) in db.query(Turma.id)],
+        "alunos": [a for (a,) in db.query(Aluno.id)],
+        "disciplinas": [d.id for d in lista_disciplinas],
+    }
+    db.close()
+    engine.dispose()
+    return ids
+
+async def _cliente(cliente, base, ids, requisicoes, latencias, erros):
+    for _ in range(requisicoes):
+        sorteio = random.random()
+        inicio = time.perf_counter()
+        try:
+            if sorteio < 0.5:
+                resposta = await cliente.get(f"{base}/relatorio/aluno/{random.choice(ids['alunos'])}")
+            elif sorteio < 0.8:
+                resposta = await cliente.get(f"{base}/relatorio/turma/{random.choice(ids['turmas'])}")
+            else:
+                resposta = await cliente.post(f"{base}/frequencias/individual/", json={
+                    "aluno_id": random.choice(ids["alunos"]),
+                    "disciplina_id": random.choice(ids["disciplinas"]),
+                    "presente": random.random() < 0.85,
+                })
+            if resposta.status_code >= 400:
+                erros.append(resposta.status_code)
+        except Exception as e:
+            erros.append(type(e).__name__)
+        latencias.append(time.perf_counter() - inicio)
+
+async def rodar_carga(base: str, ids, clientes: int, requisicoes: int):
+    import httpx
+    latencias, erros = [], []
+    limites = httpx.Limits(max_connections=clientes, max_keepalive_connections=clientes)
+    async with httpx.AsyncClient(limits=limites, timeout=120) as cliente:
+        inicio = time.perf_counter()
+        await asyncio.gather(*[
+            _cliente(cliente, base, ids, requisicoes, latencias, erros) for _ in range(clientes)
+        ])
+        duracao = time.perf_counter() - inicio
+    latencias.sort()
+    def percentil(p):
+        return latencias[min(len(latencias) - 1, int(len(latencias) * p))] * 1000
+    return {
+        "requisicoes": len(latencias),
+        "erros": len(erros),
+        "req_s": len(latencias) / duracao,
+        "p50_ms": percentil(0.50),
+        "p95_ms": percentil(0.95),
+        "p99_ms": percentil(0.99),
+        "media_ms": statistics.mean(latencias) * 1000,
+    }
+
+def _esperar_servidor(porta: int, processo, limite: float = 30):
+    import httpx
+    fim = time.time() + limite
+    while time.time() < fim:
+        if processo.poll() is not None:
+            raise RuntimeError("Servidor encerrou durante a inicialização")
+        try:
+            httpx.get(f"http://127.0.0.1:{porta}/api", timeout=1)
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError("Servidor não respondeu")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clientes", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--requisicoes", type=int, default=20, help="requisições por cliente")
+    parser.add_argument("--turmas", type=int, default=20)
+    parser.add_argument("--alunos-por-turma", type=int, default=40)
+    parser.add_argument("--disciplinas", type=int, default=8)
+    parser.add_argument("--sessoes", type=int, default=40, help="sessões por turma")
+    parser.add_argument("--porta", type=int, default=8765)
+    args = parser.parse_args()
+
+    pasta = tempfile.mkdtemp(prefix="bench_async_")
+    base_dados = os.path.join(pasta, "base.db")
+    print("Populando banco de teste...")
+    ids = popular_banco(base_dados, args.turmas, args.alunos_por_turma, args.disciplinas, args.sessoes)
+
+    resultados = {}
+    try:
+        for modo in ("sync", "async"):
+            caminho = os.path.join(pasta, f"{modo}.db")
+            shutil.copy(base_dados, caminho)
+            ambiente = dict(os.environ,
+                            FREQUENCIA_DATABASE_URL=f"sqlite:///{caminho}",
+                            FREQUENCIA_ASYNC="1" if modo == "async" else "0")
+            processo = subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.porta), "--log-level", "warning"],
+                cwd=RAIZ, env=ambiente
+            )
+            try:
+                _esperar_servidor(args.porta, processo)
+                for clientes in args.clientes:
+                    random.seed(clientes)
+                    r = asyncio.run(rodar_carga(f"http://127.0.0.1:{args.porta}/api/v1", ids, clientes, args.requisicoes))
+                    resultados[(modo, clientes)] = r
+                    print(f"{modo:5s} {clientes:5d} clientes: {r['req_s']:8.1f} req/s  "
+                          f"p50 {r['p50_ms']:7.1f} ms  p95 {r['p95_ms']:7.1f} ms  p99 {r['p99_ms']:7.1f} ms  "
+                          f"erros {r['erros']}")
+            finally:
+                processo.terminate()
+                processo.wait()
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    print()
+    print(f"{'clientes':>8s} {'sync req/s':>11s} {'async req/s':>12s} {'sync p95':>9s} {'async p95':>10s}")
+    for clientes in args.clientes:
+        s, a = resultados[("sync", clientes)], resultados[("async", clientes)]
+        print(f"{clientes:8d} {s['req_s']:11.1f} {a['req_s']:12.1f} {s['p95_ms']:9.1f} {a['p95_ms']:10.1f}")
+
+if __name__ == "__main__":
+    main()
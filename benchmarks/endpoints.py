@@ -0,0 +1,320 @@
+"""Mede todos os endpoints da API em processo, pelo TestClient do FastAPI.
+
+Trabalha sobre uma cópia do banco (gerado por gerar_dados.py ou passado em --banco),
+então as escritas não alteram o original. Para cada endpoint registra latência
+(p50/p95/p99, média e máximo), a primeira chamada à parte (cache frio) e quantos
+comandos SQL cada requisição executou, contados por um listener before_cursor_execute
+no engine. O resultado vai para benchmarks/resultados/<commit>_<data>.json.
+
+    python benchmarks/endpoints.py --escala media
+    python benchmarks/endpoints.py --banco /tmp/bench.db --repeticoes 100
+    python benchmarks/endpoints.py --comparar resultados/a.json resultados/b.json
+
+Requer httpx.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resultados")
+
+def _commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        alterado = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=RAIZ,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+    return f"{commit}-alterado" if alterado else commit
+
+def _percentil(valores, p):
+    return valores[min(len(valores) - 1, int(len(valores) * p))]
+
+def _amostras(db):
+    # Ids usados pelos casos: uma turma com seus alunos e disciplinas, uma sessão
+    # existente dessa turma e alunos espalhados por todo o banco
+    from sqlalchemy import func
+    from app.database import Turma, Aluno, Sessao, aluno_disciplina
+
+    turma_id = db.query(func.min(Turma.id)).scalar()
+    alunos_turma = [a for (a,) in db.query(Aluno.id).filter(Aluno.turma_id == turma_id).order_by(Aluno.id)]
+    disciplinas_turma = [d for (d,) in db.query(aluno_disciplina.c.disciplina_id).filter(
+        aluno_disciplina.c.aluno_id == alunos_turma[0]).order_by(aluno_disciplina.c.disciplina_id)]
+    sessao_id = db.query(func.max(Sessao.id)).filter(
+        Sessao.turma_id == turma_id, Sessao.disciplina_id == disciplinas_turma[0]).scalar()
+    total_alunos = db.query(func.count(Aluno.id)).scalar()
+    passo = max(total_alunos // 200, 1)
+    alunos = [a for (a,) in db.query(Aluno.id).order_by(Aluno.id).filter(Aluno.id % passo == 0).limit(200)]
+    # Período dos filtros: o último mês com aulas
+    ultima = db.query(func.max(Sessao.data)).scalar() or datetime.now()
+    return {
+        "turma_id": turma_id,
+        "alunos_turma": alunos_turma,
+        "disciplinas_turma": disciplinas_turma,
+        "sessao_id": sessao_id,
+        "alunos": alunos or alunos_turma,
+        "periodo": f"inicio={(ultima - timedelta(days=30)).date()}&fim={ultima.date()}",
+    }
+
+def _escala(db):
+    from sqlalchemy import func
+    from app.database import Turma, Disciplina, Aluno, Sessao, Frequencia
+    return {
+        nome: db.query(func.count()).select_from(modelo).scalar()
+        for nome, modelo in (("turmas", Turma), ("disciplinas", Disciplina), ("alunos", Aluno),
+                             ("sessoes", Sessao), ("frequencias", Frequencia))
+    }
+
+def casos(amostra, cliente):
+    # (nome, pesado, função i -> (método, url, argumentos do cliente)). Os pesados
+    # rodam --repeticoes-pesadas vezes. Leituras primeiro: as escritas invalidam o cache
+    turma_id, sessao_id = amostra["turma_id"], amostra["sessao_id"]
+    disciplina_id = amostra["disciplinas_turma"][0]
+    alunos, alunos_turma = amostra["alunos"], amostra["alunos_turma"]
+    periodo = amostra["periodo"]
+
+    def aluno(i):
+        return alunos[i % len(alunos)]
+
+    def revalidar(url):
+        # Cliente que já tem a resposta: If-None-Match com o ETag recebido deve dar 304
+        etag = []
+        def requisicao(i):
+            if not etag:
+                etag.append(cliente.get(url).headers.get("etag", ""))
+            return ("GET", url, {"headers": {"If-None-Match": etag[0]}})
+        return requisicao
+
+    def csv_importacao(i):
+        linhas = ["nome,matricula,turma,ano,periodo,disciplinas"]
+        linhas += [f"Importado {i}-{n},IMP{i:05d}{n:03d},Turma Importada {i % 5},2025,Tarde,D001" for n in range(100)]
+        return {"files": {"arquivo": ("alunos.csv", "\n".join(linhas).encode(), "text/csv")}}
+
+    return [
+        ("GET /", False, lambda i: ("GET", "/", {})),
+        ("GET /api", False, lambda i: ("GET", "/api", {})),
+        ("GET /turmas/", False, lambda i: ("GET", "/api/v1/turmas/", {})),
+        ("GET /turmas/?limit=100", False, lambda i: ("GET", "/api/v1/turmas/?limit=100&fields=id,nome", {})),
+        ("GET /disciplinas/", False, lambda i: ("GET", "/api/v1/disciplinas/", {})),
+        ("GET /disciplinas/{id}", False, lambda i: ("GET", f"/api/v1/disciplinas/{disciplina_id}", {})),
+        ("GET /alunos/?limit=1000", False,
+         lambda i: ("GET", "/api/v1/alunos/?limit=1000&fields=id,nome,matricula,turma_id", {})),
+        ("GET /turmas/{id}/alunos/", False, lambda i: ("GET", f"/api/v1/turmas/{turma_id}/alunos/", {})),
+        ("GET /disciplinas/{id}/alunos/?limit=1000", False,
+         lambda i: ("GET", f"/api/v1/disciplinas/{disciplina_id}/alunos/?limit=1000", {})),
+        ("GET /relatorio/aluno/{id}", False, lambda i: ("GET", f"/api/v1/relatorio/aluno/{aluno(i)}", {})),
+        ("GET /relatorio/aluno/{id}?inicio&fim", False,
+         lambda i: ("GET", f"/api/v1/relatorio/aluno/{aluno(i)}?{periodo}", {})),
+        ("GET /relatorio/aluno/{id}/disciplina/{id}", False,
+         lambda i: ("GET", f"/api/v1/relatorio/aluno/{alunos_turma[i % len(alunos_turma)]}/disciplina/{disciplina_id}", {})),
+        ("GET /relatorio/turma/{id}", False, lambda i: ("GET", f"/api/v1/relatorio/turma/{turma_id}", {})),
+        ("GET /relatorio/turma/{id}?inicio&fim", False,
+         lambda i: ("GET", f"/api/v1/relatorio/turma/{turma_id}?{periodo}", {})),
+        ("GET /relatorio/matriz?turma_id", False, lambda i: ("GET", f"/api/v1/relatorio/matriz?turma_id={turma_id}", {})),
+        ("GET /relatorio/matriz", True, lambda i: ("GET", "/api/v1/relatorio/matriz", {})),
+        ("GET /relatorio/matriz?turma_id&inicio&fim", False,
+         lambda i: ("GET", f"/api/v1/relatorio/matriz?turma_id={turma_id}&{periodo}", {})),
+        ("GET /relatorio/serie?granularidade=dia", False, lambda i: ("GET", "/api/v1/relatorio/serie?granularidade=dia", {})),
+        ("GET /relatorio/serie?granularidade=semana&por=turma", False,
+         lambda i: ("GET", "/api/v1/relatorio/serie?granularidade=semana&por=turma", {})),
+        ("GET /relatorio/serie?granularidade=mes&disciplina_id", False,
+         lambda i: ("GET", f"/api/v1/relatorio/serie?granularidade=mes&disciplina_id={disciplina_id}", {})),
+        ("GET /relatorio/risco", False, lambda i: ("GET", "/api/v1/relatorio/risco?k=50", {})),
+        ("GET /relatorio/risco?por_disciplina&min_sessoes", False,
+         lambda i: ("GET", "/api/v1/relatorio/risco?por_disciplina=true&min_sessoes=10&k=50", {})),
+        ("GET /relatorio/risco?disciplina_id&inicio&fim", False,
+         lambda i: ("GET", f"/api/v1/relatorio/risco?disciplina_id={disciplina_id}&{periodo}", {})),
+        ("GET /dashboard", True, lambda i: ("GET", "/api/v1/dashboard", {})),
+        ("GET /dashboard?inicio&fim", True, lambda i: ("GET", f"/api/v1/dashboard?{periodo}", {})),
+        ("GET /dashboard (If-None-Match)", False, revalidar("/api/v1/dashboard")),
+        ("GET /cache/relatorios", False, lambda i: ("GET", "/api/v1/cache/relatorios", {})),
+        ("GET /sync?turma_id", False, lambda i: ("GET", f"/api/v1/sync?turma_id={turma_id}&limit=1000", {})),
+        ("GET /exportar/turma/{id}", False, lambda i: ("GET", f"/api/v1/exportar/turma/{turma_id}", {})),
+        ("GET /exportar/disciplina/{id}?gzip", False,
+         lambda i: ("GET", f"/api/v1/exportar/disciplina/{disciplina_id}?gzip=true", {})),
+        ("GET /exportar/instituicao", True, lambda i: ("GET", "/api/v1/exportar/instituicao", {})),
+        ("POST /turmas/", False, lambda i: ("POST", "/api/v1/turmas/", {"json": {
+            "nome": f"Turma Benchmark {i}", "ano": 2025, "periodo": "Manhã"}})),
+        ("POST /disciplinas/", False, lambda i: ("POST", "/api/v1/disciplinas/", {"json": {
+            "nome": f"Disciplina Benchmark {i}", "codigo": f"BEN{i:05d}", "carga_horaria": 60,
+            "professor": "Prof. Benchmark"}})),
+        ("POST /alunos/", False, lambda i: ("POST", "/api/v1/alunos/", {"json": {
+            "nome": f"Aluno Benchmark {i}", "matricula": f"BEN{i:07d}", "turma_id": turma_id,
+            "disciplina_ids": amostra["disciplinas_turma"]}})),
+        ("POST /matricular/", False, lambda i: ("POST", "/api/v1/matricular/", {"json": {
+            "aluno_id": aluno(i), "disciplina_id": disciplina_id}})),
+        ("POST /importar/alunos", True, lambda i: ("POST", "/api/v1/importar/alunos", csv_importacao(i))),
+        ("POST /sessoes/", False, lambda i: ("POST", "/api/v1/sessoes/", {"json": {
+            "turma_id": turma_id, "disciplina_id": disciplina_id, "descricao": f"Aula benchmark {i}"}})),
+        ("POST /sessoes/agenda/", False, lambda i: ("POST", "/api/v1/sessoes/agenda/", {"json": {
+            "inicio": (date(2030, 1, 7) + timedelta(weeks=i)).isoformat(),
+            "fim": (date(2030, 1, 13) + timedelta(weeks=i)).isoformat(),
+            "horarios": [{"turma_id": turma_id, "disciplina_id": d, "dia_semana": dia, "horario": "08:00"}
+                         for d in amostra["disciplinas_turma"] for dia in range(5)]}})),
+        ("POST /frequencias/individual/", False, lambda i: ("POST", "/api/v1/frequencias/individual/", {"json": {
+            "aluno_id": alunos_turma[i % len(alunos_turma)], "disciplina_id": disciplina_id,
+            "presente": i % 4 != 0}})),
+        ("POST /frequencias/lote/", False, lambda i: ("POST", "/api/v1/frequencias/lote/", {"json": {
+            "sessao_id": sessao_id,
+            "frequencias": [{"aluno_id": a, "presente": (a + i) % 5 != 0} for a in alunos_turma]}})),
+        ("POST /sync/frequencias", False, lambda i: ("POST", "/api/v1/sync/frequencias", {"json": {
+            "registros": [{"id_cliente": f"bench-{i}-{a}", "sessao_id": sessao_id, "aluno_id": a,
+                           "presente": (a + i) % 5 != 0} for a in alunos_turma]}})),
+        ("POST /sync/frequencias (reenvio)", False, lambda i: ("POST", "/api/v1/sync/frequencias", {"json": {
+            "registros": [{"id_cliente": f"bench-0-{a}", "sessao_id": sessao_id, "aluno_id": a,
+                           "presente": a % 5 != 0} for a in alunos_turma]}})),
+        ("GET /relatorio/turma/{id} após escrita", False,
+         lambda i: ("GET", f"/api/v1/relatorio/turma/{turma_id}", {})),
+    ]
+
+def medir(cliente, contador, requisicao, repeticoes):
+    latencias, consultas, status = [], [], {}
+    primeira = None
+    for i in range(repeticoes + 1):
+        metodo, url, argumentos = requisicao(i)
+        antes = contador[0]
+        inicio = time.perf_counter()
+        resposta = cliente.request(metodo, url, **argumentos)
+        duracao = (time.perf_counter() - inicio) * 1000
+        executadas = contador[0] - antes
+        status[resposta.status_code] = status.get(resposta.status_code, 0) + 1
+        if i == 0:
+            primeira = {"ms": duracao, "consultas": executadas, "bytes": len(resposta.content)}
+            continue
+        latencias.append(duracao)
+        consultas.append(executadas)
+    latencias.sort()
+    return {
+        "n": len(latencias),
+        "status": {str(codigo): quantidade for codigo, quantidade in sorted(status.items())},
+        "primeira_ms": primeira["ms"],
+        "primeira_consultas": primeira["consultas"],
+        "bytes": primeira["bytes"],
+        "p50_ms": _percentil(latencias, 0.50),
+        "p95_ms": _percentil(latencias, 0.95),
+        "p99_ms": _percentil(latencias, 0.99),
+        "media_ms": statistics.mean(latencias),
+        "max_ms": latencias[-1],
+        "consultas_media": statistics.mean(consultas),
+        "consultas_max": max(consultas),
+    }
+
+def rodar(banco: str, repeticoes: int, repeticoes_pesadas: int, filtro: str = None):
+    os.environ["FREQUENCIA_DATABASE_URL"] = f"sqlite:///{banco}"
+    sys.path.insert(0, RAIZ)
+    os.chdir(RAIZ)
+    from sqlalchemy import event
+    from fastapi.testclient import TestClient
+    from app import config
+    from app.database import SessionLocal, engine
+    from main import app
+
+    contador = [0]
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        contador[0] += 1
+    engines = [engine]
+    if config.USAR_ASYNC:
+        from app.database_async import async_engine
+        engines.append(async_engine.sync_engine)
+    for alvo in engines:
+        event.listen(alvo, "before_cursor_execute", contar)
+
+    db = SessionLocal()
+    try:
+        amostra = _amostras(db)
+        escala = _escala(db)
+    finally:
+        db.close()
+
+    resultados = {}
+    with TestClient(app) as cliente:
+        for nome, pesado, requisicao in casos(amostra, cliente):
+            if filtro and filtro not in nome:
+                continue
+            r = medir(cliente, contador, requisicao, repeticoes_pesadas if pesado else repeticoes)
+            resultados[nome] = r
+            print(f"{nome:45s} p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  p99 {r['p99_ms']:8.2f} ms  "
+                  f"1ª {r['primeira_ms']:8.2f} ms  consultas {r['consultas_media']:5.1f}  status {r['status']}")
+    return {
+        "commit": _commit(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "configuracao": {
+            "async": config.USAR_ASYNC,
+            "agrupar_escritas": config.AGRUPAR_ESCRITAS,
+            "cache_relatorios": config.CACHE_RELATORIOS_MAX,
+            "repeticoes": repeticoes,
+            "repeticoes_pesadas": repeticoes_pesadas,
+        },
+        "escala": escala,
+        "endpoints": resultados,
+    }
+
+def comparar(antes: str, depois: str):
+    with open(antes, encoding="utf-8") as arquivo:
+        a = json.load(arquivo)
+    with open(depois, encoding="utf-8") as arquivo:
+        b = json.load(arquivo)
+    print(f"{a['commit']} ({a['data']}) -> {b['commit']} ({b['data']})")
+    if a["escala"] != b["escala"]:
+        print(f"Atenção: escalas diferentes {a['escala']} x {b['escala']}")
+    print(f"{'endpoint':45s} {'p50 antes':>10s} {'p50 depois':>11s} {'Δ':>7s} {'p95 antes':>10s} {'p95 depois':>11s} {'consultas':>11s}")
+    for nome, r in b["endpoints"].items():
+        anterior = a["endpoints"].get(nome)
+        if anterior is None:
+            print(f"{nome:45s} {'-':>10s} {r['p50_ms']:11.2f}")
+            continue
+        variacao = (r["p50_ms"] / anterior["p50_ms"] - 1) * 100 if anterior["p50_ms"] else 0
+        print(f"{nome:45s} {anterior['p50_ms']:10.2f} {r['p50_ms']:11.2f} {variacao:+6.0f}% "
+              f"{anterior['p95_ms']:10.2f} {r['p95_ms']:11.2f} "
+              f"{anterior['consultas_media']:5.1f}->{r['consultas_media']:<5.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--banco", help="banco de origem (copiado antes da execução); sem ele um é gerado")
+    parser.add_argument("--escala", default="pequena", help="escala do banco gerado (ver gerar_dados.py)")
+    parser.add_argument("--repeticoes", type=int, default=30)
+    parser.add_argument("--repeticoes-pesadas", type=int, default=3, help="para dashboard, matriz completa, exportação e importação")
+    parser.add_argument("--filtro", help="mede só os endpoints cujo nome contém este texto")
+    parser.add_argument("--saida", help="arquivo JSON de saída (padrão: benchmarks/resultados/<commit>_<data>.json)")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"), help="compara dois resultados salvos")
+    args = parser.parse_args()
+
+    if args.comparar:
+        comparar(*args.comparar)
+        return
+
+    pasta = tempfile.mkdtemp(prefix="bench_endpoints_")
+    copia = os.path.join(pasta, "bench.db")
+    try:
+        if args.banco:
+            shutil.copy(args.banco, copia)
+        else:
+            print(f"Gerando banco (escala {args.escala})...")
+            subprocess.run([sys.executable, os.path.join(RAIZ, "benchmarks", "gerar_dados.py"), copia,
+                            "--escala", args.escala], check=True)
+        resultado = rodar(copia, args.repeticoes, args.repeticoes_pesadas, args.filtro)
+    finally:
+        shutil.rmtree(pasta, ignore_errors=True)
+
+    saida = args.saida
+    if not saida:
+        os.makedirs(PASTA_RESULTADOS, exist_ok=True)
+        saida = os.path.join(PASTA_RESULTADOS, f"{resultado['commit']}_{datetime.now():%Y%m%d-%H%M%S}.json")
+    with open(saida, "w", encoding="utf-8") as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    print(f"Resultado salvo em {saida}")
+
+if __name__ == "__main__":
+    main()
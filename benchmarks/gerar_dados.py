@@ -0,0 +1,207 @@
+"""Gera um banco SQLite sintético e determinístico para benchmarks.
+
+Cada turma recebe um conjunto fixo de disciplinas e todos os seus alunos são
+matriculados nelas. Em cada dia letivo (dias úteis a partir de --inicio) cada turma
+tem --aulas-por-dia sessões, alternando entre as suas disciplinas, e todos os alunos
+da turma recebem um registro de frequência. A mesma --semente gera sempre o mesmo banco.
+
+    python benchmarks/gerar_dados.py /tmp/bench.db --escala grande
+
+A escala grande (500 turmas, 100 mil alunos, 200 disciplinas, 200 dias letivos)
+produz cerca de 20 milhões de frequências. As linhas são gravadas com executemany
+direto no driver, sem os índices de frequencias, que são recriados no final junto
+com os contadores.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+
+ESCALAS = {
+    "pequena": {"turmas": 10, "alunos": 400, "disciplinas": 20, "dias": 40},
+    "media": {"turmas": 100, "alunos": 10000, "disciplinas": 50, "dias": 100},
+    "grande": {"turmas": 500, "alunos": 100000, "disciplinas": 200, "dias": 200},
+}
+
+NOMES = ["Ana", "Bruno", "Carla", "Daniel", "Eduarda", "Felipe", "Gabriela", "Henrique",
+         "Isabela", "João", "Larissa", "Lucas", "Mariana", "Natália", "Otávio", "Paula",
+         "Rafael", "Sofia", "Thiago", "Vitória"]
+SOBRENOMES = ["Silva", "Santos", "Oliveira", "Souza", "Lima", "Pereira", "Costa", "Ferreira",
+              "Almeida", "Rodrigues", "Carvalho", "Gomes", "Martins", "Araújo", "Barbosa", "Ribeiro"]
+PERIODOS = ["Manhã", "Tarde", "Noite"]
+CARGAS = [40, 60, 80, 120]
+
+# Linhas por transação ao gravar sessões e frequências
+LOTE = 500_000
+
+def _data_sql(valor: datetime) -> str:
+    # Mesmo formato que o tipo DateTime do SQLAlchemy grava no SQLite
+    return valor.strftime("%Y-%m-%d %H:%M:%S.%f")
+
+def dias_letivos(inicio: date, dias: int):
+    atual = inicio
+    while dias > 0:
+        if atual.weekday() < 5:
+            yield atual
+            dias -= 1
+        atual += timedelta(days=1)
+
+def gerar(caminho: str, turmas: int, alunos: int, disciplinas: int, dias: int,
+          aulas_por_dia: int = 1, disciplinas_por_turma: int = 10, inicio: date = date(2024, 2, 5),
+          semente: int = 42, verbose: bool = False):
+    from sqlalchemy import create_engine, event, text
+    from sqlalchemy.orm import Session
+    from app.database import Frequencia, configurar_conexao_sqlite
+    from app.migrations import aplicar_migracoes
+    from app.services.frequencia_service import FrequenciaService
+    from app.services.sincronizacao import preencher_registro
+
+    if os.path.exists(caminho):
+        raise ValueError(f"{caminho} já existe: o gerador só preenche bancos novos")
+    if turmas < 1 or alunos < turmas or disciplinas < 1:
+        raise ValueError("São necessários ao menos uma turma, uma disciplina e um aluno por turma")
+    disciplinas_por_turma = min(disciplinas_por_turma, disciplinas)
+
+    def etapa(mensagem):
+        if verbose:
+            print(f"[{time.perf_counter() - comeco:7.1f}s] {mensagem}")
+
+    comeco = time.perf_counter()
+    rng = random.Random(semente)
+    engine = create_engine(f"sqlite:///{caminho}")
+    event.listen(engine, "connect", configurar_conexao_sqlite)
+    aplicar_migracoes(engine)
+
+    with engine.begin() as conn:
+        conn.exec_driver_sql("PRAGMA synchronous=OFF")
+        conn.exec_driver_sql(
+            "INSERT INTO turmas (id, nome, ano, periodo) VALUES (?, ?, ?, ?)",
+            [(t, f"Turma {t:04d}", inicio.year, PERIODOS[t % len(PERIODOS)]) for t in range(1, turmas + 1)]
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO disciplinas (id, nome, codigo, carga_horaria, professor) VALUES (?, ?, ?, ?, ?)",
+            [(d, f"Disciplina {d:03d}", f"D{d:03d}", rng.choice(CARGAS),
+              f"Prof. {rng.choice(NOMES)} {rng.choice(SOBRENOMES)}") for d in range(1, disciplinas + 1)]
+        )
+        grade = {t: rng.sample(range(1, disciplinas + 1), disciplinas_por_turma) for t in range(1, turmas + 1)}
+
+        # Alunos em blocos contíguos por turma; cada um com sua taxa de presença
+        # (cerca de 10% abaixo de 75%, para os relatórios de risco terem o que mostrar)
+        alunos_turma = {t: [] for t in grade}
+        linhas, matriculas, taxas = [], [], {}
+        for a in range(1, alunos + 1):
+            turma_id = (a - 1) * turmas // alunos + 1
+            alunos_turma[turma_id].append(a)
+            nome = f"{rng.choice(NOMES)} {rng.choice(SOBRENOMES)} {rng.choice(SOBRENOMES)}"
+            linhas.append((a, nome, f"{inicio.year}{a:07d}", f"aluno{a}@escola.edu.br", turma_id))
+            matriculas.extend((a, d) for d in grade[turma_id])
+            taxas[a] = rng.uniform(0.55, 0.75) if rng.random() < 0.1 else rng.uniform(0.8, 0.99)
+        conn.exec_driver_sql(
+            "INSERT INTO alunos (id, nome, matricula, email, turma_id) VALUES (?, ?, ?, ?, ?)", linhas
+        )
+        conn.exec_driver_sql("INSERT INTO aluno_disciplina (aluno_id, disciplina_id) VALUES (?, ?)", matriculas)
+    etapa(f"{turmas} turmas, {disciplinas} disciplinas, {alunos} alunos, {len(matriculas)} matrículas")
+    del linhas, matriculas
+
+    # Sem os índices de frequencias durante a carga: recriá-los no final é bem mais
+    # rápido que mantê-los linha a linha
+    indices = sorted(Frequencia.__table__.indexes, key=lambda indice: indice.name)
+    with engine.begin() as conn:
+        for indice in indices:
+            conn.exec_driver_sql(f"DROP INDEX IF EXISTS {indice.name}")
+
+    sql_sessao = "INSERT INTO sessoes (id, data, turma_id, disciplina_id, descricao) VALUES (?, ?, ?, ?, ?)"
+    sql_frequencia = ("INSERT INTO frequencias (id, aluno_id, sessao_id, presente, justificado, observacao, data_registro) "
+                      "VALUES (?, ?, ?, ?, ?, ?, ?)")
+    sessoes, frequencias = [], []
+    sessao_id = frequencia_id = 0
+    aleatorio = rng.random
+
+    def gravar():
+        with engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA synchronous=OFF")
+            conn.exec_driver_sql(sql_sessao, sessoes)
+            conn.exec_driver_sql(sql_frequencia, frequencias)
+        sessoes.clear()
+        frequencias.clear()
+
+    for numero_dia, dia in enumerate(dias_letivos(inicio, dias)):
+        for t, lista in grade.items():
+            for aula in range(aulas_por_dia):
+                sessao_id += 1
+                disciplina_id = lista[(numero_dia * aulas_por_dia + aula) % len(lista)]
+                horario = datetime.combine(dia, datetime.min.time()) + timedelta(hours=7, minutes=30 + 50 * aula)
+                texto_horario = _data_sql(horario)
+                sessoes.append((sessao_id, texto_horario, t, disciplina_id, f"Aula {numero_dia + 1}"))
+                for aluno_id in alunos_turma[t]:
+                    frequencia_id += 1
+                    # Um sorteio por registro: abaixo da taxa é presença; no último
+                    # terço das faltas, falta justificada
+                    sorteio = aleatorio()
+                    taxa = taxas[aluno_id]
+                    presente = sorteio < taxa
+                    justificado = not presente and sorteio > taxa + (1 - taxa) * 0.7
+                    frequencias.append((frequencia_id, aluno_id, sessao_id, presente, justificado,
+                                        "Atestado médico" if justificado else None, texto_horario))
+        if len(frequencias) >= LOTE:
+            gravar()
+            etapa(f"dia {numero_dia + 1}/{dias}: {sessao_id} sessões, {frequencia_id} frequências")
+    if sessoes:
+        gravar()
+    etapa(f"{sessao_id} sessões, {frequencia_id} frequências")
+
+    with engine.begin() as conn:
+        for indice in indices:
+            indice.create(conn)
+        conn.execute(text("ANALYZE"))
+        preencher_registro(conn)
+    etapa("Índices recriados")
+
+    db = Session(bind=engine)
+    try:
+        contadores = FrequenciaService.reconstruir_contadores(db)
+    finally:
+        db.close()
+    engine.dispose()
+    etapa(f"Contadores: {contadores['alunos']} alunos, {contadores['alunos_disciplinas']} pares aluno/disciplina, {contadores['sessoes']} sessões")
+    return {
+        "turmas": turmas,
+        "disciplinas": disciplinas,
+        "alunos": alunos,
+        "sessoes": sessao_id,
+        "frequencias": frequencia_id,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("caminho", help="arquivo SQLite a criar (não pode existir)")
+    parser.add_argument("--escala", choices=ESCALAS, default="pequena")
+    parser.add_argument("--turmas", type=int)
+    parser.add_argument("--alunos", type=int)
+    parser.add_argument("--disciplinas", type=int)
+    parser.add_argument("--dias", type=int, help="dias letivos (dias úteis)")
+    parser.add_argument("--aulas-por-dia", type=int, default=1, help="sessões por turma em cada dia letivo")
+    parser.add_argument("--disciplinas-por-turma", type=int, default=10)
+    parser.add_argument("--inicio", type=date.fromisoformat, default=date(2024, 2, 5), help="primeiro dia (AAAA-MM-DD)")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    escala = dict(ESCALAS[args.escala])
+    for chave in escala:
+        if getattr(args, chave) is not None:
+            escala[chave] = getattr(args, chave)
+    try:
+        resumo = gerar(args.caminho, aulas_por_dia=args.aulas_por_dia, disciplinas_por_turma=args.disciplinas_por_turma,
+                       inicio=args.inicio, semente=args.semente, verbose=True, **escala)
+    except ValueError as e:
+        parser.error(str(e))
+    print("Banco gerado: " + ", ".join(f"{valor} {chave}" for chave, valor in resumo.items()))
+
+if __name__ == "__main__":
+    main()
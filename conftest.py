@@ -0,0 +1,71 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.database import configurar_conexao_sqlite, get_db
+from app.migrations import aplicar_migracoes
+from app.routes.api import router
+from app.schemas import TurmaCreate, DisciplinaCreate, AlunoCreate, SessaoCreate
+from app.services.cache import cache_relatorios
+from app.services.frequencia_service import FrequenciaService
+
+# Cada teste usa um banco próprio em tmp_path: os índices e caches em memória do
+# serviço são separados por arquivo de banco, então nada vaza entre testes.
+
+def criar_engine(caminho):
+    engine = create_engine(f"sqlite:///{caminho}", connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", configurar_conexao_sqlite)
+    return engine
+
+@pytest.fixture(autouse=True)
+def cache_vazio():
+    # O cache é do processo e a chave usa id() do engine, que pode se repetir
+    # entre testes
+    cache_relatorios.limpar()
+
+@pytest.fixture
+def banco(tmp_path):
+    engine = criar_engine(tmp_path / "frequencia.db")
+    aplicar_migracoes(engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+def cliente_api(banco, rotas):
+    # TestClient das rotas com get_db trocado pelo banco do teste
+    app = FastAPI()
+    app.include_router(rotas, prefix="/api/v1")
+
+    def db_teste():
+        db = banco()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = db_teste
+    return TestClient(app)
+
+@pytest.fixture
+def cliente(banco):
+    return cliente_api(banco, router)
+
+@pytest.fixture
+def cadastro(banco):
+    # Uma turma, uma disciplina com três alunos matriculados e uma sessão
+    db = banco()
+    try:
+        turma = FrequenciaService.criar_turma(db, TurmaCreate(nome="1A", ano=2026, periodo="Manhã"))
+        disciplina = FrequenciaService.criar_disciplina(db, DisciplinaCreate(
+            nome="Matemática", codigo="MAT1", carga_horaria=60, professor="Ana"
+        ))
+        alunos = [
+            FrequenciaService.criar_aluno(db, AlunoCreate(
+                nome=f"Aluno {n}", matricula=f"M{n}", turma_id=turma.id, disciplina_ids=[disciplina.id]
+            )).id
+            for n in range(3)
+        ]
+        sessao = FrequenciaService.criar_sessao(db, SessaoCreate(turma_id=turma.id, disciplina_id=disciplina.id))
+        return {"turma_id": turma.id, "disciplina_id": disciplina.id, "alunos": alunos, "sessao_id": sessao.id}
+    finally:
+        db.close()
@@ -2,7 +2,7 @@ import requests
 import json
 from datetime import datetime
 
-BASE_URL = "http://127.0.0.1:8001/api/v1"
+BASE_URL = "http://127.0.0.1:8002/api/v1"
 
 def popular_dados_demo():
     print("🎓 Populando Sistema com Dados de Demonstração")
@@ -12,9 +12,9 @@ def popular_dados_demo():
         # 1. Criar turmas
         print("\n1. Criando turmas...")
         turmas_data = [
-            {"nome": "3º Ano A", "ano": 2024},
-            {"nome": "2º Ano B", "ano": 2024},
-            {"nome": "1º Ano C", "ano": 2024}
+            {"nome": "3º Ano A", "ano": 2024, "periodo": "Manhã"},
+            {"nome": "2º Ano B", "ano": 2024, "periodo": "Tarde"},
+            {"nome": "1º Ano C", "ano": 2024, "periodo": "Noite"}
         ]
         
         turmas_ids = []
@@ -24,37 +24,55 @@ def popular_dados_demo():
             turmas_ids.append(turma["id"])
             print(f"✅ Turma criada: {turma['nome']} (ID: {turma['id']})")
         
-        # 2. Cadastrar alunos para primeira turma
-        print(f"\n2. Cadastrando alunos na turma {turmas_ids[0]}...")
+        # 2. Criar disciplinas
+        print("\n2. Criando disciplinas...")
+        disciplinas_data = [
+            {"nome": "Matemática", "codigo": "MAT01", "carga_horaria": 80, "professor": "Prof. Roberto"},
+            {"nome": "Português", "codigo": "POR01", "carga_horaria": 80, "professor": "Prof. Helena"},
+            {"nome": "História", "codigo": "HIS01", "carga_horaria": 40, "professor": "Prof. Marcos"},
+            {"nome": "Geografia", "codigo": "GEO01", "carga_horaria": 40, "professor": "Prof. Carla"},
+            {"nome": "Ciências", "codigo": "CIE01", "carga_horaria": 60, "professor": "Prof. Sérgio"}
+        ]
+        
+        disciplinas = []
+        for disciplina_data in disciplinas_data:
+            response = requests.post(f"{BASE_URL}/disciplinas/", json=disciplina_data)
+            disciplina = response.json()
+            disciplinas.append(disciplina)
+            print(f"✅ Disciplina criada: {disciplina['nome']} (ID: {disciplina['id']})")
+        disciplinas_ids = [disciplina["id"] for disciplina in disciplinas]
+        
+        # 3. Cadastrar alunos para primeira turma, matriculados em todas as disciplinas
+        print(f"\n3. Cadastrando alunos na turma {turmas_ids[0]}...")
         alunos_data = [
-            {"nome": "Ana Silva", "matricula": "2024001", "turma_id": turmas_ids[0]},
-            {"nome": "Bruno Santos", "matricula": "2024002", "turma_id": turmas_ids[0]},
-            {"nome": "Carlos Oliveira", "matricula": "2024003", "turma_id": turmas_ids[0]},
-            {"nome": "Diana Costa", "matricula": "2024004", "turma_id": turmas_ids[0]},
-            {"nome": "Eduardo Lima", "matricula": "2024005", "turma_id": turmas_ids[0]}
+            {"nome": "Ana Silva", "matricula": "2024001"},
+            {"nome": "Bruno Santos", "matricula": "2024002"},
+            {"nome": "Carlos Oliveira", "matricula": "2024003"},
+            {"nome": "Diana Costa", "matricula": "2024004"},
+            {"nome": "Eduardo Lima", "matricula": "2024005"}
         ]
         
         alunos_ids = []
         for aluno_data in alunos_data:
+            aluno_data = {**aluno_data, "turma_id": turmas_ids[0], "disciplina_ids": disciplinas_ids}
             response = requests.post(f"{BASE_URL}/alunos/", json=aluno_data)
             aluno = response.json()
             alunos_ids.append(aluno["id"])
             print(f"✅ Aluno cadastrado: {aluno['nome']} (ID: {aluno['id']})")
         
-        # 3. Criar sessões de aula
-        print(f"\n3. Criando sessões para turma {turmas_ids[0]}...")
-        disciplinas = ["Matemática", "Português", "História", "Geografia", "Ciências"]
+        # 4. Criar sessões de aula
+        print(f"\n4. Criando sessões para turma {turmas_ids[0]}...")
         sessoes_ids = []
         
         for disciplina in disciplinas:
-            sessao_data = {"disciplina": disciplina, "turma_id": turmas_ids[0]}
+            sessao_data = {"turma_id": turmas_ids[0], "disciplina_id": disciplina["id"], "descricao": "Aula inaugural"}
             response = requests.post(f"{BASE_URL}/sessoes/", json=sessao_data)
             sessao = response.json()
             sessoes_ids.append(sessao["id"])
-            print(f"✅ Sessão criada: {sessao['disciplina']} (ID: {sessao['id']})")
+            print(f"✅ Sessão criada: {disciplina['nome']} (ID: {sessao['id']})")
         
-        # 4. Marcar frequências variadas
-        print("\n4. Marcando frequências...")
+        # 5. Marcar frequências variadas
+        print("\n5. Marcando frequências...")
         import random
         
         for i, sessao_id in enumerate(sessoes_ids):
@@ -85,10 +103,10 @@ def popular_dados_demo():
                 "sessao_id": sessao_id,
                 "frequencias": frequencias
             })
-            print(f"✅ Frequências marcadas para {disciplinas[i]}")
+            print(f"✅ Frequências marcadas para {disciplinas[i]['nome']}")
         
         print("\n🎉 Dados de demonstração criados com sucesso!")
-        print(f"🌐 Acesse: http://127.0.0.1:8000")
+        print(f"🌐 Acesse: http://127.0.0.1:8002")
         print(f"📊 Selecione a turma '{turmas_data[0]['nome']}' para ver os dados")
         
     except requests.exceptions.ConnectionError:
@@ -2,7 +2,7 @@ import requests
 import json
 from datetime import datetime
 
-BASE_URL = "http://localhost:8000/api/v1"
+BASE_URL = "http://localhost:8002/api/v1"
 
 def exemplo_completo():
     print("🎓 Sistema de Frequência Escolar - Exemplo de Uso")
@@ -10,18 +10,26 @@ def exemplo_completo():
     
     # 1. Criar turma
     print("\n1. Criando turma...")
-    turma_data = {"nome": "3º Ano A", "ano": 2024}
+    turma_data = {"nome": "3º Ano A", "ano": 2024, "periodo": "Manhã"}
     response = requests.post(f"{BASE_URL}/turmas/", json=turma_data)
     turma = response.json()
     turma_id = turma["id"]
     print(f"✅ Turma criada: {turma['nome']} (ID: {turma_id})")
     
-    # 2. Cadastrar alunos
-    print("\n2. Cadastrando alunos...")
+    # 2. Criar disciplina
+    print("\n2. Criando disciplina...")
+    disciplina_data = {"nome": "Matemática", "codigo": "MAT01", "carga_horaria": 80, "professor": "Prof. Roberto"}
+    response = requests.post(f"{BASE_URL}/disciplinas/", json=disciplina_data)
+    disciplina = response.json()
+    disciplina_id = disciplina["id"]
+    print(f"✅ Disciplina criada: {disciplina['nome']} (ID: {disciplina_id})")
+    
+    # 3. Cadastrar alunos já matriculados na disciplina
+    print("\n3. Cadastrando alunos...")
     alunos = [
-        {"nome": "João Silva", "matricula": "2024001", "turma_id": turma_id},
-        {"nome": "Maria Santos", "matricula": "2024002", "turma_id": turma_id},
-        {"nome": "Pedro Costa", "matricula": "2024003", "turma_id": turma_id}
+        {"nome": "João Silva", "matricula": "2024001", "turma_id": turma_id, "disciplina_ids": [disciplina_id]},
+        {"nome": "Maria Santos", "matricula": "2024002", "turma_id": turma_id, "disciplina_ids": [disciplina_id]},
+        {"nome": "Pedro Costa", "matricula": "2024003", "turma_id": turma_id, "disciplina_ids": [disciplina_id]}
     ]
     
     alunos_ids = []
@@ -31,16 +39,16 @@ def exemplo_completo():
         alunos_ids.append(aluno["id"])
         print(f"✅ Aluno cadastrado: {aluno['nome']} (ID: {aluno['id']})")
     
-    # 3. Criar sessão de aula
-    print("\n3. Criando sessão de aula...")
-    sessao_data = {"disciplina": "Matemática", "turma_id": turma_id}
+    # 4. Criar sessão de aula
+    print("\n4. Criando sessão de aula...")
+    sessao_data = {"turma_id": turma_id, "disciplina_id": disciplina_id}
     response = requests.post(f"{BASE_URL}/sessoes/", json=sessao_data)
     sessao = response.json()
     sessao_id = sessao["id"]
-    print(f"✅ Sessão criada: {sessao['disciplina']} (ID: {sessao_id})")
+    print(f"✅ Sessão criada: {disciplina['nome']} (ID: {sessao_id})")
     
-    # 4. Marcar frequências em lote
-    print("\n4. Marcando frequências...")
+    # 5. Marcar frequências em lote
+    print("\n5. Marcando frequências...")
     frequencias_data = {
         "sessao_id": sessao_id,
         "frequencias": [
@@ -52,8 +60,8 @@ def exemplo_completo():
     response = requests.post(f"{BASE_URL}/frequencias/lote/", json=frequencias_data)
     print(f"✅ {response.json()['message']}")
     
-    # 5. Gerar relatório da turma
-    print("\n5. Relatório da turma:")
+    # 6. Gerar relatório da turma
+    print("\n6. Relatório da turma:")
     response = requests.get(f"{BASE_URL}/relatorio/turma/{turma_id}")
     relatorio = response.json()
     
@@ -61,8 +69,8 @@ def exemplo_completo():
         status = "🟢" if aluno["percentual_presenca"] >= 75 else "🔴"
         print(f"{status} {aluno['nome']}: {aluno['percentual_presenca']}% presença")
     
-    # 6. Exportar CSV
-    print("\n6. Exportando relatório CSV...")
+    # 7. Exportar CSV
+    print("\n7. Exportando relatório CSV...")
     response = requests.get(f"{BASE_URL}/exportar/turma/{turma_id}")
     if response.status_code == 200:
         print("✅ Arquivo CSV exportado com sucesso!")
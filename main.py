@@ -1,12 +1,42 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.routes.api import router
-from app.database import Base, engine
+from app import config
+from app.migrations import aplicar_migracoes
+from app.database import SessionLocal
+from app.services.coalescer import agrupador_escritas
+from app.services.matriculas import indice_matriculas
+from app.services.analitico import motores_analiticos, disponivel as analitico_disponivel
+from app.services.metricas import metricas, MiddlewareMetricas, TIPO_CONTEUDO
+from app.services.eventos import MiddlewareEventos
 
-app = FastAPI(title="Sistema de Frequência Escolar", version="1.0.0")
+if config.ANALITICO and not analitico_disponivel():
+    raise RuntimeError("FREQUENCIA_ANALITICO=1 requer numpy (pip install numpy)")
+
+if config.USAR_ASYNC:
+    from app.routes.api_async import router
+else:
+    from app.routes.api import router
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Carregar o índice de matrículas antes da primeira marcação e, se ligado,
+    # o motor analítico antes do primeiro relatório
+    db = SessionLocal()
+    try:
+        indice_matriculas.para(db)
+        motores_analiticos.para(db)
+    finally:
+        db.close()
+    if config.AGRUPAR_ESCRITAS:
+        agrupador_escritas.iniciar()
+    yield
+    agrupador_escritas.parar()
+
+app = FastAPI(title="Sistema de Frequência Escolar", version="1.0.0", lifespan=lifespan)
 
 # Configurar CORS
 app.add_middleware(
@@ -17,7 +47,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-Base.metadata.create_all(bind=engine)
+# Registrado por último para ficar por fora de todos os outros e medir a requisição inteira
+if config.METRICAS:
+    app.add_middleware(MiddlewareMetricas)
+
+# /api/v1/eventos (Server-Sent Events) fica por fora até das métricas
+app.add_middleware(MiddlewareEventos)
+
+aplicar_migracoes()
 
 # Configurar arquivos estáticos e templates
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -27,12 +64,17 @@ app.include_router(router, prefix="/api/v1")
 
 @app.get("/", response_class=HTMLResponse)
 def root(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+    return templates.TemplateResponse(request, "index.html")
 
 @app.get("/api")
 def api_info():
     return {"message": "Sistema de Frequência Escolar - API funcionando!", "docs": "/docs"}
 
+if config.METRICAS:
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(metricas.prometheus(), media_type=TIPO_CONTEUDO)
+
 @app.get("/favicon.ico")
 def favicon():
     return FileResponse("static/favicon.ico")
@@ -0,0 +1,116 @@
+import argparse
+from datetime import date
+from app.database import engine
+from app.migrations import aplicar_migracoes, versao_banco, VERSAO_ATUAL
+
+def cmd_migrar(args):
+    versao = aplicar_migracoes(engine, verbose=True)
+    print(f"Esquema na versão {versao}")
+
+def cmd_versao(args):
+    with engine.connect() as conn:
+        print(f"Banco: versão {versao_banco(conn)} (última disponível: {VERSAO_ATUAL})")
+
+def cmd_explicar(args):
+    from app.explain import explicar_consultas
+    aplicar_migracoes(engine)
+    explicar_consultas(engine)
+
+def cmd_recontar(args):
+    from app.database import SessionLocal
+    from app.services.frequencia_service import FrequenciaService
+    aplicar_migracoes(engine)
+    db = SessionLocal()
+    try:
+        resultado = FrequenciaService.reconstruir_contadores(db)
+    finally:
+        db.close()
+    print(f"Contadores reconstruídos: {resultado['alunos']} alunos, {resultado['alunos_disciplinas']} pares aluno/disciplina, {resultado['sessoes']} sessões")
+
+def cmd_arquivar(args):
+    from app.database import SessionLocal
+    from app.services.frequencia_service import FrequenciaService
+    aplicar_migracoes(engine)
+    db = SessionLocal()
+    try:
+        resultado = FrequenciaService.arquivar_ano(db, args.ano)
+    except ValueError as erro:
+        raise SystemExit(str(erro))
+    finally:
+        db.close()
+    print(f"Ano {resultado['ano']} arquivado em {resultado['arquivo']}: "
+          f"{resultado['sessoes']} sessões, {resultado['frequencias']} registros")
+    if args.vacuum:
+        # Devolve ao sistema o espaço das linhas apagadas (fora de transação)
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql("VACUUM")
+        print("VACUUM concluído")
+
+def cmd_exportar(args):
+    from app.database import SessionLocal
+    from app.services import colunar
+    if not colunar.disponivel():
+        raise SystemExit("pyarrow não está instalado")
+    aplicar_migracoes(engine)
+    db = SessionLocal()
+    try:
+        resultado = colunar.exportar_pasta(db, args.destino, args.tabelas or colunar.TABELAS, args.formato,
+                                           inicio=args.inicio, fim=args.fim)
+    except ValueError as erro:
+        raise SystemExit(str(erro))
+    finally:
+        db.close()
+    for tabela, totais in resultado.items():
+        print(f"{tabela}: {totais['linhas']} linhas em {totais['particoes']} partições")
+
+def cmd_importar(args):
+    from app.database import SessionLocal
+    from app.services.frequencia_service import FrequenciaService
+    from app.services.importacao import ler_alunos, detectar_formato
+    aplicar_migracoes(engine)
+    db = SessionLocal()
+    try:
+        with open(args.arquivo, "rb") as arquivo:
+            registros = ler_alunos(arquivo, args.formato or detectar_formato(args.arquivo))
+            resultado = FrequenciaService.importar_alunos(db, registros, tamanho_lote=args.lote)
+    finally:
+        db.close()
+    print(f"Importados: {resultado['alunos']} alunos, {resultado['matriculas']} matrículas, "
+          f"{resultado['turmas_criadas']} turmas novas, {len(resultado['erros'])} linhas com erro")
+    for erro in resultado["erros"][:20]:
+        print(f"  linha {erro['linha']}: {erro['erro']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Comandos de manutenção do Sistema de Frequência")
+    comandos = parser.add_subparsers(dest="comando", required=True)
+
+    comandos.add_parser("migrar", help="Aplica as migrações pendentes no banco").set_defaults(func=cmd_migrar)
+    comandos.add_parser("versao", help="Mostra a versão do esquema do banco").set_defaults(func=cmd_versao)
+    comandos.add_parser("recontar", help="Recalcula do zero os contadores de frequência").set_defaults(func=cmd_recontar)
+    comandos.add_parser("explicar", help="Mostra o EXPLAIN QUERY PLAN de todas as consultas do serviço").set_defaults(func=cmd_explicar)
+
+    arquivar = comandos.add_parser("arquivar", help="Move as sessões e frequências de um ano encerrado para data/arquivo/")
+    arquivar.add_argument("ano", type=int)
+    arquivar.add_argument("--vacuum", action="store_true", help="compacta o banco principal depois")
+    arquivar.set_defaults(func=cmd_arquivar)
+
+    exportar = comandos.add_parser("exportar", help="Exporta frequências e relatórios em Parquet/Arrow, particionados por mês")
+    exportar.add_argument("destino", help="pasta de saída (<destino>/<tabela>/mes=AAAA-MM/...)")
+    exportar.add_argument("--tabelas", nargs="+", choices=["frequencias", "sessoes", "alunos_disciplinas"],
+                          help="padrão: todas")
+    exportar.add_argument("--formato", choices=["parquet", "arrow"], default="parquet")
+    exportar.add_argument("--inicio", type=date.fromisoformat, help="AAAA-MM-DD, inclusivo")
+    exportar.add_argument("--fim", type=date.fromisoformat, help="AAAA-MM-DD, inclusivo")
+    exportar.set_defaults(func=cmd_exportar)
+
+    importar = comandos.add_parser("importar", help="Importa alunos e matrículas de um arquivo CSV ou JSONL")
+    importar.add_argument("arquivo")
+    importar.add_argument("--formato", choices=["csv", "jsonl"], help="padrão: pela extensão do arquivo")
+    importar.add_argument("--lote", type=int, default=5000, help="linhas por transação")
+    importar.set_defaults(func=cmd_importar)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ class FrequenciaApp {
         this.baseURL = window.location.origin + '/api/v1';
         this.currentAluno = null;
         this.currentDisciplina = null;
+        // Respostas GET guardadas por URL junto com o ETag, para revalidação (304)
+        this.respostas = new Map();
         this.init();
     }
 
@@ -44,19 +46,31 @@ class FrequenciaApp {
 
     async request(url, options = {}) {
         try {
+            const leitura = !options.method || options.method === 'GET';
+            const guardada = leitura ? this.respostas.get(url) : null;
             const response = await fetch(`${this.baseURL}${url}`, {
+                ...options,
                 headers: {
                     'Content-Type': 'application/json',
+                    ...(guardada ? { 'If-None-Match': guardada.etag } : {}),
                     ...options.headers
-                },
-                ...options
+                }
             });
             
+            if (response.status === 304 && guardada) {
+                return guardada.dados;
+            }
+            
             if (!response.ok) {
                 throw new Error(`HTTP error! status: ${response.status}`);
             }
             
-            return await response.json();
+            const dados = await response.json();
+            const etag = response.headers.get('ETag');
+            if (leitura && etag) {
+                this.respostas.set(url, { etag, dados });
+            }
+            return dados;
         } catch (error) {
             this.showAlert(`Erro: ${error.message}`, 'error');
             throw error;
@@ -156,7 +170,7 @@ class FrequenciaApp {
 
     async loadTurmas() {
         try {
-            const turmas = await this.request('/turmas/');
+            const turmas = await this.request('/turmas/?fields=id,nome,ano,periodo');
             const select = document.getElementById('alunoTurma');
             
             select.innerHTML = '<option value="">Selecione uma turma</option>';
@@ -170,7 +184,7 @@ class FrequenciaApp {
 
     async loadDisciplinas() {
         try {
-            const disciplinas = await this.request('/disciplinas/');
+            const disciplinas = await this.request('/disciplinas/?fields=id,nome,codigo,professor');
             
             // Atualizar select de matrícula
             const selectMatricula = document.getElementById('matriculaDisciplina');
@@ -192,13 +206,26 @@ class FrequenciaApp {
 
     async loadAlunos() {
         try {
-            const turmas = await this.request('/turmas/');
+            const turmas = await this.request('/turmas/?fields=id,nome,ano');
             const select = document.getElementById('matriculaAluno');
             
             select.innerHTML = '<option value="">Selecione um aluno</option>';
             
+            // Todos os alunos em páginas de 1000, agrupados por turma no cliente
+            const alunosPorTurma = {};
+            let cursor = null;
+            do {
+                const pagina = await this.request(
+                    `/alunos/?fields=id,nome,matricula,turma_id&limit=1000${cursor ? `&cursor=${cursor}` : ''}`
+                );
+                pagina.itens.forEach(aluno => {
+                    (alunosPorTurma[aluno.turma_id] = alunosPorTurma[aluno.turma_id] || []).push(aluno);
+                });
+                cursor = pagina.proximo_cursor;
+            } while (cursor);
+            
             for (const turma of turmas) {
-                const alunos = await this.request(`/turmas/${turma.id}/alunos/`);
+                const alunos = alunosPorTurma[turma.id] || [];
                 if (alunos.length > 0) {
                     const optgroup = document.createElement('optgroup');
                     optgroup.label = `${turma.nome} - ${turma.ano}`;
@@ -222,7 +249,7 @@ class FrequenciaApp {
         if (!this.currentDisciplina) return;
 
         try {
-            const alunos = await this.request(`/disciplinas/${this.currentDisciplina}/alunos/`);
+            const alunos = await this.request(`/disciplinas/${this.currentDisciplina}/alunos/?fields=id,nome,matricula`);
             const select = document.getElementById('frequenciaAluno');
             
             select.innerHTML = '<option value="">Selecione um aluno</option>';
@@ -243,7 +270,7 @@ class FrequenciaApp {
 
         try {
             // Buscar informações do aluno
-            const alunos = await this.request(`/disciplinas/${this.currentDisciplina}/alunos/`);
+            const alunos = await this.request(`/disciplinas/${this.currentDisciplina}/alunos/?fields=id,nome,matricula`);
             const aluno = alunos.find(a => a.id == this.currentAluno);
             
             if (!aluno) return;
@@ -333,10 +360,9 @@ class FrequenciaApp {
 
     async atualizarRelatorio() {
         try {
-            const turmas = await this.request('/turmas/');
-            const disciplinas = await this.request('/disciplinas/');
+            const dashboard = await this.request('/dashboard');
             
-            if (turmas.length === 0 || disciplinas.length === 0) {
+            if (dashboard.totais.turmas === 0 || dashboard.totais.disciplinas === 0) {
                 document.getElementById('relatorioContainer').innerHTML = `
                     <div class="empty-state">
                         <div class="empty-state-icon">📊</div>
@@ -347,64 +373,51 @@ class FrequenciaApp {
                 return;
             }
             
-            await this.gerarRelatorioGeral();
+            await this.gerarRelatorioGeral(dashboard);
             this.showAlert('Relatório atualizado!', 'success');
         } catch (error) {
             console.error('Erro ao atualizar relatório:', error);
         }
     }
     
-    async gerarRelatorioGeral() {
+    async gerarRelatorioGeral(dashboard, matriz) {
         try {
-            const turmas = await this.request('/turmas/');
-            const disciplinas = await this.request('/disciplinas/');
-            
-            // Calcular estatísticas gerais
-            let totalAlunos = 0;
-            let totalPresencas = 0;
-            let totalFaltas = 0;
-            let totalJustificadas = 0;
-            
-            for (const turma of turmas) {
-                const alunos = await this.request(`/turmas/${turma.id}/alunos/`);
-                totalAlunos += alunos.length;
-                
-                for (const aluno of alunos) {
-                    try {
-                        const relatorioAluno = await this.request(`/relatorio/aluno/${aluno.id}`);
-                        totalPresencas += relatorioAluno.presencas || 0;
-                        totalFaltas += relatorioAluno.faltas || 0;
-                        totalJustificadas += relatorioAluno.faltas_justificadas || 0;
-                    } catch (e) {
-                        // Ignorar se não houver dados de frequência
-                    }
-                }
+            if (!dashboard) {
+                dashboard = await this.request('/dashboard');
+            }
+            if (!matriz) {
+                matriz = await this.request('/relatorio/matriz');
+                // Cópias: os eventos ao vivo alteram o painel, não as respostas guardadas
+                this.painel = this.indexarPainel(structuredClone(dashboard), structuredClone(matriz));
+                ({ dashboard, matriz } = this.painel);
+                this.conectarEventos();
             }
+            const { totais, turmas } = dashboard;
             
             let relatorioHTML = `
                 <div class="stats">
                     <div class="stat-card primary">
-                        <div class="stat-number">${turmas.length}</div>
+                        <div class="stat-number">${totais.turmas}</div>
                         <div class="stat-label">Turmas</div>
                     </div>
                     <div class="stat-card success">
-                        <div class="stat-number">${disciplinas.length}</div>
+                        <div class="stat-number">${totais.disciplinas}</div>
                         <div class="stat-label">Disciplinas</div>
                     </div>
                     <div class="stat-card success">
-                        <div class="stat-number">${totalAlunos}</div>
+                        <div class="stat-number">${totais.alunos}</div>
                         <div class="stat-label">Alunos</div>
                     </div>
-                    <div class="stat-card ${totalPresencas > 0 ? 'success' : 'warning'}">
-                        <div class="stat-number">${totalPresencas}</div>
+                    <div class="stat-card ${totais.presencas > 0 ? 'success' : 'warning'}">
+                        <div class="stat-number">${totais.presencas}</div>
                         <div class="stat-label">Presenças</div>
                     </div>
-                    <div class="stat-card ${totalFaltas > 0 ? 'warning' : 'success'}">
-                        <div class="stat-number">${totalFaltas}</div>
+                    <div class="stat-card ${totais.faltas > 0 ? 'warning' : 'success'}">
+                        <div class="stat-number">${totais.faltas}</div>
                         <div class="stat-label">Faltas</div>
                     </div>
-                    <div class="stat-card ${totalJustificadas > 0 ? 'warning' : 'success'}">
-                        <div class="stat-number">${totalJustificadas}</div>
+                    <div class="stat-card ${totais.faltas_justificadas > 0 ? 'warning' : 'success'}">
+                        <div class="stat-number">${totais.faltas_justificadas}</div>
                         <div class="stat-label">Justificadas</div>
                     </div>
                 </div>
@@ -413,7 +426,7 @@ class FrequenciaApp {
             `;
             
             for (const turma of turmas) {
-                const alunos = await this.request(`/turmas/${turma.id}/alunos/`);
+                const alunos = turma.alunos;
                 
                 if (alunos.length > 0) {
                     relatorioHTML += `
@@ -437,51 +450,29 @@ class FrequenciaApp {
                                 <tbody>
                     `;
                     
-                    for (const aluno of alunos) {
-                        try {
-                            const relatorioAluno = await this.request(`/relatorio/aluno/${aluno.id}`);
-                            const percentual = relatorioAluno.percentual_presenca || 0;
-                            const status = percentual >= 75 ? 'Aprovado' : percentual >= 50 ? 'Atenção' : 'Reprovado';
-                            const statusClass = percentual >= 75 ? 'success' : percentual >= 50 ? 'warning' : 'danger';
-                            const progressClass = percentual >= 75 ? 'success' : percentual >= 50 ? 'warning' : 'danger';
-                            
-                            relatorioHTML += `
-                                <tr>
-                                    <td><strong>${aluno.nome}</strong></td>
-                                    <td><span class="badge badge-success">${aluno.matricula}</span></td>
-                                    <td><span class="badge badge-success">${relatorioAluno.presencas || 0}</span></td>
-                                    <td><span class="badge badge-danger">${relatorioAluno.faltas || 0}</span></td>
-                                    <td><span class="badge badge-warning">${relatorioAluno.faltas_justificadas || 0}</span></td>
-                                    <td>${relatorioAluno.total_sessoes || 0}</td>
-                                    <td>
-                                        <div class="progress-bar">
-                                            <div class="progress-fill ${progressClass}" style="width: ${percentual}%"></div>
-                                        </div>
-                                        <small>${percentual}%</small>
-                                    </td>
-                                    <td><span class="badge badge-${statusClass}">${status}</span></td>
-                                </tr>
-                            `;
-                        } catch (e) {
-                            // Se não houver dados de frequência, mostrar zeros
-                            relatorioHTML += `
-                                <tr>
-                                    <td><strong>${aluno.nome}</strong></td>
-                                    <td><span class="badge badge-success">${aluno.matricula}</span></td>
-                                    <td><span class="badge badge-success">0</span></td>
-                                    <td><span class="badge badge-danger">0</span></td>
-                                    <td><span class="badge badge-warning">0</span></td>
-                                    <td>0</td>
-                                    <td>
-                                        <div class="progress-bar">
-                                            <div class="progress-fill" style="width: 0%"></div>
-                                        </div>
-                                        <small>0%</small>
-                                    </td>
-                                    <td><span class="badge badge-warning">Sem dados</span></td>
-                                </tr>
-                            `;
-                        }
+                    for (const relatorioAluno of alunos) {
+                        const percentual = relatorioAluno.percentual_presenca || 0;
+                        const status = percentual >= 75 ? 'Aprovado' : percentual >= 50 ? 'Atenção' : 'Reprovado';
+                        const statusClass = percentual >= 75 ? 'success' : percentual >= 50 ? 'warning' : 'danger';
+                        const progressClass = percentual >= 75 ? 'success' : percentual >= 50 ? 'warning' : 'danger';
+                        
+                        relatorioHTML += `
+                            <tr>
+                                <td><strong>${relatorioAluno.nome}</strong></td>
+                                <td><span class="badge badge-success">${relatorioAluno.matricula}</span></td>
+                                <td><span class="badge badge-success">${relatorioAluno.presencas || 0}</span></td>
+                                <td><span class="badge badge-danger">${relatorioAluno.faltas || 0}</span></td>
+                                <td><span class="badge badge-warning">${relatorioAluno.faltas_justificadas || 0}</span></td>
+                                <td>${relatorioAluno.total_sessoes || 0}</td>
+                                <td>
+                                    <div class="progress-bar">
+                                        <div class="progress-fill ${progressClass}" style="width: ${percentual}%"></div>
+                                    </div>
+                                    <small>${percentual}%</small>
+                                </td>
+                                <td><span class="badge badge-${statusClass}">${status}</span></td>
+                            </tr>
+                        `;
                     }
                     
                     relatorioHTML += `
@@ -493,6 +484,30 @@ class FrequenciaApp {
             }
             
             // Relatório por disciplina
+            const disciplinas = matriz.disciplinas.id.map((id, i) => ({
+                id,
+                nome: matriz.disciplinas.nome[i],
+                codigo: matriz.disciplinas.codigo[i],
+                professor: matriz.disciplinas.professor[i],
+                alunos: 0,
+                presencas: 0,
+                faltas: 0,
+                totalSessoes: 0,
+                alunosComDados: 0
+            }));
+            const porId = new Map(disciplinas.map(d => [d.id, d]));
+            const celulas = matriz.celulas;
+            
+            for (let i = 0; i < celulas.disciplina_id.length; i++) {
+                const disciplina = porId.get(celulas.disciplina_id[i]);
+                if (!disciplina) continue;
+                disciplina.alunos++;
+                disciplina.presencas += celulas.presencas[i];
+                disciplina.faltas += celulas.faltas[i];
+                disciplina.totalSessoes += celulas.total_sessoes[i];
+                if (celulas.total_sessoes[i] > 0) disciplina.alunosComDados++;
+            }
+            
             if (disciplinas.length > 0) {
                 relatorioHTML += `
                     <div class="card">
@@ -513,63 +528,26 @@ class FrequenciaApp {
                 `;
                 
                 for (const disciplina of disciplinas) {
-                    try {
-                        const alunosDisciplina = await this.request(`/disciplinas/${disciplina.id}/alunos/`);
-                        let totalPresencasDisciplina = 0;
-                        let totalFaltasDisciplina = 0;
-                        let totalSessoesDisciplina = 0;
-                        let alunosComDados = 0;
-                        
-                        for (const aluno of alunosDisciplina) {
-                            try {
-                                const relatorioAlunoDisciplina = await this.request(`/relatorio/aluno/${aluno.id}/disciplina/${disciplina.id}`);
-                                totalPresencasDisciplina += relatorioAlunoDisciplina.presencas || 0;
-                                totalFaltasDisciplina += relatorioAlunoDisciplina.faltas || 0;
-                                totalSessoesDisciplina += relatorioAlunoDisciplina.total_sessoes || 0;
-                                if (relatorioAlunoDisciplina.total_sessoes > 0) alunosComDados++;
-                            } catch (e) {
-                                // Ignorar alunos sem dados
-                            }
-                        }
-                        
-                        const mediaFrequencia = totalSessoesDisciplina > 0 ? 
-                            Math.round((totalPresencasDisciplina / totalSessoesDisciplina) * 100) : 0;
-                        const statusFrequencia = mediaFrequencia >= 75 ? 'success' : mediaFrequencia >= 50 ? 'warning' : 'danger';
-                        
-                        relatorioHTML += `
-                            <tr>
-                                <td><strong>${disciplina.nome}</strong><br><small>${disciplina.codigo}</small></td>
-                                <td>${disciplina.professor}</td>
-                                <td><span class="badge badge-success">${alunosDisciplina.length}</span></td>
-                                <td><span class="badge badge-primary">${Math.floor(totalSessoesDisciplina / Math.max(alunosComDados, 1))}</span></td>
-                                <td><span class="badge badge-success">${totalPresencasDisciplina}</span></td>
-                                <td><span class="badge badge-danger">${totalFaltasDisciplina}</span></td>
-                                <td>
-                                    <div class="progress-bar">
-                                        <div class="progress-fill ${statusFrequencia}" style="width: ${mediaFrequencia}%"></div>
-                                    </div>
-                                    <small>${mediaFrequencia}%</small>
-                                </td>
-                            </tr>
-                        `;
-                    } catch (e) {
-                        relatorioHTML += `
-                            <tr>
-                                <td><strong>${disciplina.nome}</strong><br><small>${disciplina.codigo}</small></td>
-                                <td>${disciplina.professor}</td>
-                                <td><span class="badge badge-warning">0</span></td>
-                                <td><span class="badge badge-warning">0</span></td>
-                                <td><span class="badge badge-success">0</span></td>
-                                <td><span class="badge badge-danger">0</span></td>
-                                <td>
-                                    <div class="progress-bar">
-                                        <div class="progress-fill" style="width: 0%"></div>
-                                    </div>
-                                    <small>0%</small>
-                                </td>
-                            </tr>
-                        `;
-                    }
+                    const mediaFrequencia = disciplina.totalSessoes > 0 ? 
+                        Math.round((disciplina.presencas / disciplina.totalSessoes) * 100) : 0;
+                    const statusFrequencia = mediaFrequencia >= 75 ? 'success' : mediaFrequencia >= 50 ? 'warning' : 'danger';
+                    
+                    relatorioHTML += `
+                        <tr>
+                            <td><strong>${disciplina.nome}</strong><br><small>${disciplina.codigo}</small></td>
+                            <td>${disciplina.professor}</td>
+                            <td><span class="badge badge-success">${disciplina.alunos}</span></td>
+                            <td><span class="badge badge-primary">${Math.floor(disciplina.totalSessoes / Math.max(disciplina.alunosComDados, 1))}</span></td>
+                            <td><span class="badge badge-success">${disciplina.presencas}</span></td>
+                            <td><span class="badge badge-danger">${disciplina.faltas}</span></td>
+                            <td>
+                                <div class="progress-bar">
+                                    <div class="progress-fill ${statusFrequencia}" style="width: ${mediaFrequencia}%"></div>
+                                </div>
+                                <small>${mediaFrequencia}%</small>
+                            </td>
+                        </tr>
+                    `;
                 }
             
                 relatorioHTML += `
@@ -603,8 +581,81 @@ class FrequenciaApp {
             `;
         }
     }
-    
 
+    indexarPainel(dashboard, matriz) {
+        // Linha de cada aluno (com a turma) e célula de cada par aluno/disciplina
+        const alunos = new Map();
+        for (const turma of dashboard.turmas) {
+            for (const aluno of turma.alunos) {
+                alunos.set(aluno.aluno_id, { turma, aluno });
+            }
+        }
+        const celulas = new Map();
+        matriz.celulas.aluno_id.forEach((alunoId, i) => {
+            celulas.set(`${alunoId}:${matriz.celulas.disciplina_id[i]}`, i);
+        });
+        return { dashboard, matriz, alunos, celulas };
+    }
+
+    conectarEventos() {
+        if (this.eventos || !window.EventSource) return;
+        this.eventos = new EventSource(`${this.baseURL}/eventos`);
+        this.eventos.addEventListener('frequencia', (e) => this.aplicarEvento(JSON.parse(e.data)));
+        this.eventos.addEventListener('recarregar', () => this.recarregarPainel());
+        // Eventos perdidos enquanto a conexão estava caída: recarregar ao reconectar
+        this.eventos.addEventListener('error', () => { this.eventosCaidos = true; });
+        this.eventos.addEventListener('open', () => {
+            if (this.eventosCaidos) {
+                this.eventosCaidos = false;
+                this.recarregarPainel();
+            }
+        });
+    }
+
+    aplicarEvento(evento) {
+        // Deltas [presenças, faltas, justificadas] por aluno, somados no aluno, na
+        // turma, nos totais e na célula da disciplina da sessão
+        if (!this.painel) return;
+        const { dashboard, matriz, alunos, celulas } = this.painel;
+        const campos = ['presencas', 'faltas', 'faltas_justificadas'];
+        let desconhecido = false;
+        for (const [id, delta] of Object.entries(evento.alunos)) {
+            const linha = alunos.get(Number(id));
+            const celula = celulas.get(`${id}:${evento.disciplina_id}`);
+            if (!linha || celula === undefined) {
+                desconhecido = true;
+                continue;
+            }
+            campos.forEach((campo, i) => {
+                linha.aluno[campo] += delta[i];
+                linha.turma[campo] += delta[i];
+                dashboard.totais[campo] += delta[i];
+                matriz.celulas[campo][celula] += delta[i];
+            });
+            const aluno = linha.aluno;
+            aluno.total_sessoes = aluno.presencas + aluno.faltas;
+            aluno.percentual_presenca = aluno.total_sessoes > 0 ?
+                Math.round(aluno.presencas / aluno.total_sessoes * 10000) / 100 : 0;
+            matriz.celulas.total_sessoes[celula] += delta[0] + delta[1];
+        }
+        // Aluno ou matrícula que o painel ainda não tem: recarregar tudo
+        if (desconhecido) {
+            this.recarregarPainel();
+            return;
+        }
+        // Uma renderização por rajada de eventos
+        if (!this.renderizacao) {
+            this.renderizacao = setTimeout(() => {
+                this.renderizacao = null;
+                this.gerarRelatorioGeral(this.painel.dashboard, this.painel.matriz);
+            }, 250);
+        }
+    }
+
+    recarregarPainel() {
+        clearTimeout(this.recarga);
+        this.recarga = setTimeout(() => this.gerarRelatorioGeral(), 1000);
+    }
 }
 
 // Inicializar app quando a página carregar
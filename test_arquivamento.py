@@ -0,0 +1,110 @@
+import os
+from datetime import date, datetime
+import pytest
+from sqlalchemy import event
+from app import config
+from app.database import ContadorAluno, ContadorAlunoDisciplina, ContadorSessao, Sessao
+from app.schemas import SessaoCreate, FrequenciaLoteItem
+from app.services.frequencia_service import FrequenciaService
+
+PERIODOS = [
+    {},
+    # Ano inteiro: vem dos resumos
+    {"inicio": date(2024, 1, 1), "fim": date(2024, 12, 31)},
+    # Parte do ano: o arquivo é anexado
+    {"inicio": date(2024, 3, 1), "fim": date(2024, 3, 31)},
+    {"inicio": date(2024, 3, 10), "fim": date(2025, 12, 31)},
+]
+
+def _contadores(db):
+    return {
+        modelo.__tablename__: sorted(tuple(linha) for linha in db.query(*modelo.__table__.c))
+        for modelo in (ContadorAluno, ContadorAlunoDisciplina, ContadorSessao)
+    }
+
+def _relatorios(db, cadastro):
+    # Sem o cache de relatórios no meio
+    def chamar(nome, *args, **periodo):
+        metodo = getattr(FrequenciaService, nome)
+        return getattr(metodo, "__wrapped__", metodo)(db, *args, **periodo)
+
+    resultado = {}
+    for n, periodo in enumerate(PERIODOS):
+        for aluno_id in cadastro["alunos"]:
+            resultado[n, "aluno", aluno_id] = chamar("relatorio_aluno", aluno_id, **periodo)
+            resultado[n, "aluno_disciplina", aluno_id] = chamar(
+                "relatorio_aluno_disciplina", aluno_id, cadastro["disciplina_id"], **periodo
+            )
+        resultado[n, "turma"] = chamar("relatorio_turma", cadastro["turma_id"], **periodo)
+    return resultado
+
+def _historico(db, cadastro):
+    # Sessões de 2024 e uma de 2025 depois delas, com o último registro do banco
+    a, b, c = cadastro["alunos"]
+    marcacoes = [
+        (datetime(2024, 3, 5, 8), {a: True, b: False, c: True}),
+        (datetime(2024, 3, 12, 8), {a: False, b: False, c: True}),
+        (datetime(2024, 9, 10, 8), {a: True, b: True}),
+        (datetime(2025, 2, 4, 8), {a: False, c: False}),
+    ]
+    for data, presencas in marcacoes:
+        sessao = FrequenciaService.criar_sessao(db, SessaoCreate(
+            turma_id=cadastro["turma_id"], disciplina_id=cadastro["disciplina_id"], data=data
+        ))
+        FrequenciaService.marcar_frequencia_lote(db, sessao.id, [
+            FrequenciaLoteItem(aluno_id=aluno_id, presente=presente, justificado=aluno_id == b)
+            for aluno_id, presente in presencas.items()
+        ])
+
+@pytest.mark.parametrize("analitico", [False, True])
+def test_arquivar_ano_mantem_relatorios(banco, cadastro, tmp_path, monkeypatch, analitico):
+    if analitico:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(config, "ANALITICO", analitico)
+    monkeypatch.setattr(config, "PASTA_ARQUIVO", str(tmp_path / "arquivo"))
+    db = banco()
+    _historico(db, cadastro)
+    antes = _relatorios(db, cadastro)
+    contadores = _contadores(db)
+    assert antes[0, "aluno", cadastro["alunos"][0]]["total_sessoes"] == 4
+
+    resultado = FrequenciaService.arquivar_ano(db, 2024)
+    assert (resultado["sessoes"], resultado["frequencias"]) == (3, 8)
+    assert os.path.exists(resultado["arquivo"])
+    assert db.query(Sessao).filter(Sessao.data < datetime(2025, 1, 1)).count() == 0
+
+    # Os períodos que cortam 2024 leem as tabelas do arquivo anexado
+    comandos = []
+    engine = db.get_bind()
+    registrar = lambda conn, cursor, sql, *args: comandos.append(sql)
+    event.listen(engine, "before_cursor_execute", registrar)
+    try:
+        depois = _relatorios(db, cadastro)
+    finally:
+        event.remove(engine, "before_cursor_execute", registrar)
+    assert depois == antes
+    assert any("arquivo_2024." in sql for sql in comandos)
+
+    # Os contadores por aluno somam a história toda, antes e depois de
+    # reconstruí-los; os das sessões arquivadas foram para o arquivo
+    restantes = {sessao_id for (sessao_id,) in db.query(Sessao.id)}
+    contadores["contadores_sessao"] = [linha for linha in contadores["contadores_sessao"] if linha[0] in restantes]
+    assert _contadores(db) == contadores
+    FrequenciaService.reconstruir_contadores(db)
+    assert _contadores(db) == contadores
+    assert _relatorios(db, cadastro) == antes
+    db.close()
+
+def test_arquivo_ausente_nao_vira_relatorio_vazio(banco, cadastro, tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "ANALITICO", False)
+    monkeypatch.setattr(config, "PASTA_ARQUIVO", str(tmp_path / "arquivo"))
+    db = banco()
+    _historico(db, cadastro)
+    os.remove(FrequenciaService.arquivar_ano(db, 2024)["arquivo"])
+    db.close()
+    # Conexões novas, sem o anexo feito pelo arquivamento
+    db.get_bind().dispose()
+    db = banco()
+    with pytest.raises(FileNotFoundError):
+        FrequenciaService.relatorio_turma(db, cadastro["turma_id"], inicio=date(2024, 3, 1), fim=date(2024, 3, 31))
+    db.close()
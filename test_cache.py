@@ -0,0 +1,104 @@
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+from app.schemas import DisciplinaCreate, FrequenciaIndividual, FrequenciaLoteItem, MatricularAluno, SessaoCreate
+from app.services.cache import cache_relatorios
+from app.services.frequencia_service import FrequenciaService
+
+RAIZ = os.path.dirname(os.path.abspath(__file__))
+
+def _misses(chamar):
+    antes = cache_relatorios.misses
+    resultado = chamar()
+    return resultado, cache_relatorios.misses - antes
+
+def test_marcacoes_atualizam_relatorios_em_cache(banco, cadastro):
+    db = banco()
+    aluno_id, turma_id = cadastro["alunos"][0], cadastro["turma_id"]
+    aluno = lambda: FrequenciaService.relatorio_aluno(db, aluno_id)
+    turma = lambda: FrequenciaService.relatorio_turma(db, turma_id)
+    assert aluno()["total_sessoes"] == 0
+    turma()
+    # Sem escrita no meio, a segunda leitura vem do cache
+    assert _misses(aluno)[1] == 0 and _misses(turma)[1] == 0
+
+    FrequenciaService.marcar_frequencia_lote(db, cadastro["sessao_id"], [FrequenciaLoteItem(aluno_id=aluno_id)])
+    assert aluno()["presencas"] == 1
+    assert {linha["aluno_id"]: linha["presencas"] for linha in turma()}[aluno_id] == 1
+
+    FrequenciaService.marcar_frequencia_individual(db, FrequenciaIndividual(
+        aluno_id=aluno_id, disciplina_id=cadastro["disciplina_id"], presente=False
+    ))
+    # A sessão do dia é a do cadastro: a marcação individual troca a presença por falta
+    assert (aluno()["presencas"], aluno()["faltas"]) == (0, 1)
+    assert {linha["aluno_id"]: linha["faltas"] for linha in turma()}[aluno_id] == 1
+    db.close()
+
+def test_sessao_e_matricula_invalidam_o_cache(banco, cadastro):
+    db = banco()
+    turma_id, aluno_id = cadastro["turma_id"], cadastro["alunos"][0]
+    serie = lambda: FrequenciaService.serie_frequencia(db, "dia")["pontos"]["sessoes"]
+    turma = lambda: FrequenciaService.relatorio_turma(db, turma_id)
+    matriz = lambda: FrequenciaService.matriz_frequencia(db, turma_id=turma_id)["celulas"]["disciplina_id"]
+    aluno = lambda: FrequenciaService.relatorio_aluno(db, aluno_id)
+    assert sum(serie()) == 1
+    turma()
+
+    FrequenciaService.criar_sessao(db, SessaoCreate(
+        turma_id=turma_id, disciplina_id=cadastro["disciplina_id"], data=datetime(2026, 1, 5, 8)
+    ))
+    assert sum(serie()) == 2
+    assert _misses(turma)[1] == 1
+
+    nova = FrequenciaService.criar_disciplina(db, DisciplinaCreate(
+        nome="História", codigo="HIS1", carga_horaria=40, professor="Rui"
+    ))
+    assert nova.id not in matriz()
+    aluno()
+    FrequenciaService.matricular_aluno_disciplina(db, MatricularAluno(aluno_id=aluno_id, disciplina_id=nova.id))
+    assert nova.id in matriz()
+    assert _misses(aluno)[1] == 1
+    db.close()
+
+def test_escrita_em_massa_de_outro_processo(banco, cadastro):
+    db = banco()
+    aluno_id = cadastro["alunos"][0]
+    assert FrequenciaService.relatorio_aluno(db, aluno_id)["total_sessoes"] == 0
+    # Outra conexão grava uma frequência sem tocar nos contadores; `manage.py
+    # recontar`, em outro processo, refaz os contadores e sobe versao_dados
+    caminho = db.get_bind().url.database
+    externo = sqlite3.connect(caminho)
+    externo.execute("INSERT INTO frequencias (aluno_id, sessao_id, presente, justificado) VALUES (?, ?, 0, 0)",
+                    (aluno_id, cadastro["sessao_id"]))
+    externo.commit()
+    externo.close()
+    subprocess.run(
+        [sys.executable, os.path.join(RAIZ, "manage.py"), "recontar"], check=True, capture_output=True,
+        env={**os.environ, "FREQUENCIA_DATABASE_URL": f"sqlite:///{caminho}"}, cwd=RAIZ
+    )
+    assert FrequenciaService.relatorio_aluno(db, aluno_id)["faltas"] == 1
+    db.close()
+
+def test_get_condicional(cliente, cadastro):
+    url = f"/api/v1/relatorio/aluno/{cadastro['alunos'][0]}"
+    resposta = cliente.get(url)
+    etag = resposta.headers["ETag"]
+    assert resposta.status_code == 200 and etag
+
+    nao_mudou = cliente.get(url, headers={"If-None-Match": etag})
+    assert nao_mudou.status_code == 304 and nao_mudou.headers["ETag"] == etag
+    assert nao_mudou.content == b""
+
+    cliente.post("/api/v1/frequencias/lote/", json={
+        "sessao_id": cadastro["sessao_id"], "frequencias": [{"aluno_id": cadastro["alunos"][0], "presente": False}]
+    })
+    mudou = cliente.get(url, headers={"If-None-Match": etag})
+    assert mudou.status_code == 200 and mudou.headers["ETag"] != etag
+    assert mudou.json()["faltas"] == 1
+    # Escrita de outro aluno não muda o ETag deste
+    cliente.post("/api/v1/frequencias/lote/", json={
+        "sessao_id": cadastro["sessao_id"], "frequencias": [{"aluno_id": cadastro["alunos"][1]}]
+    })
+    assert cliente.get(url, headers={"If-None-Match": mudou.headers["ETag"]}).status_code == 304
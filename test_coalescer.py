@@ -0,0 +1,61 @@
+import pytest
+from app.database import Frequencia
+from app.schemas import FrequenciaLoteItem
+from app.services.coalescer import AgrupadorEscritas
+
+def _agrupador(banco, **opcoes):
+    # Janela longa: os pedidos enfileirados antes de iniciar caem no mesmo lote
+    return AgrupadorEscritas(session_factory=banco, intervalo_ms=200, **opcoes)
+
+def _gravadas(banco):
+    db = banco()
+    try:
+        return {f.aluno_id: f.presente for f in db.query(Frequencia)}
+    finally:
+        db.close()
+
+def test_pedido_com_falha_inesperada_nao_prende_o_lote(banco, cadastro):
+    sessao_id, (a, b, c) = cadastro["sessao_id"], cadastro["alunos"]
+    agrupador = _agrupador(banco)
+
+    def falhar(db):
+        # Grava parte das linhas antes de falhar com um erro que não é de validação
+        db.add(Frequencia(aluno_id=c, sessao_id=sessao_id, presente=False))
+        db.flush()
+        raise RuntimeError("falha no meio do pedido")
+
+    antes = agrupador.enviar_lote(sessao_id, [FrequenciaLoteItem(aluno_id=a, presente=True)])
+    falho = agrupador._enfileirar(falhar, 1)
+    depois = agrupador.enviar_lote(sessao_id, [FrequenciaLoteItem(aluno_id=b, presente=False)])
+    agrupador.iniciar()
+    try:
+        assert agrupador.aguardar(antes)["registradas"] == 1
+        with pytest.raises(RuntimeError):
+            agrupador.aguardar(falho)
+        assert agrupador.aguardar(depois)["registradas"] == 1
+    finally:
+        agrupador.parar()
+
+    # O que o pedido com falha gravou foi desfeito; os outros foram regravados
+    assert _gravadas(banco) == {a: True, b: False}
+
+def test_erro_de_validacao_responde_so_o_pedido(banco, cadastro):
+    agrupador = _agrupador(banco)
+    invalido = agrupador.enviar_lote(cadastro["sessao_id"] + 1000, [FrequenciaLoteItem(aluno_id=cadastro["alunos"][0])])
+    valido = agrupador.enviar_lote(cadastro["sessao_id"], [FrequenciaLoteItem(aluno_id=cadastro["alunos"][1])])
+    agrupador.iniciar()
+    try:
+        with pytest.raises(ValueError):
+            agrupador.aguardar(invalido)
+        assert agrupador.aguardar(valido)["registradas"] == 1
+    finally:
+        agrupador.parar()
+
+def test_espera_tem_limite(banco, cadastro):
+    # Sem a thread de gravação o pedido nunca é respondido: a espera termina em
+    # TimeoutError e o pedido sai da fila
+    agrupador = _agrupador(banco, espera_s=0.05)
+    futuro = agrupador.enviar_lote(cadastro["sessao_id"], [FrequenciaLoteItem(aluno_id=cadastro["alunos"][0])])
+    with pytest.raises(TimeoutError):
+        agrupador.aguardar(futuro)
+    assert futuro.cancelled()
@@ -0,0 +1,99 @@
+import sqlite3
+import pytest
+from app.routes import api_async
+from app.schemas import FrequenciaIndividual, FrequenciaLoteItem
+from app.services.frequencia_service import FrequenciaService
+from conftest import cliente_api
+
+@pytest.mark.parametrize("linha", [
+    {"aluno_id": 1, "presente": "nao"},
+    {"aluno_id": [1]},
+    {"presente": True},
+])
+def test_linha_malformada_responde_422(cliente, cadastro, linha):
+    resposta = cliente.post("/api/v1/frequencias/lote/", json={
+        "sessao_id": cadastro["sessao_id"],
+        "frequencias": [{"aluno_id": cadastro["alunos"][0]}, linha],
+    })
+    assert resposta.status_code == 422
+    # A posição da linha inválida vem no erro
+    assert resposta.json()["detail"][0]["loc"][:3] == ["body", "frequencias", 1]
+
+def test_lote_com_resultado_por_linha(cliente, cadastro):
+    a, b, _ = cadastro["alunos"]
+    resposta = cliente.post("/api/v1/frequencias/lote/", json={
+        "sessao_id": cadastro["sessao_id"],
+        "frequencias": [{"aluno_id": a, "presente": False}, {"aluno_id": 999}, {"aluno_id": b}],
+    })
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert corpo["registradas"] == 2
+    assert [r["status"] for r in corpo["resultados"]] == ["registrado", "erro", "registrado"]
+    assert corpo["nao_informados"] == [cadastro["alunos"][2]]
+
+def test_importacao_relata_linhas_malformadas(cliente, cadastro):
+    linhas = [
+        b'{"nome": 123, "matricula": 1001, "turma": "1A", "disciplinas": ["MAT1"]}',
+        b'{"nome": "Bia", "matricula": "1002", "turma": 7}',
+        b'{"nome": "Caio", "matricula": "1003", "turma": "2B", "ano": 2026, "periodo": 5}',
+        b'{"nome": "Duda", "matricula": "1004", "turma": "1A", "disciplinas": 5}',
+        '{"nome": "Évora", "matricula": "1005", "turma": "1A"}'.encode("latin-1"),
+        b'{"nome": "Fabi", "matricula": "1006", "turma": "1A", "disciplinas": "MAT1"}',
+    ]
+    resposta = cliente.post(
+        "/api/v1/importar/alunos",
+        files={"arquivo": ("alunos.jsonl", b"\n".join(linhas) + b"\n", "application/x-ndjson")},
+    )
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    # Números e turmas numéricas viram texto; tipos inválidos e linhas que não
+    # são UTF-8 viram erro da linha, e o restante do arquivo é importado
+    assert {erro["linha"] for erro in corpo["erros"]} == {2, 4, 5}
+    assert corpo["alunos"] == 3
+    assert corpo["turmas_criadas"] == 1
+    assert corpo["matriculas"] == 2
+
+def test_importacao_csv_com_linha_fora_de_utf8(cliente, cadastro):
+    conteudo = (
+        "﻿nome,matricula,turma,disciplinas\r\n"
+        "Ana,2001,1A,MAT1\r\n".encode("utf-8")
+        + "José,2002,1A,MAT1\r\n".encode("latin-1")
+        + '"Beto\r\nSilva",2003,1A,MAT1\r\n'.encode("utf-8")
+    )
+    resposta = cliente.post("/api/v1/importar/alunos", files={"arquivo": ("alunos.csv", conteudo, "text/csv")})
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert corpo["erros"] == [{"linha": 3, "erro": "Linha não está em UTF-8"}]
+    assert corpo["alunos"] == 2
+
+def test_importacao_pela_api_assincrona(banco, cadastro):
+    # A rota assíncrona importa numa thread com a sessão síncrona
+    cliente = cliente_api(banco, api_async.router)
+    conteudo = "nome,matricula,turma,ano,periodo,disciplinas\nAna,3001,1A,,,MAT1\nBia,3002,2B,2026,Tarde,\n".encode("utf-8")
+    resposta = cliente.post("/api/v1/importar/alunos", files={"arquivo": ("alunos.csv", conteudo, "text/csv")})
+    assert resposta.status_code == 200
+    corpo = resposta.json()
+    assert corpo["erros"] == [] and (corpo["alunos"], corpo["turmas_criadas"], corpo["matriculas"]) == (2, 1, 1)
+
+def test_aluno_matriculado_por_outro_processo(banco, cadastro):
+    # Índice já carregado; aluno e matrícula chegam por outra conexão (como o
+    # manage.py importar), sem passar pelo commit deste processo
+    db = banco()
+    FrequenciaService.marcar_frequencia_lote(db, cadastro["sessao_id"], [FrequenciaLoteItem(aluno_id=cadastro["alunos"][0])])
+    externo = sqlite3.connect(db.get_bind().url.database)
+    aluno_id = externo.execute(
+        "INSERT INTO alunos (nome, matricula, turma_id) VALUES ('Novo', 'EXT1', ?)", (cadastro["turma_id"],)
+    ).lastrowid
+    externo.execute("INSERT INTO aluno_disciplina (aluno_id, disciplina_id) VALUES (?, ?)", (aluno_id, cadastro["disciplina_id"]))
+    externo.commit()
+    externo.close()
+
+    resultado = FrequenciaService.marcar_frequencia_lote(db, cadastro["sessao_id"], [FrequenciaLoteItem(aluno_id=aluno_id)])
+    assert resultado["resultados"] == [{"aluno_id": aluno_id, "status": "registrado"}]
+    FrequenciaService.marcar_frequencia_individual(db, FrequenciaIndividual(
+        aluno_id=aluno_id, disciplina_id=cadastro["disciplina_id"], presente=False
+    ))
+    # Não matriculado continua recusado
+    resultado = FrequenciaService.marcar_frequencia_lote(db, cadastro["sessao_id"], [FrequenciaLoteItem(aluno_id=aluno_id + 1)])
+    assert resultado["resultados"][0]["status"] == "erro"
+    db.close()
@@ -0,0 +1,93 @@
+import os
+import shutil
+import sqlite3
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session
+from app.database import ContadorAluno, ContadorAlunoDisciplina, ContadorSessao
+from app.migrations import aplicar_migracoes, versao_banco, VERSAO_ATUAL
+from app.services.frequencia_service import FrequenciaService
+from conftest import criar_engine
+
+# Banco distribuído com o projeto: esquema original, PRAGMA user_version 0
+BANCO_ORIGINAL = os.path.join(os.path.dirname(__file__), "data", "frequencia.db")
+
+def _banco_original(tmp_path):
+    caminho = tmp_path / "original.db"
+    shutil.copy(BANCO_ORIGINAL, caminho)
+    conn = sqlite3.connect(caminho)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 0
+    # Mais frequências no esquema antigo: uma falta justificada em nova sessão e
+    # um registro repetido de (aluno, sessão), que a migração 001 remove
+    aluno_id, turma_id, disciplina_id = conn.execute(
+        "SELECT a.id, a.turma_id, ad.disciplina_id FROM alunos a JOIN aluno_disciplina ad ON ad.aluno_id = a.id"
+    ).fetchone()
+    sessao_id = conn.execute(
+        "INSERT INTO sessoes (turma_id, disciplina_id, data) VALUES (?, ?, '2024-05-02 10:00:00')",
+        (turma_id, disciplina_id)
+    ).lastrowid
+    for presente in (1, 0):
+        conn.execute(
+            "INSERT INTO frequencias (aluno_id, sessao_id, presente, justificado) VALUES (?, ?, ?, 1)",
+            (aluno_id, sessao_id, presente)
+        )
+    conn.commit()
+    conn.close()
+    return caminho
+
+def _contadores(db):
+    return {
+        modelo.__tablename__: sorted(tuple(linha) for linha in db.query(*modelo.__table__.c))
+        for modelo in (ContadorAluno, ContadorAlunoDisciplina, ContadorSessao)
+    }
+
+def test_atualiza_banco_original(tmp_path):
+    engine = criar_engine(_banco_original(tmp_path))
+    try:
+        assert aplicar_migracoes(engine) == VERSAO_ATUAL
+        with engine.connect() as conn:
+            assert versao_banco(conn) == VERSAO_ATUAL
+            repetidos = conn.exec_driver_sql(
+                "SELECT COUNT(*) FROM (SELECT 1 FROM frequencias GROUP BY aluno_id, sessao_id HAVING COUNT(*) > 1)"
+            ).scalar()
+            assert repetidos == 0
+            # Cadastros e sessões existentes entram no registro de /sync
+            registrados = conn.exec_driver_sql("SELECT COUNT(*) FROM mudancas_sync").scalar()
+            cadastrados = conn.exec_driver_sql(
+                "SELECT (SELECT COUNT(*) FROM turmas) + (SELECT COUNT(*) FROM disciplinas)"
+                " + (SELECT COUNT(*) FROM alunos) + (SELECT COUNT(*) FROM sessoes)"
+            ).scalar()
+            assert registrados == cadastrados
+
+        # Os contadores preenchidos pelas migrações são os que o serviço calcula hoje
+        db = Session(bind=engine)
+        migrados = _contadores(db)
+        assert migrados["contadores_aluno"]
+        FrequenciaService.reconstruir_contadores(db)
+        assert _contadores(db) == migrados
+        db.close()
+
+        # Rodar de novo não faz nada
+        assert aplicar_migracoes(engine) == VERSAO_ATUAL
+    finally:
+        engine.dispose()
+
+def test_esquema_migrado_igual_ao_criado(tmp_path):
+    def esquema(engine):
+        inspetor = inspect(engine)
+        return {
+            tabela: (
+                sorted(coluna["name"] for coluna in inspetor.get_columns(tabela)),
+                sorted(indice["name"] for indice in inspetor.get_indexes(tabela)),
+            )
+            for tabela in inspetor.get_table_names()
+        }
+
+    migrado = criar_engine(_banco_original(tmp_path))
+    novo = criar_engine(tmp_path / "novo.db")
+    try:
+        aplicar_migracoes(migrado)
+        aplicar_migracoes(novo)
+        assert esquema(migrado) == esquema(novo)
+    finally:
+        migrado.dispose()
+        novo.dispose()
@@ -0,0 +1,70 @@
+import threading
+from app.database import EnvioSync
+from app.schemas import FrequenciaSync
+from app.services.frequencia_service import FrequenciaService
+
+def _envio(cadastro, presente=True):
+    return {"registros": [
+        {"id_cliente": f"tablet-{aluno_id}", "sessao_id": cadastro["sessao_id"], "aluno_id": aluno_id, "presente": presente}
+        for aluno_id in cadastro["alunos"]
+    ]}
+
+def test_reenvio_volta_como_repetido(cliente, cadastro):
+    primeiro = cliente.post("/api/v1/sync/frequencias", json=_envio(cadastro)).json()
+    assert (primeiro["registradas"], primeiro["repetidas"]) == (3, 0)
+    # Reenvio depois de uma queda de conexão, agora com falta: nada é regravado
+    reenvio = cliente.post("/api/v1/sync/frequencias", json=_envio(cadastro, presente=False)).json()
+    assert (reenvio["registradas"], reenvio["repetidas"]) == (0, 3)
+    relatorio = cliente.get(f"/api/v1/relatorio/aluno/{cadastro['alunos'][0]}").json()
+    assert (relatorio["presencas"], relatorio["faltas"]) == (1, 0)
+
+def test_envios_simultaneos_gravam_uma_vez(banco, cadastro):
+    registros = [FrequenciaSync(**registro) for registro in _envio(cadastro)["registros"]]
+    largada = threading.Barrier(2)
+    resultados = []
+
+    def enviar():
+        db = banco()
+        try:
+            largada.wait()
+            resultados.append(FrequenciaService.sincronizar_frequencias(db, registros))
+        finally:
+            db.close()
+
+    envios = [threading.Thread(target=enviar) for _ in range(2)]
+    for envio in envios:
+        envio.start()
+    for envio in envios:
+        envio.join()
+    assert sorted((r["registradas"], r["repetidas"]) for r in resultados) == [(0, 3), (3, 0)]
+
+def test_reserva_com_erro_e_desfeita(cliente, banco, cadastro):
+    envio = {"registros": [{"id_cliente": "tablet-x", "sessao_id": cadastro["sessao_id"], "aluno_id": 999}]}
+    assert cliente.post("/api/v1/sync/frequencias", json=envio).json()["resultados"][0]["status"] == "erro"
+    db = banco()
+    assert db.get(EnvioSync, "tablet-x") is None
+    db.close()
+
+def test_paginas_do_sync(cliente, cadastro):
+    cliente.post("/api/v1/sync/frequencias", json=_envio(cadastro))
+    completo = cliente.get("/api/v1/sync?since=0").json()
+    assert completo["mais"] is False
+
+    paginas, since = [], 0
+    while True:
+        pagina = cliente.get(f"/api/v1/sync?since={since}&limit=2").json()
+        # O cursor é o id da última linha lida, um inteiro que só cresce
+        assert isinstance(pagina["cursor"], int) and pagina["cursor"] > since
+        paginas.append(pagina)
+        since = pagina["cursor"]
+        if not pagina["mais"]:
+            break
+    assert len(paginas) > 1
+    assert since == completo["cursor"]
+    for chave in ("turmas", "disciplinas", "alunos", "sessoes", "frequencias"):
+        recebidos = {registro["id"] for pagina in paginas for registro in pagina[chave]}
+        assert recebidos == {registro["id"] for registro in completo[chave]}, chave
+
+    # Sem mudanças depois do cursor: página vazia e o mesmo cursor
+    vazia = cliente.get(f"/api/v1/sync?since={since}").json()
+    assert vazia["cursor"] == since and vazia["frequencias"] == [] and vazia["mais"] is False
@@ -2,7 +2,7 @@ import requests
 import time
 
 def test_sistema():
-    base_url = "http://127.0.0.1:8001"
+    base_url = "http://127.0.0.1:8002"
     api_url = f"{base_url}/api/v1"
     
     print("Testando Sistema de Frequência...")
@@ -13,25 +13,32 @@ def test_sistema():
         print("✅ Servidor está rodando")
         
         # Teste 2: Criar turma
-        turma_data = {"nome": "Teste Turma", "ano": 2024}
+        # Nomes e matrícula únicos para poder rodar mais de uma vez no mesmo banco
+        sufixo = int(time.time())
+        turma_data = {"nome": f"Teste Turma {sufixo}", "ano": 2024, "periodo": "Manhã"}
         response = requests.post(f"{api_url}/turmas/", json=turma_data)
-        if response.status_code == 200:
+        disciplina_data = {"nome": f"Teste {sufixo}", "codigo": f"TST{sufixo}", "carga_horaria": 40, "professor": "Prof. Teste"}
+        response_disciplina = requests.post(f"{api_url}/disciplinas/", json=disciplina_data)
+        if response.status_code == 200 and response_disciplina.status_code == 200:
             turma = response.json()
+            disciplina = response_disciplina.json()
             print(f"✅ Turma criada: {turma['nome']}")
+            print(f"✅ Disciplina criada: {disciplina['nome']}")
             
             # Teste 3: Criar aluno
-            aluno_data = {"nome": "Aluno Teste", "matricula": "TEST001", "turma_id": turma["id"]}
+            aluno_data = {"nome": "Aluno Teste", "matricula": f"TEST{sufixo}", "turma_id": turma["id"],
+                          "disciplina_ids": [disciplina["id"]]}
             response = requests.post(f"{api_url}/alunos/", json=aluno_data)
             if response.status_code == 200:
                 aluno = response.json()
                 print(f"✅ Aluno criado: {aluno['nome']}")
                 
                 # Teste 4: Criar sessão
-                sessao_data = {"disciplina": "Teste", "turma_id": turma["id"]}
+                sessao_data = {"turma_id": turma["id"], "disciplina_id": disciplina["id"]}
                 response = requests.post(f"{api_url}/sessoes/", json=sessao_data)
                 if response.status_code == 200:
                     sessao = response.json()
-                    print(f"✅ Sessão criada: {sessao['disciplina']}")
+                    print(f"✅ Sessão criada: {disciplina['nome']} (ID: {sessao['id']})")
                     
                     # Teste 5: Marcar frequência
                     freq_data = {